@@ -0,0 +1,354 @@
+# api/server.py
+"""
+Async HTTP and WebSocket front end for DebateBot.
+
+    POST /debates                     start a debate -> {"session_id": ...}
+    POST /debates/{session_id}/messages   send a message -> bot reply + turn metrics
+                                          (optional Idempotency-Key header or
+                                          "idempotency_key": retries get the first reply)
+    GET  /debates/{session_id}/analytics  session, turns and sentiment records
+    GET  /debates/{session_id}/ws         WebSocket: send {"message": ..., "idempotency_key": ...}, receive
+                                          {"type": "reply"} then {"type": "metrics"}
+
+Graph runs are blocking, so they execute on a thread pool while the event loop
+serves many sessions per process. Session state lives in the shared state store,
+so several server processes can sit behind a plain load balancer; a message that
+races another one on the same session gets 409 Conflict, and one sent to a
+session that has ended gets 410 Gone. Live sessions are
+cached per process up to SERVER_MAX_SESSIONS, and idle ones are dropped after
+SERVER_SESSION_TTL; a dropped session resumes from its checkpoint when next used.
+On shutdown the server stops taking turns (503), waits for in-flight turns (and
+their DB writes) to finish, then closes.
+
+Usage:
+    python -m api.server --port 8080
+"""
+from aiohttp import web, WSMsgType
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from typing import Dict
+import argparse
+import asyncio
+import contextlib
+import functools
+import time
+import weakref
+
+def turn_metrics(state: Dict) -> Dict:
+    """Per-turn metrics pushed alongside each reply"""
+    metrics = {
+        "turn_count": state["turn_count"],
+        "phase": state["phase"],
+        "escalation_level": state["escalation_level"],
+        "should_stop": state.get("should_stop", False),
+        "turn_usage": state.get("turn_usage"),
+        "token_usage": state.get("token_usage")
+    }
+
+    history = state["sentiment_scores"]
+    for role in ("user", "assistant"):
+        discomfort = history.recent("predicted_discomfort", 1, role=role)
+        if len(discomfort):
+            metrics[f"{role}_discomfort"] = float(discomfort[0])
+            metrics[f"{role}_arousal"] = float(history.recent("arousal", 1, role=role)[0])
+            metrics[f"{role}_toxicity"] = float(history.recent("toxicity", 1, role=role)[0])
+
+    return metrics
+
+class LiveSession:
+    """A cached bot (None until loaded) and the lock serializing its turns"""
+
+    __slots__ = ("bot", "lock", "users", "last_used")
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        self.lock = asyncio.Lock()
+        self.users = 0  # Requests holding or waiting for the lock
+        self.last_used = time.monotonic()
+
+class DebateService:
+    """
+    Holds the live sessions of one server process. All sessions share one
+    compiled graph and one DatabaseManager; turns for the same session are
+    serialized, turns for different sessions run concurrently.
+
+    Sessions are kept least recently used first. Unused ones are dropped once
+    past the TTL or over the cap; sessions with requests holding or waiting
+    for their lock never are, so a turn always has the lock the others wait on.
+    """
+
+    def __init__(self, max_threads: int = None, max_sessions: int = None, session_ttl: float = None):
+        from graph import create_debate_graph
+        from models.database import DatabaseManager
+
+        self.graph = create_debate_graph()
+        self.db = DatabaseManager()
+        self.executor = ThreadPoolExecutor(max_workers=max_threads or config.SERVER_THREADS)
+        self.max_sessions = max_sessions or config.SERVER_MAX_SESSIONS
+        self.session_ttl = session_ttl or config.SERVER_SESSION_TTL
+        self.sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+        self.in_flight = set()
+        self.accepting = True
+        self.closed = False
+        self.turns = 0
+        self.no_turns = asyncio.Event()
+        self.no_turns.set()
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        if self.closed:
+            raise web.HTTPServiceUnavailable(reason="Server is shutting down")
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        self.in_flight.add(future)
+        try:
+            return await future
+        finally:
+            self.in_flight.discard(future)
+
+    async def start(self, topic: str, user_stance: str, bot_stance: str = None, user_id: str = None) -> str:
+        from main import DebateBot
+
+        if not self.accepting:
+            raise web.HTTPServiceUnavailable(reason="Server is shutting down")
+
+        bot = DebateBot(graph=self.graph, db=self.db)
+        session_id = await self.run_blocking(bot.start_debate, topic, user_stance, bot_stance, user_id)
+        self.sessions[session_id] = LiveSession(bot)
+        self._evict()
+        return session_id
+
+    async def get_bot(self, session_id: str):
+        """Live bot for a session, resuming it from its checkpoint if needed"""
+        async with self._use(session_id) as session:
+            return await self._load(session_id, session)
+
+    @contextlib.asynccontextmanager
+    async def _use(self, session_id: str):
+        """Hold the session's lock; its entry stays cached meanwhile"""
+        session = self.sessions.get(session_id) or LiveSession()
+        self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        session.users += 1
+        try:
+            async with session.lock:
+                yield session
+        finally:
+            session.users -= 1
+            session.last_used = time.monotonic()
+            # Unknown and ended sessions have no bot to keep
+            if session.bot is None and not session.users:
+                self.sessions.pop(session_id, None)
+            elif session_id in self.sessions:
+                self.sessions.move_to_end(session_id)
+            self._evict()
+
+    async def _load(self, session_id: str, session: LiveSession):
+        from main import DebateBot
+
+        if session.bot is None:
+            bot = DebateBot(graph=self.graph, db=self.db)
+            try:
+                await self.run_blocking(bot.resume, session_id)
+            except ValueError:
+                raise web.HTTPNotFound(reason=f"Unknown session {session_id}")
+            session.bot = bot
+        return session.bot
+
+    def _evict(self):
+        """Drop unused sessions past the TTL or over the cap, least recently used first"""
+        expired_before = time.monotonic() - self.session_ttl
+        stale = []
+        for session_id, session in self.sessions.items():
+            if len(self.sessions) - len(stale) <= self.max_sessions and session.last_used >= expired_before:
+                break
+            if not session.users:
+                stale.append(session_id)
+        for session_id in stale:
+            del self.sessions[session_id]
+
+    async def send(self, session_id: str, message: str, idempotency_key: str = None) -> Dict:
+        from main import SessionEndedError
+        from models.checkpoint import StaleStateError
+        from utils.idempotency import IdempotencyKeyReused, IdempotencyPending
+
+        async with self._use(session_id) as session:
+            # Checked once the lock is ours, so turns queued behind the one
+            # running when the drain started don't start after it
+            if not self.accepting:
+                raise web.HTTPServiceUnavailable(reason="Server is shutting down")
+
+            self.turns += 1
+            self.no_turns.clear()
+            try:
+                bot = await self._load(session_id, session)
+                # Other workers may have taken turns on this session since we cached it
+                await self.run_blocking(bot.sync)
+                response = await self.run_blocking(bot.send_message, message, idempotency_key)
+            except SessionEndedError:
+                session.bot = None
+                raise web.HTTPGone(reason=f"Debate session {session_id} has ended")
+            except StaleStateError:
+                raise web.HTTPConflict(reason="Session was updated concurrently; resend if still needed")
+            except IdempotencyPending:
+                raise web.HTTPConflict(reason="A request with this idempotency key is still in progress")
+            except IdempotencyKeyReused:
+                raise web.HTTPUnprocessableEntity(reason="Idempotency key was already used for a different message")
+            finally:
+                self.turns -= 1
+                if not self.turns:
+                    self.no_turns.set()
+
+            state = bot.current_state
+            metrics = turn_metrics(state)
+
+            ended = bot.is_ended()
+            if ended:
+                session.bot = None
+
+        return {"response": response, "metrics": metrics, "ended": ended}
+
+    async def analytics(self, session_id: str) -> Dict:
+        analytics = await self.run_blocking(self.db.get_session_analytics, session_id)
+        session = analytics["session"]
+        if session is None:
+            raise web.HTTPNotFound(reason=f"Unknown session {session_id}")
+
+        return {
+            "session": {
+                "id": session.id,
+                "topic": session.topic,
+                "user_stance": session.user_stance,
+                "bot_stance": session.bot_stance,
+                "turn_count": session.turn_count,
+                "max_escalation_level": session.max_escalation_level,
+                "input_tokens": session.input_tokens,
+                "output_tokens": session.output_tokens,
+                "started_at": session.started_at.isoformat() if session.started_at else None,
+                "ended_at": session.ended_at.isoformat() if session.ended_at else None
+            },
+            "turns": [
+                {
+                    "turn_number": t.turn_number,
+                    "role": t.role,
+                    "content": t.content,
+                    "input_tokens": t.input_tokens,
+                    "output_tokens": t.output_tokens
+                }
+                for t in analytics["turns"]
+            ],
+            "sentiments": [
+                {
+                    "turn_number": s.turn_number,
+                    "role": s.role,
+                    "predicted_discomfort": s.predicted_discomfort,
+                    "arousal": s.arousal,
+                    "valence": s.valence,
+                    "toxicity": s.toxicity,
+                    "emotions": s.emotions
+                }
+                for s in analytics["sentiments"]
+            ]
+        }
+
+    async def drain(self):
+        """Stop taking turns and wait for in-flight ones to finish writing"""
+        self.accepting = False
+        await self.no_turns.wait()
+        if self.in_flight:
+            await asyncio.wait(list(self.in_flight))
+        self.closed = True
+        self.executor.shutdown(wait=True)
+        self.db.engine.dispose()
+
+async def start_debate(request: web.Request) -> web.Response:
+    body = await request.json()
+    if not body.get("topic") or not body.get("user_stance"):
+        raise web.HTTPBadRequest(reason="topic and user_stance are required")
+
+    session_id = await request.app["service"].start(
+        body["topic"], body["user_stance"], body.get("bot_stance"), body.get("user_id")
+    )
+    return web.json_response({"session_id": session_id}, status=201)
+
+async def send_message(request: web.Request) -> web.Response:
+    body = await request.json()
+    if not body.get("message"):
+        raise web.HTTPBadRequest(reason="message is required")
+
+    idempotency_key = request.headers.get("Idempotency-Key") or body.get("idempotency_key")
+    result = await request.app["service"].send(request.match_info["session_id"], body["message"], idempotency_key)
+    return web.json_response(result)
+
+async def get_analytics(request: web.Request) -> web.Response:
+    result = await request.app["service"].analytics(request.match_info["session_id"])
+    return web.json_response(result)
+
+async def debate_socket(request: web.Request) -> web.WebSocketResponse:
+    service = request.app["service"]
+    session_id = request.match_info["session_id"]
+    await service.get_bot(session_id)
+
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    request.app["websockets"].add(ws)
+
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+
+            try:
+                payload = msg.json()
+                message = payload.get("message")
+                if not message:
+                    raise ValueError("message is required")
+                result = await service.send(session_id, message, payload.get("idempotency_key"))
+            except (ValueError, web.HTTPException) as e:
+                await ws.send_json({"type": "error", "error": getattr(e, "reason", None) or str(e)})
+                continue
+            except Exception as e:
+                await ws.send_json({"type": "error", "error": f"{type(e).__name__}: {e}"})
+                continue
+
+            # Reply first so clients can render it before the metrics frame
+            await ws.send_json({"type": "reply", "response": result["response"], "ended": result["ended"]})
+            await ws.send_json({"type": "metrics", "metrics": result["metrics"]})
+
+            if result["ended"]:
+                break
+    finally:
+        request.app["websockets"].discard(ws)
+        if not ws.closed:
+            await ws.close()
+
+    return ws
+
+async def on_shutdown(app: web.Application):
+    await app["service"].drain()
+    for ws in set(app["websockets"]):
+        await ws.close(code=1001, message=b"Server shutdown")
+
+def create_app(service: DebateService = None) -> web.Application:
+    app = web.Application()
+    app["service"] = service or DebateService()
+    app["websockets"] = weakref.WeakSet()
+
+    app.router.add_post("/debates", start_debate)
+    app.router.add_post("/debates/{session_id}/messages", send_message)
+    app.router.add_get("/debates/{session_id}/analytics", get_analytics)
+    app.router.add_get("/debates/{session_id}/ws", debate_socket)
+
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Debate Bot HTTP/WebSocket API")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    args = parser.parse_args()
+
+    web.run_app(create_app(), host=args.host, port=args.port, shutdown_timeout=config.SERVER_SHUTDOWN_TIMEOUT)
+
+if __name__ == "__main__":
+    main()
@@ -4,85 +4,171 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from models.database import DatabaseManager
+from config import config
 from datetime import datetime
 
 st.set_page_config(page_title="Debate Analytics Dashboard", layout="wide")
 
-db = DatabaseManager()
+@st.cache_resource
+def get_db() -> DatabaseManager:
+    # One engine and connection pool shared by every viewer of this server
+    return DatabaseManager()
+
+db = get_db()
+
+# (trace name, role, record field, line style) of the live chart
+LIVE_TRACES = [
+    ("Predicted Discomfort", "assistant", "predicted_discomfort", dict(color='red', width=3)),
+    ("Arousal", "assistant", "arousal", dict(color='orange', width=2)),
+    ("Valence", "assistant", "valence", dict(color='blue', width=2)),
+    ("User Discomfort", "user", "predicted_discomfort", dict(color='purple', width=2, dash='dash'))
+]
+
+def new_live_view() -> dict:
+    fig = go.Figure()
+    for name, _, _, line in LIVE_TRACES:
+        fig.add_trace(go.Scatter(x=[], y=[], mode='lines+markers', name=name, line=line))
+    fig.update_layout(
+        title="Emotional Metrics (live)",
+        xaxis_title="Turn Number",
+        yaxis_title="Score",
+        hovermode='x unified'
+    )
+    return {"last_turn_id": 0, "last_sentiment_id": 0, "figure": fig, "turns": [], "latest": {}}
+
+@st.fragment(run_every=config.DASHBOARD_REFRESH_SECONDS)
+def live_monitor(session_id: str):
+    """
+    Tail a running session: each refresh fetches only records newer than the last
+    ones seen and appends them to the existing traces
+    """
+    view = st.session_state.setdefault(f"live_{session_id}", new_live_view())
+    new = db.get_records_since(session_id, view["last_turn_id"], view["last_sentiment_id"])
+
+    if new["sentiments"]:
+        view["last_sentiment_id"] = new["sentiments"][-1].id
+        for trace, (_, role, field, _) in zip(view["figure"].data, LIVE_TRACES):
+            points = [s for s in new["sentiments"] if s.role == role]
+            if points:
+                trace.x = trace.x + tuple(s.turn_number for s in points)
+                trace.y = trace.y + tuple(getattr(s, field) for s in points)
+        for s in new["sentiments"]:
+            view["latest"][s.role] = s
+
+    if new["turns"]:
+        view["last_turn_id"] = new["turns"][-1].id
+        view["turns"].extend((t.role, t.turn_number, t.content) for t in new["turns"])
+        del view["turns"][:-config.DASHBOARD_TRANSCRIPT_TURNS]
+
+    col1, col2, col3 = st.columns(3)
+    bot, user = view["latest"].get("assistant"), view["latest"].get("user")
+    with col1:
+        st.metric("Latest Turn", view["turns"][-1][1] if view["turns"] else 0)
+    with col2:
+        st.metric("Bot Discomfort", f"{bot.predicted_discomfort:.2f}" if bot else "-")
+    with col3:
+        st.metric("User Discomfort", f"{user.predicted_discomfort:.2f}" if user else "-")
+
+    st.plotly_chart(view["figure"], use_container_width=True)
+
+    st.subheader("Recent Transcript")
+    for role, turn_number, content in view["turns"]:
+        if role == "user":
+            st.markdown(f"**👤 User (Turn {turn_number}):**")
+            st.info(content)
+        else:
+            st.markdown(f"**🤖 Bot (Turn {turn_number}):**")
+            st.warning(content)
 
 st.title("🎭 Debate Bot Analytics Dashboard")
 
 # Session selector
 session_id = st.text_input("Enter Session ID to analyze:")
+live = st.toggle(
+    "Live monitor",
+    help=f"Follow a running session, refreshing every {config.DASHBOARD_REFRESH_SECONDS:g}s"
+)
+
+if session_id and live:
+    live_monitor(session_id)
 
-if session_id:
-    analytics = db.get_session_analytics(session_id)
+elif session_id:
+    # Aggregates and per-turn series come from SQL projections, not ORM rows
+    summary = db.get_session_summary(session_id)
     
-    if analytics["session"]:
-        session = analytics["session"]
-        sentiments = analytics["sentiments"]
-        turns = analytics["turns"]
+    if summary:
+        session = summary["session"]
+        bot_scores = summary["scores"].get("assistant")
+        # Bot-side scores drive the existing views; user-side scores are plotted alongside
+        series = pd.DataFrame(db.get_score_series(session_id))
+        sentiments = series[series["role"] == "assistant"]
+        user_sentiments = series[series["role"] == "user"]
+        scores_by_turn = series.set_index(["turn_number", "role"])
+        turns = pd.DataFrame(db.get_turn_columns(session_id))
         
         # Session Overview
         st.header("Session Overview")
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
-            st.metric("Total Turns", session.turn_count)
+            st.metric("Total Turns", session["turn_count"])
         with col2:
-            st.metric("Max Escalation", f"{session.max_escalation_level}/3")
+            st.metric("Max Escalation", f"{session['max_escalation_level']}/3")
         with col3:
-            duration = (session.ended_at - session.started_at).seconds if session.ended_at else 0
+            duration = (session["ended_at"] - session["started_at"]).seconds if session["ended_at"] else 0
             st.metric("Duration (min)", f"{duration // 60}")
         with col4:
-            avg_discomfort = sum(s.predicted_discomfort for s in sentiments) / len(sentiments) if sentiments else 0
+            avg_discomfort = bot_scores["avg_discomfort"] if bot_scores else 0
             st.metric("Avg Discomfort", f"{avg_discomfort:.2f}")
+        with col5:
+            st.metric(
+                "Tokens (in / out)",
+                f"{session['input_tokens'] or 0:,} / {session['output_tokens'] or 0:,}"
+            )
         
-        st.markdown(f"**Topic:** {session.topic}")
-        st.markdown(f"**User Stance:** {session.user_stance}")
-        st.markdown(f"**Bot Stance:** {session.bot_stance}")
+        st.markdown(f"**Topic:** {session['topic']}")
+        st.markdown(f"**User Stance:** {session['user_stance']}")
+        st.markdown(f"**Bot Stance:** {session['bot_stance']}")
         
         # Sentiment Timeline
         st.header("Emotional Journey")
         
-        if sentiments:
-            df_sentiment = pd.DataFrame([
-                {
-                    "turn": s.turn_number,
-                    "discomfort": s.predicted_discomfort,
-                    "arousal": s.arousal,
-                    "valence": s.valence,
-                    "toxicity": s.toxicity
-                }
-                for s in sentiments
-            ])
-            
+        if len(sentiments):
             fig = go.Figure()
             
             fig.add_trace(go.Scatter(
-                x=df_sentiment["turn"],
-                y=df_sentiment["discomfort"],
+                x=sentiments["turn_number"],
+                y=sentiments["predicted_discomfort"],
                 mode='lines+markers',
                 name='Predicted Discomfort',
                 line=dict(color='red', width=3)
             ))
             
             fig.add_trace(go.Scatter(
-                x=df_sentiment["turn"],
-                y=df_sentiment["arousal"],
+                x=sentiments["turn_number"],
+                y=sentiments["arousal"],
                 mode='lines+markers',
                 name='Arousal',
                 line=dict(color='orange', width=2)
             ))
             
             fig.add_trace(go.Scatter(
-                x=df_sentiment["turn"],
-                y=df_sentiment["valence"],
+                x=sentiments["turn_number"],
+                y=sentiments["valence"],
                 mode='lines+markers',
                 name='Valence',
                 line=dict(color='blue', width=2)
             ))
             
+            if len(user_sentiments):
+                fig.add_trace(go.Scatter(
+                    x=user_sentiments["turn_number"],
+                    y=user_sentiments["predicted_discomfort"],
+                    mode='lines+markers',
+                    name='User Discomfort',
+                    line=dict(color='purple', width=2, dash='dash')
+                ))
+            
             fig.update_layout(
                 title="Emotional Metrics Over Time",
                 xaxis_title="Turn Number",
@@ -95,13 +181,8 @@ if session_id:
             # Emotion Breakdown
             st.header("Emotion Distribution")
             
-            # Aggregate emotions across all turns
-            all_emotions = {}
-            for s in sentiments:
-                for emotion, score in s.emotions.items():
-                    all_emotions[emotion] = all_emotions.get(emotion, 0) + score
-            
-            # Normalize
+            # Mean of each emotion across all turns, normalized
+            all_emotions = db.get_emotion_means(session_id, role="assistant")
             total = sum(all_emotions.values())
             all_emotions = {k: v/total for k, v in all_emotions.items()}
             
@@ -114,26 +195,64 @@ if session_id:
             
             st.plotly_chart(fig_emotions, use_container_width=True)
         
+        # Token Usage - prompts carry the full history, so input tokens grow each turn
+        bot_turns = turns[(turns["role"] == "assistant") & turns["input_tokens"].notna()] if len(turns) else turns
+        if len(bot_turns):
+            st.header("Token Usage")
+            
+            fig_tokens = go.Figure()
+            fig_tokens.add_trace(go.Bar(
+                x=bot_turns["turn_number"],
+                y=bot_turns["input_tokens"],
+                name='Input Tokens'
+            ))
+            fig_tokens.add_trace(go.Bar(
+                x=bot_turns["turn_number"],
+                y=bot_turns["output_tokens"],
+                name='Output Tokens'
+            ))
+            fig_tokens.update_layout(
+                title="Tokens per Turn",
+                xaxis_title="Turn Number",
+                yaxis_title="Tokens",
+                barmode='stack'
+            )
+            
+            st.plotly_chart(fig_tokens, use_container_width=True)
+        
         # Conversation Transcript
         st.header("Conversation Transcript")
         
-        for turn in turns:
+        for turn in turns.itertuples():
+            sent = (
+                scores_by_turn.loc[(turn.turn_number, turn.role)]
+                if (turn.turn_number, turn.role) in scores_by_turn.index else None
+            )
+            
             if turn.role == "user":
                 st.markdown(f"**👤 User (Turn {turn.turn_number}):**")
-                st.info(turn.content)
+                
+                if sent is not None:
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.info(turn.content)
+                    with col2:
+                        st.metric("Discomfort", f"{sent['predicted_discomfort']:.2f}")
+                        st.metric("Toxicity", f"{sent['toxicity']:.2f}")
+                else:
+                    st.info(turn.content)
             else:
                 st.markdown(f"**🤖 Bot (Turn {turn.turn_number}):**")
                 
-                # Find corresponding sentiment
-                sent = next((s for s in sentiments if s.turn_number == turn.turn_number), None)
-                
-                if sent:
+                if sent is not None:
                     col1, col2 = st.columns([3, 1])
                     with col1:
                         st.warning(turn.content)
                     with col2:
-                        st.metric("Discomfort", f"{sent.predicted_discomfort:.2f}")
-                        st.metric("Toxicity", f"{sent.toxicity:.2f}")
+                        st.metric("Discomfort", f"{sent['predicted_discomfort']:.2f}")
+                        st.metric("Toxicity", f"{sent['toxicity']:.2f}")
+                        if pd.notna(turn.input_tokens):
+                            st.caption(f"{int(turn.input_tokens):,} in / {int(turn.output_tokens):,} out tokens")
                 else:
                     st.warning(turn.content)
         
@@ -143,35 +262,43 @@ if session_id:
         if st.button("Download Session Data as JSON"):
             import json
             
+            # The export carries every record, so it loads the full rows
+            analytics = db.get_session_analytics(session_id)
+            
             export_data = {
                 "session": {
-                    "id": session.id,
-                    "topic": session.topic,
-                    "user_stance": session.user_stance,
-                    "bot_stance": session.bot_stance,
-                    "turn_count": session.turn_count,
-                    "started_at": session.started_at.isoformat(),
-                    "ended_at": session.ended_at.isoformat() if session.ended_at else None
+                    "id": session["id"],
+                    "topic": session["topic"],
+                    "user_stance": session["user_stance"],
+                    "bot_stance": session["bot_stance"],
+                    "turn_count": session["turn_count"],
+                    "input_tokens": session["input_tokens"],
+                    "output_tokens": session["output_tokens"],
+                    "started_at": session["started_at"].isoformat(),
+                    "ended_at": session["ended_at"].isoformat() if session["ended_at"] else None
                 },
                 "turns": [
                     {
                         "turn_number": t.turn_number,
                         "role": t.role,
                         "content": t.content,
+                        "input_tokens": t.input_tokens,
+                        "output_tokens": t.output_tokens,
                         "timestamp": t.timestamp.isoformat()
                     }
-                    for t in turns
+                    for t in analytics["turns"]
                 ],
                 "sentiments": [
                     {
                         "turn_number": s.turn_number,
+                        "role": s.role,
                         "predicted_discomfort": s.predicted_discomfort,
                         "arousal": s.arousal,
                         "valence": s.valence,
                         "toxicity": s.toxicity,
                         "emotions": s.emotions
                     }
-                    for s in sentiments
+                    for s in analytics["sentiments"]
                 ]
             }
             
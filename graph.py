@@ -5,16 +5,32 @@ from nodes.debate_nodes import (
     calibration_node, 
     gentle_push_node, 
     escalation_node,
-    deescalation_node
+    deescalation_node,
+    safe_response_node
 )
 from nodes.analysis_nodes import (
+    input_screening_node,
     sentiment_analysis_node,
     safety_check_node,
     metrics_calculation_node,
     persistence_node
 )
+from utils.tracing import tracer
 from config import config
 
+def route_after_screening(state: DebateState) -> str:
+    """
+    Skip the normal generation path for user messages screening flagged
+    """
+    
+    action = (state.get("screening") or {}).get("action")
+    if action == "safe_response":
+        return "safe_response"
+    if action == "deescalate":
+        return "deescalation"
+    
+    return "continue"
+
 def route_debate_phase(state: DebateState) -> str:
     """
     Route to appropriate debate phase based on turn count and state
@@ -46,10 +62,13 @@ def route_after_safety(state: DebateState) -> str:
     """
     
     if state.get("should_stop", False):
+        # The safe response to confirmed crisis language is still recorded before the session ends
+        if (state.get("screening") or {}).get("action") == "safe_response":
+            return "continue"
         return "end"
     
-    # If de-escalation phase was triggered
-    if state.get("phase") == "deescalation":
+    # If the safety check asked for de-escalation of this reply
+    if state.get("deescalation_requested", False):
         return "deescalation"
     
     return "continue"
@@ -64,6 +83,20 @@ def route_continue(state: DebateState) -> str:
     
     return "await_user"
 
+def traced(name: str, node):
+    """
+    Run a node in a trace span tagged with the turn it works on
+    """
+    return tracer.wrap(
+        f"node.{name}",
+        attributes=lambda state: {
+            "session_id": state.get("session_id"),
+            "turn": state.get("turn_count"),
+            "phase": state.get("phase"),
+            "escalation_level": state.get("escalation_level")
+        }
+    )(node)
+
 def create_debate_graph():
     """
     Construct the full debate graph with all nodes and edges
@@ -72,17 +105,29 @@ def create_debate_graph():
     workflow = StateGraph(DebateState)
     
     # Add all nodes
-    workflow.add_node("calibration", calibration_node)
-    workflow.add_node("gentle_push", gentle_push_node)
-    workflow.add_node("escalation", escalation_node)
-    workflow.add_node("deescalation", deescalation_node)
-    workflow.add_node("sentiment_analysis", sentiment_analysis_node)
-    workflow.add_node("safety_check", safety_check_node)
-    workflow.add_node("metrics", metrics_calculation_node)
-    workflow.add_node("persistence", persistence_node)
-    
-    # Set entry point
-    workflow.set_entry_point("calibration")
+    workflow.add_node("input_screening", traced("input_screening", input_screening_node))
+    workflow.add_node("calibration", traced("calibration", calibration_node))
+    workflow.add_node("gentle_push", traced("gentle_push", gentle_push_node))
+    workflow.add_node("escalation", traced("escalation", escalation_node))
+    workflow.add_node("deescalation", traced("deescalation", deescalation_node))
+    workflow.add_node("safe_response", traced("safe_response", safe_response_node))
+    workflow.add_node("sentiment_analysis", traced("sentiment_analysis", sentiment_analysis_node))
+    workflow.add_node("safety_check", traced("safety_check", safety_check_node))
+    workflow.add_node("metrics", traced("metrics", metrics_calculation_node))
+    workflow.add_node("persistence", traced("persistence", persistence_node))
+    
+    # Set entry point: the user's message is screened before anything is generated
+    workflow.set_entry_point("input_screening")
+    
+    workflow.add_conditional_edges(
+        "input_screening",
+        route_after_screening,
+        {
+            "continue": "calibration",
+            "deescalation": "deescalation",
+            "safe_response": "safe_response"
+        }
+    )
     
     # Main debate flow with conditional routing
     workflow.add_conditional_edges(
@@ -119,6 +164,7 @@ def create_debate_graph():
     )
     
     workflow.add_edge("deescalation", "sentiment_analysis")
+    workflow.add_edge("safe_response", "sentiment_analysis")
     
     # Analysis pipeline
     workflow.add_edge("sentiment_analysis", "safety_check")
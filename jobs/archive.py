@@ -0,0 +1,62 @@
+# jobs/archive.py
+"""
+Move ended sessions out of the hot tables.
+
+Sessions whose `ended_at` is older than the retention threshold have their
+`debate_turns`, `sentiment_records` and `session_checkpoints` rows packed into a
+single zlib-compressed row in `archived_sessions` and deleted from the hot
+tables, one transaction per session. The `debate_sessions` row stays (marked
+with `archived_at`), and `get_session_analytics` reads archived sessions back
+transparently. Safe to interrupt and re-run.
+
+Usage:
+    python -m jobs.archive --days 30
+"""
+from models.database import DatabaseManager
+from config import config
+from datetime import datetime, timedelta
+from typing import Dict
+import argparse
+import time
+
+def archive(db: DatabaseManager, older_than_days: int = None, batch_size: int = None) -> Dict:
+    """
+    Archive every eligible session, returning session, row and byte totals
+    """
+    days = config.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    # ended_at is written in local time (DebateBot uses datetime.now())
+    cutoff = datetime.now() - timedelta(days=days)
+
+    totals = {"sessions": 0, "rows": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    while True:
+        session_ids = db.get_sessions_to_archive(cutoff, batch_size)
+        if not session_ids:
+            break
+
+        for session_id in session_ids:
+            moved = db.archive_session(session_id)
+            totals["sessions"] += 1
+            for key in ("rows", "raw_bytes", "compressed_bytes"):
+                totals[key] += moved[key]
+
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive ended debate sessions")
+    parser.add_argument("--days", type=int, default=config.ARCHIVE_AFTER_DAYS,
+                        help="Archive sessions that ended more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=config.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    totals = archive(DatabaseManager(args.database_url), args.days, args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    ratio = totals["raw_bytes"] / totals["compressed_bytes"] if totals["compressed_bytes"] else 0
+    print(f"Archived {totals['sessions']} sessions ({totals['rows']} rows) in {elapsed:.1f}s; "
+          f"{totals['raw_bytes'] / 1024:.0f} KB -> {totals['compressed_bytes'] / 1024:.0f} KB ({ratio:.1f}x)")
+
+if __name__ == "__main__":
+    main()
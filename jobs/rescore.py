@@ -0,0 +1,143 @@
+# jobs/rescore.py
+"""
+Re-score historical debate turns after a sentiment/toxicity model or weight change.
+
+Streams user and assistant turns from `debate_turns` in primary-key order, fans chunks out
+to a process pool (each worker loads the models once) and bulk upserts the results
+into `sentiment_records` under a model-version tag. Progress is checkpointed to a
+JSON file so an interrupted run picks up where it stopped.
+
+Usage:
+    python -m jobs.rescore --model-version v2 --checkpoint rescore_v2.json
+"""
+from concurrent.futures import ProcessPoolExecutor
+from models.database import DatabaseManager
+from config import config
+from typing import List, Tuple
+import argparse
+import json
+import os
+import time
+
+SCORE_FIELDS = [
+    "polarity", "subjectivity", "emotions", "arousal",
+    "valence", "toxicity", "predicted_discomfort"
+]
+
+_analyzer = None
+
+def _init_worker():
+    """Load the models once per worker process"""
+    global _analyzer
+    from utils.sentiment import sentiment_analyzer
+    _analyzer = sentiment_analyzer
+
+def _score_chunk(rows: List[Tuple], model_version: str) -> List[dict]:
+    """Score one chunk of (id, session_id, turn_number, role, content) rows as a single batch"""
+    results = _analyzer.analyze_batch([row[4] for row in rows])
+    records = []
+    for (_, session_id, turn_number, role, _), sentiment_data in zip(rows, results):
+        record = {field: sentiment_data[field] for field in SCORE_FIELDS}
+        record.update(
+            session_id=session_id,
+            turn_number=turn_number,
+            role=role,
+            model_version=model_version
+        )
+        records.append(record)
+    return records
+
+def _load_checkpoint(path: str, model_version: str) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("model_version") != model_version:
+        return 0
+    return checkpoint.get("last_turn_id", 0)
+
+def _save_checkpoint(path: str, model_version: str, last_turn_id: int):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"model_version": model_version, "last_turn_id": last_turn_id}, f)
+    os.replace(tmp_path, path)
+
+def rescore(
+    db: DatabaseManager,
+    model_version: str = None,
+    checkpoint_path: str = None,
+    chunk_size: int = None,
+    workers: int = None
+) -> int:
+    """
+    Re-score every turn newer than the checkpoint. Returns rows written.
+    """
+    model_version = model_version or config.SCORING_MODEL_VERSION
+    chunk_size = chunk_size or config.RESCORE_CHUNK_SIZE
+    workers = workers or config.RESCORE_WORKERS
+
+    last_id = _load_checkpoint(checkpoint_path, model_version)
+    read_id = last_id
+    written = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # Keep a bounded window in flight; results are consumed in submission
+        # order so the checkpoint only ever advances past fully written chunks
+        pending = []
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                rows = db.get_turns_after(read_id, chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                read_id = rows[-1][0]
+                pending.append((read_id, pool.submit(_score_chunk, rows, model_version)))
+
+            if not pending:
+                break
+
+            chunk_last_id, future = pending.pop(0)
+            records = future.result()
+            db.upsert_sentiments(records)
+
+            last_id = chunk_last_id
+            written += len(records)
+            _save_checkpoint(checkpoint_path, model_version, last_id)
+
+            elapsed = time.perf_counter() - started
+            print(f"[rescore] {written} rows, last id {last_id}, "
+                  f"{written / elapsed if elapsed else 0:.1f} rows/s")
+
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score historical debate turns")
+    parser.add_argument("--model-version", default=config.SCORING_MODEL_VERSION)
+    parser.add_argument("--checkpoint", default="rescore_checkpoint.json")
+    parser.add_argument("--chunk-size", type=int, default=config.RESCORE_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=config.RESCORE_WORKERS)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.database_url)
+
+    started = time.perf_counter()
+    written = rescore(
+        db,
+        model_version=args.model_version,
+        checkpoint_path=args.checkpoint,
+        chunk_size=args.chunk_size,
+        workers=args.workers
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"Re-scored {written} rows in {elapsed:.1f}s "
+          f"({written / elapsed if elapsed else 0:.1f} rows/s) as '{args.model_version}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# jobs/simulate.py
+"""
+Headless debate simulations over a topic x stance x persona grid.
+
+A JSON spec lists topics (each with stance pairs) and simulated participants:
+scripted personas cycle through message templates, LLM personas are played by
+the "persona" model tier from a prompt. Every combination runs `repeats` times.
+
+Debates go through the normal DebateBot pipeline (scoring, safety, checkpoints,
+turns and sentiment rows), many at once on a thread pool, so throughput is set
+by the model gateway's limits rather than by this job. The planned runs are
+registered in `simulation_runs` in one bulk insert, and each run records its
+session and status as it goes. Rerunning the same spec skips completed runs
+and continues interrupted ones from their last checkpointed turn.
+
+A run is claimed with a conditional UPDATE before it starts, so several
+processes can work through the same spec without running a debate twice.
+Ctrl-C stops every debate after its current turn and hands the runs back.
+
+Spec:
+    {
+      "name": "escalation-grid",
+      "turns": 10,
+      "repeats": 3,
+      "topics": [
+        {"topic": "gun control", "stances": [
+          {"user": "I support stricter gun laws", "bot": "I support second amendment rights"}
+        ]}
+      ],
+      "personas": [
+        {"name": "stubborn", "messages": ["I still think {stance}.", "Turn {turn} and you haven't moved me on {topic}."]},
+        {"name": "persuadable", "prompt": "You are open-minded and concede points that convince you."}
+      ]
+    }
+
+Usage:
+    python -m jobs.simulate spec.json --concurrency 32
+    python -m jobs.simulate spec.json --retry-failed --database-url postgresql://...
+    LLM_BACKEND=stub python -m jobs.simulate spec.json --database-url sqlite:///sim.db
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from config import config
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+PERSONA_PROMPT = """You are a participant in a debate about {topic}.
+
+PHASE: Persona
+
+Your position: {stance}
+{prompt}
+
+Reply as this person would in a chat: 1-3 sentences, no role labels."""
+
+def run_key(topic: str, user_stance: str, bot_stance: Optional[str], persona: str, repeat: int) -> str:
+    """Stable key for one grid cell, so reordering the spec doesn't change it"""
+    cell = json.dumps([topic, user_stance, bot_stance, persona, repeat])
+    return hashlib.sha1(cell.encode("utf-8")).hexdigest()[:20]
+
+def expand_spec(spec: Dict) -> List[Dict]:
+    """One run per topic, stance pair, persona and repeat"""
+    runs = []
+    for topic in spec["topics"]:
+        for stance in topic["stances"]:
+            for persona in spec["personas"]:
+                for repeat in range(spec.get("repeats", 1)):
+                    runs.append({
+                        "run_key": run_key(topic["topic"], stance["user"], stance.get("bot"), persona["name"], repeat),
+                        "topic": topic["topic"],
+                        "user_stance": stance["user"],
+                        "bot_stance": stance.get("bot"),
+                        "persona": persona["name"],
+                        "repeat": repeat
+                    })
+    return runs
+
+class Persona:
+    """A simulated participant: the next message given the debate so far"""
+
+    def __init__(self, spec: Dict):
+        self.name = spec["name"]
+        self.messages = spec.get("messages")
+        self.prompt = spec.get("prompt", "")
+        if not self.messages and not self.prompt:
+            raise ValueError(f"Persona {self.name!r} needs either messages or a prompt")
+
+    def next_message(self, state: Dict, turn: int, tenant: str) -> str:
+        if self.messages:
+            template = self.messages[turn % len(self.messages)]
+            return template.format(topic=state["topic"], stance=state["user_stance"], turn=turn + 1)
+
+        from nodes.debate_nodes import router
+
+        # The model plays the user, so the transcript is seen from their side
+        messages = [
+            SystemMessage(content=PERSONA_PROMPT.format(
+                topic=state["topic"], stance=state["user_stance"], prompt=self.prompt
+            )),
+            HumanMessage(content=f"Start the debate by stating your view on {state['topic']}.")
+        ]
+        for message in state["messages"]:
+            if isinstance(message, HumanMessage):
+                messages.append(AIMessage(content=message.content))
+            elif isinstance(message, AIMessage):
+                messages.append(HumanMessage(content=message.content))
+
+        return router.invoke("persona", messages, tenant=tenant).content
+
+def run_debate(graph, db, simulation: str, run: Dict, persona: Persona, turns: int,
+               owner: str, stop: threading.Event) -> Tuple[int, int, bool]:
+    """
+    Run (or continue) one claimed debate until it ends or `stop` is set;
+    returns the user messages in the debate, how many of them this call sent,
+    and whether the debate is finished
+    """
+    from main import DebateBot
+
+    bot = DebateBot(graph=graph, db=db)
+    # A tenant per debate, so debates don't share one tenant's concurrency limit
+    user_id = f"sim:{simulation}:{run['run_key']}"
+
+    if run["session_id"]:
+        bot.resume(run["session_id"])
+    else:
+        bot.start_debate(run["topic"], run["user_stance"], run["bot_stance"], user_id=user_id)
+        db.update_simulation_run(simulation, run["run_key"], owner=owner, session_id=bot.session_id)
+
+    def finished() -> bool:
+        state = bot.current_state
+        return state.get("should_stop", False) or state["turn_count"] >= config.MAX_TURNS
+
+    # Turns already in the checkpoint are not repeated
+    resumed_at = sent = sum(isinstance(m, HumanMessage) for m in bot.current_state["messages"])
+    while sent < turns and not finished():
+        if stop.is_set():
+            return sent, sent - resumed_at, False
+        bot.send_message(persona.next_message(bot.current_state, sent, user_id))
+        sent += 1
+        # Also keeps the claim fresh; a claim taken over as stale stops here
+        if not db.update_simulation_run(simulation, run["run_key"], owner=owner, turns=sent):
+            return sent, sent - resumed_at, False
+
+    bot.end_debate()
+    return sent, sent - resumed_at, True
+
+def play_run(graph, db, simulation: str, run: Dict, persona: Persona, turns: int,
+             statuses: List[str], owner: str, stop: threading.Event) -> Tuple[Optional[str], int]:
+    """
+    Claim a run and play it; returns its new status (None if it was stopped
+    or not claimed) and the turns sent
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=config.SIMULATION_CLAIM_TIMEOUT)
+    if stop.is_set():
+        return None, 0
+    # Re-read on claim: another process may have started it since the runs were listed
+    run = db.claim_simulation_run(simulation, run["run_key"], statuses, owner, stale_before)
+    if run is None:
+        return None, 0
+
+    try:
+        run_turns, new_turns, finished = run_debate(graph, db, simulation, run, persona, turns, owner, stop)
+    except Exception as e:
+        db.update_simulation_run(
+            simulation, run["run_key"], owner=owner, status="failed", claimed_by=None, error=f"{type(e).__name__}: {e}"
+        )
+        return "failed", 0
+
+    if finished:
+        db.update_simulation_run(
+            simulation, run["run_key"], owner=owner, status="completed", claimed_by=None, turns=run_turns, error=None
+        )
+        return "completed", new_turns
+
+    # Stopped: hand the run back, to continue from its checkpoint next time
+    db.update_simulation_run(simulation, run["run_key"], owner=owner, status="pending", claimed_by=None)
+    return None, new_turns
+
+def simulate(db, spec: Dict, concurrency: int = None, retry_failed: bool = False,
+             stop: threading.Event = None) -> Dict[str, int]:
+    """
+    Run every unfinished run of the spec that no other process holds; returns
+    run counts by status. Setting `stop` ends each debate after its current turn.
+    """
+    from graph import create_debate_graph
+
+    simulation = spec["name"]
+    turns = spec.get("turns", config.MAX_TURNS)
+    personas = {p["name"]: Persona(p) for p in spec["personas"]}
+    stop = stop or threading.Event()
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    added = db.add_simulation_runs(simulation, expand_spec(spec))
+    statuses = ["pending"] + (["failed"] if retry_failed else [])
+    # Running runs are listed too; they are only claimed once stale. Runs of
+    # personas since dropped from the spec are left as they are
+    runs = [
+        run for run in db.get_simulation_runs(simulation, statuses + ["running"])
+        if run["persona"] in personas
+    ]
+    print(f"[simulate] {simulation}: {added} new runs, {len(runs)} to run")
+
+    graph = create_debate_graph()
+    started = time.perf_counter()
+    done = sent = 0
+    last_report = started
+
+    with ThreadPoolExecutor(max_workers=concurrency or config.SIMULATION_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(play_run, graph, db, simulation, run, personas[run["persona"]], turns, statuses, owner, stop)
+            for run in runs
+        ]
+        try:
+            for future in as_completed(futures):
+                _, new_turns = future.result()
+                sent += new_turns
+                done += 1
+                now = time.perf_counter()
+                if now - last_report >= 5 or done == len(runs):
+                    elapsed = now - started
+                    print(f"[simulate] {done}/{len(runs)} debates, {sent} turns, "
+                          f"{done / elapsed:.2f} debates/s, {sent / elapsed:.1f} turns/s")
+                    last_report = now
+        except KeyboardInterrupt:
+            # Debates in flight finish their current turn and hand their runs back
+            print("[simulate] Stopping after the turns in flight...")
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return db.get_simulation_progress(simulation)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless debate simulations from a spec file")
+    parser.add_argument("spec", help="JSON spec of topics, stances and personas")
+    parser.add_argument("--concurrency", type=int, default=config.SIMULATION_CONCURRENCY, help="Debates in flight")
+    parser.add_argument("--retry-failed", action="store_true", help="Also rerun failed runs (from their checkpoint)")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    # Configure before the graph modules build their DB handles
+    if args.database_url:
+        config.DATABASE_URL = args.database_url
+
+    from models.database import DatabaseManager
+    from nodes.debate_nodes import router
+
+    db = DatabaseManager(args.database_url)
+
+    started = time.perf_counter()
+    progress = simulate(db, spec, args.concurrency, args.retry_failed)
+    elapsed = time.perf_counter() - started
+
+    print(f"\nFinished in {elapsed:.1f}s: " + ", ".join(f"{count} {status}" for status, count in sorted(progress.items())))
+    for tier, m in router.metrics().items():
+        if m["calls"]:
+            print(f"  {tier:<10} {m['calls']:>6} calls  p50 {m['p50_ms']:.0f} ms  "
+                  f"{m['input_tokens'] + m['output_tokens']} tokens  ${m['cost']:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,30 @@
 from graph import create_debate_graph
 from models.state import DebateState
 from models.database import DatabaseManager
+from models.checkpoint import create_state_store, StaleStateError
+from models.score_history import ScoreHistory
+from utils.llm_gateway import LLMGatewayError
+from utils.token_budget import token_budget
+from utils.inference_pool import inference_pool
+from utils.tracing import tracer
+from utils.idempotency import idempotent_turns
 from langchain_core.messages import HumanMessage
 import uuid
 from datetime import datetime
 from config import config
 
+class SessionEndedError(Exception):
+    """A message was sent to a debate session that has already ended"""
+
 class DebateBot:
-    def __init__(self):
-        self.graph = create_debate_graph()
-        self.db = DatabaseManager()
+    def __init__(self, graph=None, db: DatabaseManager = None):
+        # A compiled graph and database can be shared by many bots in one process
+        self.graph = graph or create_debate_graph()
+        self.db = db or DatabaseManager()
+        self.state_store = create_state_store(self.db)
         self.current_state = None
         self.session_id = None
+        self.state_version = 0  # Store version current_state was loaded at / saved as
     
     def start_debate(self, topic: str, user_stance: str, bot_stance: str = None, user_id: str = None):
         """
@@ -40,48 +53,146 @@ class DebateBot:
             "topic": topic,
             "user_stance": user_stance,
             "bot_stance": bot_stance,
+            # Embedded once, for scoring each user message against both sides
+            "stance_embeddings": inference_pool.embed([user_stance, bot_stance]).round(5).tolist(),
             "escalation_level": 0,
             "turn_count": 0,
             "phase": "calibration",
-            "sentiment_scores": [],
+            "sentiment_scores": ScoreHistory(),
             "conversation_metrics": {
                 "avg_response_length": 0,
                 "linguistic_complexity": 0,
                 "engagement_score": 0,
                 "contradiction_count": 0,
-                "concession_count": 0
+                "concession_count": 0,
+                "stance_alignment": 0.0
             },
+            "user_statements": [],
             "safety_violations": [],
             "should_stop": False,
+            "deescalation_requested": False,
+            "distress": {},
+            "token_usage": {"input_tokens": 0, "output_tokens": 0},
+            "context_window": None,
+            "idempotency_key": None,
             "session_id": self.session_id,
             "user_id": user_id,
             "started_at": datetime.now().isoformat()
         }
+        self.state_version = self.state_store.save(self.current_state, 0)
         
         return self.session_id
     
-    def send_message(self, user_message: str) -> str:
+    def resume(self, session_id: str):
         """
-        Process user message and get bot response
+        Continue an existing debate session from its latest checkpoint
+        """
+        
+        state, version = self.state_store.load(session_id)
+        
+        if state is None:
+            raise ValueError(f"No checkpoint found for session {session_id}")
+        
+        self.session_id = session_id
+        self.current_state = state
+        self.state_version = version
+        
+        return self.session_id
+    
+    def is_ended(self) -> bool:
+        """
+        Whether the session has ended (stopped by safety or the token budget, or out of turns)
+        """
+        return self.current_state.get("should_stop", False) or self.current_state["turn_count"] >= config.MAX_TURNS
+    
+    def sync(self):
+        """
+        Reload the session if another worker has advanced it since we last saw it
+        """
+        
+        if self.state_store.version(self.session_id) != self.state_version:
+            self.resume(self.session_id)
+    
+    def send_message(self, user_message: str, idempotency_key: str = None) -> str:
+        """
+        Process user message and get bot response.
+        
+        With an idempotency key, resending the message with the same key (a
+        client retry) returns the first send's reply instead of taking another
+        turn, whether the first send has finished or is still running.
         """
         
         if not self.current_state:
             raise ValueError("No active debate session. Call start_debate() first.")
         
-        # Add user message to state
-        self.current_state["messages"].append(HumanMessage(content=user_message))
+        if idempotency_key is None:
+            return self._take_turn(user_message)
+        
+        result, replayed = idempotent_turns.run(
+            self.db, self.session_id, idempotency_key, user_message,
+            send=lambda: {"response": self._take_turn(user_message, idempotency_key)},
+            recover=lambda: self._recover_turn(idempotency_key)
+        )
+        if replayed:
+            # The turn may have been taken by another bot or process
+            self.sync()
+        return result["response"]
+    
+    def _recover_turn(self, idempotency_key: str):
+        """
+        The reply of the latest saved turn if it was produced by this key, else None
+        """
+        self.sync()
+        if self.current_state.get("idempotency_key") != idempotency_key:
+            return None
+        
+        bot_response = self.current_state["messages"][-1].content
+        if self.is_ended():
+            bot_response += "\n\n[Debate session ended]"
+        return {"response": bot_response}
+    
+    def _take_turn(self, user_message: str, idempotency_key: str = None) -> str:
+        with tracer.trace(
+            "send_message",
+            session_id=self.session_id,
+            turn=self.current_state["turn_count"] + 1,
+            phase=self.current_state["phase"],
+            escalation_level=self.current_state["escalation_level"]
+        ) as span:
+            bot_response = self._send_message(user_message, idempotency_key)
+            span.set(
+                phase_after=self.current_state["phase"],
+                escalation_after=self.current_state["escalation_level"]
+            )
+        return bot_response
+    
+    def _send_message(self, user_message: str, idempotency_key: str = None) -> str:
+        if self.is_ended():
+            raise SessionEndedError(f"Debate session {self.session_id} has ended")
         
-        # Run graph
-        result = self.graph.invoke(self.current_state)
+        # Claim the next version before spending anything, so a message racing
+        # another worker on the same session fails here rather than after its
+        # model calls and row writes; the claim is saved over or released below
+        claim = self.state_store.claim(self.session_id, self.state_version)
+        try:
+            result = self._run_turn(user_message, idempotency_key, claim)
+        except StaleStateError:
+            # The claim was presumed dead and taken over; pick up the session's state instead
+            self.resume(self.session_id)
+            raise
+        except BaseException:
+            self.state_store.release(self.session_id, self.state_version, claim)
+            raise
+        if result is None:
+            return "[Token budget reached - debate session ended]"
         
-        # Update current state
         self.current_state = result
         
         # Get bot's response
         bot_response = result["messages"][-1].content
         
         # Check if conversation should end
-        if result.get("should_stop", False) or result["turn_count"] >= config.MAX_TURNS:
+        if self.is_ended():
             self.db.update_session(
                 session_id=self.session_id,
                 ended_at=datetime.now()
@@ -90,12 +201,48 @@ class DebateBot:
         
         return bot_response
     
+    def _run_turn(self, user_message: str, idempotency_key: str, claim: str):
+        """
+        Run the graph for one message and save the result in the claimed
+        version; None if the token budget ended the session instead
+        """
+        # Enforce token budgets before spending any more
+        budget_status = token_budget.check(self.current_state, self.db)
+        if budget_status == "exceeded":
+            self.current_state["should_stop"] = True
+            self.current_state["idempotency_key"] = idempotency_key
+            self.state_version = self.state_store.save(self.current_state, self.state_version, claim=claim)
+            self.db.update_session(session_id=self.session_id, ended_at=datetime.now())
+            return None
+        if budget_status == "trim":
+            self.current_state["context_window"] = config.TOKEN_BUDGET_TRIM_MESSAGES
+        
+        # Run graph on a copy with the user message added, so a failed turn
+        # leaves the session as it was and the message can be resent
+        turn_state = {
+            **self.current_state,
+            "messages": self.current_state["messages"] + [HumanMessage(content=user_message)],
+            "turn_usage": {"input_tokens": 0, "output_tokens": 0}
+        }
+        result = self.graph.invoke(turn_state)
+        
+        # Save with the key, so a takeover can tell this turn landed
+        result["idempotency_key"] = idempotency_key
+        self.state_version = self.state_store.save(result, self.state_version, claim=claim)
+        return result
+    
     def get_session_analytics(self):
         """
         Retrieve analytics for current session
         """
         return self.db.get_session_analytics(self.session_id)
     
+    def get_session_summary(self):
+        """
+        Session fields and per-role score aggregates for current session
+        """
+        return self.db.get_session_summary(self.session_id)
+    
     def end_debate(self):
         """
         Manually end the debate
@@ -153,6 +300,9 @@ def main():
                 print(f"\n[Metrics - Discomfort: {last_sentiment['predicted_discomfort']:.2f}, "
                       f"Arousal: {last_sentiment['arousal']:.2f}]")
             
+        except LLMGatewayError as e:
+            print(f"\nThe model is temporarily unavailable ({e}). Please try again.")
+        
         except Exception as e:
             print(f"\nError: {e}")
             break
@@ -160,16 +310,21 @@ def main():
     # Show final analytics
     print("\n" + "=" * 50)
     print("SESSION SUMMARY")
-    analytics = bot.get_session_analytics()
+    summary = bot.get_session_summary()
+    session = summary["session"]
+    bot_scores = summary["scores"].get("assistant")
+    user_scores = summary["scores"].get("user")
     
-    if analytics["sentiments"]:
-        avg_discomfort = sum(s.predicted_discomfort for s in analytics["sentiments"]) / len(analytics["sentiments"])
-        max_discomfort = max(s.predicted_discomfort for s in analytics["sentiments"])
-        
-        print(f"Total turns: {analytics['session'].turn_count}")
-        print(f"Average discomfort: {avg_discomfort:.2f}")
-        print(f"Peak discomfort: {max_discomfort:.2f}")
-        print(f"Max escalation level: {analytics['session'].max_escalation_level}")
+    if bot_scores:
+        print(f"Total turns: {session['turn_count']}")
+        print(f"Average discomfort: {bot_scores['avg_discomfort']:.2f}")
+        print(f"Peak discomfort: {bot_scores['peak_discomfort']:.2f}")
+        print(f"Max escalation level: {session['max_escalation_level']}")
+        print(f"Tokens used: {session['input_tokens'] or 0:,} in / "
+              f"{session['output_tokens'] or 0:,} out")
+    
+    if user_scores:
+        print(f"Average user discomfort: {user_scores['avg_discomfort']:.2f}")
     
     print(f"\nView detailed analytics in dashboard with session ID: {session_id}")
 
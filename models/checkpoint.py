@@ -0,0 +1,261 @@
+# models/checkpoint.py
+from abc import ABC, abstractmethod
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from models.state import DebateState
+from models.score_history import ScoreHistory
+from models.database import DatabaseManager
+from config import config
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import uuid
+
+# Fields that only ever grow (operator.add reducers) - checkpointed as appended tails
+APPEND_FIELDS = ["messages", "sentiment_scores", "safety_violations", "user_statements"]
+
+# Fields that change from turn to turn - small enough to store whole
+SCALAR_FIELDS = [
+    "escalation_level", "turn_count", "phase",
+    "conversation_metrics", "should_stop", "deescalation_requested", "distress",
+    "token_usage", "context_window", "idempotency_key"
+]
+
+# Fields fixed for the lifetime of a session - stored once in the first checkpoint
+SESSION_FIELDS = [
+    "topic", "user_stance", "bot_stance", "stance_embeddings",
+    "session_id", "user_id", "started_at"
+]
+
+class StaleStateError(Exception):
+    """The session was advanced by someone else since this state was loaded"""
+
+def fold_deltas(deltas: List[Dict]) -> DebateState:
+    """
+    Rebuild a DebateState from checkpoint deltas (or a single full snapshot)
+    """
+    state = {field: [] for field in APPEND_FIELDS}
+    # Score rows are collected as plain lists and packed into arrays once at the end
+    for delta in deltas:
+        for key, value in delta.items():
+            if key == "messages":
+                state["messages"].extend(messages_from_dict(value))
+            elif key in APPEND_FIELDS:
+                state[key].extend(value)
+            elif not key.startswith("_"):
+                state[key] = value
+
+    state["sentiment_scores"] = ScoreHistory.from_rows(state["sentiment_scores"])
+    return state
+
+def append_lengths(state: DebateState) -> Dict[str, int]:
+    return {field: len(state.get(field, [])) for field in APPEND_FIELDS}
+
+class StateStore(ABC):
+    """
+    Versioned session state, so any worker can load, advance and save a session.
+
+    Versions count saves per session (0 = never saved). `save` is a
+    compare-and-set: it only succeeds if the stored version still equals
+    `expected_version`, otherwise it raises StaleStateError and nothing is written.
+
+    A turn claims the next version before running, so of two workers racing
+    on a session only one runs the graph (and pays for its model calls and
+    rows); the other gets StaleStateError from `claim`. The claim is saved
+    over by `save(..., claim=...)` or dropped by `release`. A claim older than
+    STATE_CLAIM_TIMEOUT is taken over, as its process presumably died.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Tuple[Optional[DebateState], int]:
+        """The latest state and its version, or (None, 0)"""
+
+    @abstractmethod
+    def claim(self, session_id: str, expected_version: int) -> str:
+        """Reserve the version after `expected_version` for a turn; returns the claim token"""
+
+    @abstractmethod
+    def save(self, state: DebateState, expected_version: int, claim: str = None) -> int:
+        """Store the state on top of `expected_version` (in its claimed version) and return the new version"""
+
+    @abstractmethod
+    def release(self, session_id: str, expected_version: int, claim: str):
+        """Give up a claim without saving"""
+
+    @abstractmethod
+    def version(self, session_id: str) -> int:
+        """The latest version, without loading the state"""
+
+class StateCheckpointer(StateStore):
+    """
+    Durable per-turn checkpoints of DebateState.
+
+    Each checkpoint stores only what changed since the previous one (new messages,
+    new sentiment scores, new violations and the scalar fields), so write size stays
+    constant as the conversation grows. A session is restored by folding its deltas,
+    which are fetched in a single query.
+
+    Checkpoint versions are unique per session, so when two workers save on
+    top of the same version only the first insert wins.
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        # session_id -> (version, number of items checkpointed per append field)
+        self._lengths: Dict[str, Tuple[int, Dict[str, int]]] = {}
+
+    def claim(self, session_id: str, expected_version: int) -> str:
+        token = uuid.uuid4().hex
+        stale_before = datetime.utcnow() - timedelta(seconds=config.STATE_CLAIM_TIMEOUT)
+        if not self.db.claim_checkpoint(session_id, expected_version + 1, token, stale_before):
+            raise StaleStateError(f"Session {session_id} has moved past version {expected_version}, or is taking a turn elsewhere")
+        return token
+
+    def release(self, session_id: str, expected_version: int, claim: str):
+        self.db.release_checkpoint(session_id, expected_version + 1, claim)
+
+    def save(self, state: DebateState, expected_version: int, claim: str = None) -> int:
+        """
+        Persist the delta between `expected_version` and the given state
+        """
+        session_id = state["session_id"]
+
+        delta = {}
+        if expected_version == 0:
+            offsets = {field: 0 for field in APPEND_FIELDS}
+            delta.update({field: state.get(field) for field in SESSION_FIELDS})
+        else:
+            offsets = self._offsets(session_id, expected_version)
+
+        for field in SCALAR_FIELDS:
+            delta[field] = state.get(field)
+
+        new_messages = state["messages"][offsets["messages"]:]
+        delta["messages"] = messages_to_dict(new_messages)
+        delta["sentiment_scores"] = state["sentiment_scores"].rows(offsets["sentiment_scores"])
+        delta["safety_violations"] = state["safety_violations"][offsets["safety_violations"]:]
+        # Checkpoints from before user_statements existed have no length for it
+        delta["user_statements"] = state.get("user_statements", [])[offsets.get("user_statements", 0):]
+        # Lets a worker that didn't write this version compute the next delta
+        delta["_lengths"] = append_lengths(state)
+
+        version = expected_version + 1
+        if claim:
+            saved = self.db.complete_checkpoint(session_id, version, claim, state["turn_count"], delta)
+        else:
+            saved = self.db.add_checkpoint(session_id, version, state["turn_count"], delta)
+        if not saved:
+            raise StaleStateError(f"Session {session_id} has moved past version {expected_version}")
+
+        self._lengths[session_id] = (version, delta["_lengths"])
+        return version
+
+    def load(self, session_id: str) -> Tuple[Optional[DebateState], int]:
+        """
+        Rebuild the latest DebateState for a session, or (None, 0) if it was never checkpointed
+        """
+        deltas = self.db.get_checkpoints(session_id)
+
+        if not deltas:
+            return None, 0
+
+        state = fold_deltas(deltas)
+        version = len(deltas)
+        self._lengths[session_id] = (version, append_lengths(state))
+
+        return state, version
+
+    def version(self, session_id: str) -> int:
+        return self.db.get_checkpoint_version(session_id)
+
+    def _offsets(self, session_id: str, version: int) -> Dict[str, int]:
+        cached_version, lengths = self._lengths.get(session_id, (None, None))
+        if cached_version == version:
+            return lengths
+
+        delta = self.db.get_checkpoint(session_id, version)
+        if delta is None:
+            raise StaleStateError(f"Session {session_id} has no version {version}")
+        return delta["_lengths"]
+
+class InMemoryStateStore(StateStore):
+    """
+    Process-local StateStore with the same versioning, for tests and single-process
+    runs. States are kept serialized, so callers never share mutable objects.
+    """
+
+    def __init__(self):
+        # session_id -> (version, snapshot)
+        self._sessions: Dict[str, Tuple[int, Dict]] = {}
+        # session_id -> (claimed version, token, monotonic claim time)
+        self._claims: Dict[str, Tuple[int, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, session_id: str, expected_version: int) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            current = self._sessions.get(session_id, (0, None))[0]
+            if current != expected_version or self._claimed_by_other(session_id, current + 1, token):
+                raise StaleStateError(f"Session {session_id} has moved past version {expected_version}, or is taking a turn elsewhere")
+            self._claims[session_id] = (current + 1, token, time.monotonic())
+        return token
+
+    def release(self, session_id: str, expected_version: int, claim: str):
+        with self._lock:
+            if self._claims.get(session_id, (None, None))[:2] == (expected_version + 1, claim):
+                del self._claims[session_id]
+
+    def _claimed_by_other(self, session_id: str, version: int, token: str) -> bool:
+        claimed_version, owner, claimed_at = self._claims.get(session_id, (None, None, 0.0))
+        return (
+            claimed_version == version and owner != token
+            and time.monotonic() - claimed_at < config.STATE_CLAIM_TIMEOUT
+        )
+
+    def save(self, state: DebateState, expected_version: int, claim: str = None) -> int:
+        session_id = state["session_id"]
+        snapshot = {field: state.get(field) for field in SESSION_FIELDS + SCALAR_FIELDS}
+        snapshot["messages"] = messages_to_dict(state["messages"])
+        snapshot["sentiment_scores"] = state["sentiment_scores"].rows()
+        snapshot["safety_violations"] = list(state["safety_violations"])
+        snapshot["user_statements"] = list(state.get("user_statements", []))
+
+        with self._lock:
+            current = self._sessions.get(session_id, (0, None))[0]
+            if current != expected_version:
+                raise StaleStateError(f"Session {session_id} is at version {current}, not {expected_version}")
+            if self._claimed_by_other(session_id, current + 1, claim):
+                raise StaleStateError(f"Session {session_id} is taking a turn elsewhere")
+            self._sessions[session_id] = (current + 1, snapshot)
+            self._claims.pop(session_id, None)
+
+        return current + 1
+
+    def load(self, session_id: str) -> Tuple[Optional[DebateState], int]:
+        with self._lock:
+            version, snapshot = self._sessions.get(session_id, (0, None))
+
+        if snapshot is None:
+            return None, 0
+        return fold_deltas([snapshot]), version
+
+    def version(self, session_id: str) -> int:
+        with self._lock:
+            return self._sessions.get(session_id, (0, None))[0]
+
+# One in-memory store per process, so bots in the same process see each other's saves
+_memory_store = InMemoryStateStore()
+
+def create_state_store(db: DatabaseManager) -> StateStore:
+    """
+    The StateStore selected by config.STATE_STORE ("database" or "memory")
+    """
+    if config.STATE_STORE == "memory":
+        return _memory_store
+    if config.STATE_STORE != "database":
+        raise ValueError(f"Unknown state store: {config.STATE_STORE}")
+
+    return StateCheckpointer(
+        DatabaseManager(config.CHECKPOINT_DATABASE_URL)
+        if config.CHECKPOINT_DATABASE_URL else db
+    )
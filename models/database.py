@@ -1,10 +1,15 @@
 # models/database.py
-from sqlalchemy import create_engine, Column, String, Integer, Float, JSON, DateTime, Text
+from sqlalchemy import create_engine, inspect, literal, text, select, insert, update, delete, Column, String, Integer, Float, JSON, DateTime, Text, LargeBinary, UniqueConstraint, Index, func, or_, and_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 from config import config
+from utils.tracing import tracer
+import numpy as np
 import json
+import warnings
+import zlib
 
 Base = declarative_base()
 
@@ -12,7 +17,7 @@ class DebateSession(Base):
     __tablename__ = 'debate_sessions'
     
     id = Column(String, primary_key=True)
-    user_id = Column(String, nullable=True)
+    user_id = Column(String, nullable=True, index=True)
     topic = Column(String, nullable=False)
     user_stance = Column(Text)
     bot_stance = Column(Text)
@@ -20,23 +25,36 @@ class DebateSession(Base):
     ended_at = Column(DateTime, nullable=True)
     turn_count = Column(Integer, default=0)
     max_escalation_level = Column(Integer, default=0)
+    archived_at = Column(DateTime, nullable=True)  # Set once turns/scores moved to archived_sessions
+    input_tokens = Column(Integer, default=0)  # Model tokens over the whole session
+    output_tokens = Column(Integer, default=0)
     
 class DebateTurn(Base):
     __tablename__ = 'debate_turns'
+    __table_args__ = (
+        Index('ix_debate_turns_session_id_id', 'session_id', 'id'),  # "Since" polling
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String, nullable=False)
     turn_number = Column(Integer, nullable=False)
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
+    input_tokens = Column(Integer, nullable=True)  # Assistant turns: tokens spent generating this reply
+    output_tokens = Column(Integer, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     
 class SentimentRecord(Base):
     __tablename__ = 'sentiment_records'
+    __table_args__ = (
+        UniqueConstraint('session_id', 'turn_number', 'role', 'model_version', name='uq_sentiment_model_version'),
+        Index('ix_sentiment_records_session_id_id', 'session_id', 'id'),  # "Since" polling
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String, nullable=False)
     turn_number = Column(Integer, nullable=False)
+    role = Column(String, nullable=False, default='assistant')  # Whose message was scored
     polarity = Column(Float)
     subjectivity = Column(Float)
     emotions = Column(JSON)  # Store as JSON
@@ -44,12 +62,201 @@ class SentimentRecord(Base):
     valence = Column(Float)
     toxicity = Column(Float)
     predicted_discomfort = Column(Float)
+    model_version = Column(String, nullable=True)  # Set by re-scoring jobs; NULL for live scores
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+class SessionCheckpoint(Base):
+    __tablename__ = 'session_checkpoints'
+    __table_args__ = (
+        UniqueConstraint('session_id', 'version', name='uq_checkpoint_version'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, nullable=False, index=True)
+    version = Column(Integer, nullable=False)  # 1, 2, ... per session; the unique key makes saves compare-and-set
+    turn_number = Column(Integer, nullable=False)
+    delta = Column(JSON, nullable=False)  # Only what changed since the previous checkpoint
+    claimed_by = Column(String, nullable=True)  # Set while a turn holds this version; NULL once saved
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    
+    session_id = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)  # Client-supplied, unique per session
+    fingerprint = Column(String, nullable=False)  # Hash of the message sent with the key
+    status = Column(String, nullable=False, default='pending')  # 'pending' or 'completed'
+    result = Column(JSON, nullable=True)  # Reply returned to duplicates once completed
+    claimed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+class SimulationRun(Base):
+    __tablename__ = 'simulation_runs'
+    
+    simulation = Column(String, primary_key=True)  # Spec name
+    run_key = Column(String, primary_key=True)  # Hash of topic, stances, persona and repeat
+    topic = Column(String, nullable=False)
+    user_stance = Column(Text)
+    bot_stance = Column(Text)
+    persona = Column(String, nullable=False)
+    repeat = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default='pending')  # pending, running, completed or failed
+    claimed_by = Column(String, nullable=True)  # Process running it, while running
+    session_id = Column(String, nullable=True)  # Set when the debate starts, so it can be resumed
+    turns = Column(Integer, default=0)  # User messages sent
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ArchivedSession(Base):
+    __tablename__ = 'archived_sessions'
+    
+    session_id = Column(String, primary_key=True)
+    ended_at = Column(DateTime, nullable=False, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    row_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON of the session's rows
+
+# Hot tables whose rows move into the archive, keyed by the payload section they go to
+ARCHIVED_TABLES = {
+    "turns": DebateTurn,
+    "sentiments": SentimentRecord,
+    "checkpoints": SessionCheckpoint
+}
+
+# Columns added after their table first shipped. create_all only creates missing
+# tables, so databases that already have the table get these added on startup,
+# with an optional backfill for existing rows.
+ADDED_COLUMNS = [
+    ("sentiment_records", "model_version", None),  # Re-scoring
+    ("sentiment_records", "role", None),  # Existing rows are bot replies, the column default
+    # Versioned state store: number existing checkpoints 1, 2, ... per session
+    ("session_checkpoints", "version", """
+        UPDATE session_checkpoints SET version = (
+            SELECT COUNT(*) FROM session_checkpoints AS earlier
+            WHERE earlier.session_id = session_checkpoints.session_id
+            AND earlier.id <= session_checkpoints.id
+        )
+    """),
+    ("session_checkpoints", "claimed_by", None),  # Existing checkpoints are all saved
+    ("debate_sessions", "archived_at", None),  # Archiving
+    ("simulation_runs", "claimed_by", None),  # Running runs without one are taken over once stale
+    ("debate_sessions", "input_tokens", None),  # Token accounting
+    ("debate_sessions", "output_tokens", None),
+    ("debate_turns", "input_tokens", None),
+    ("debate_turns", "output_tokens", None),
+]
+
+def upgrade_schema(engine):
+    """
+    Bring an existing database up to the current models: add missing columns
+    (ADDED_COLUMNS) and any missing indexes and unique keys. Idempotent, so it
+    runs on every startup.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    
+    with engine.begin() as conn:
+        for table_name, column_name, backfill in ADDED_COLUMNS:
+            if column_name in {c["name"] for c in inspector.get_columns(table_name)}:
+                continue
+            
+            column = Base.metadata.tables[table_name].c[column_name]
+            ddl = f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN {preparer.quote(column_name)} {column.type.compile(dialect=engine.dialect)}"
+            if column.default is not None and column.default.is_scalar:
+                default = literal(column.default.arg).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+                ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+            if backfill:
+                conn.execute(text(backfill))
+        
+        for table in Base.metadata.sorted_tables:
+            existing = {
+                index["name"]: index["column_names"] for index in inspector.get_indexes(table.name)
+            }
+            existing.update({
+                constraint["name"]: constraint["column_names"]
+                for constraint in inspector.get_unique_constraints(table.name)
+            })
+            
+            keys = [(index.name, [c.name for c in index.columns], index.unique) for index in table.indexes]
+            keys += [
+                (constraint.name, [c.name for c in constraint.columns], True)
+                for constraint in table.constraints
+                if isinstance(constraint, UniqueConstraint)
+            ]
+            for name, columns, unique in keys:
+                if existing.get(name) == columns:
+                    continue
+                if name in existing:
+                    # A unique key whose columns changed since it was created
+                    if engine.dialect.name == "sqlite":
+                        warnings.warn(f"{table.name}.{name} is on {existing[name]}, not {columns}; "
+                                      f"SQLite can't alter it in place, so recreate the table")
+                        continue
+                    conn.execute(text(f"ALTER TABLE {preparer.quote(table.name)} DROP CONSTRAINT {preparer.quote(name)}"))
+                
+                conn.execute(text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX {preparer.quote(name)} "
+                    f"ON {preparer.quote(table.name)} ({', '.join(preparer.quote(c) for c in columns)})"
+                ))
+
+def _row_to_dict(row) -> dict:
+    values = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        values[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return values
+
+def _row_from_dict(model, values: dict):
+    # Detached instance, so readers can't tell it apart from a hot row
+    row = model()
+    for column in model.__table__.columns:
+        value = values.get(column.name)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        setattr(row, column.name, value)
+    return row
+
+# Score columns of the analytics projections
+SCORE_COLUMNS = ["predicted_discomfort", "arousal", "valence", "toxicity", "polarity", "subjectivity"]
+TURN_COLUMNS = ["turn_number", "role", "content", "input_tokens", "output_tokens", "timestamp"]
+SUMMARY_SESSION_COLUMNS = [
+    "id", "user_id", "topic", "user_stance", "bot_stance", "started_at", "ended_at",
+    "turn_count", "max_escalation_level", "input_tokens", "output_tokens", "archived_at"
+]
+
+def _columns(rows, names: list) -> dict:
+    """Result tuples as one array per column"""
+    columns = list(zip(*rows)) or [()] * len(names)
+    return {
+        name: np.array(values, dtype=float if name in SCORE_COLUMNS else int if name == "turn_number" else object)
+        for name, values in zip(names, columns)
+    }
+
+def _summarize_scores(roles: np.ndarray, discomfort: np.ndarray, arousal: np.ndarray,
+                      valence: np.ndarray, toxicity: np.ndarray) -> dict:
+    """Per-role aggregates for archived rows (the hot path computes them in SQL)"""
+    summary = {}
+    for role in sorted(set(roles)):
+        mask = roles == role
+        summary[role] = {
+            "records": int(mask.sum()),
+            "avg_discomfort": float(np.nanmean(discomfort[mask])),
+            "peak_discomfort": float(np.nanmax(discomfort[mask])),
+            "avg_arousal": float(np.nanmean(arousal[mask])),
+            "avg_valence": float(np.nanmean(valence[mask])),
+            "peak_toxicity": float(np.nanmax(toxicity[mask]))
+        }
+    return summary
+
 class DatabaseManager:
     def __init__(self, database_url: str = None):
         self.engine = create_engine(database_url or config.DATABASE_URL)
+        tracer.instrument_engine(self.engine)
         Base.metadata.create_all(self.engine)
+        upgrade_schema(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
     
     def create_session(self, session_id: str, topic: str, user_stance: str, bot_stance: str, user_id: str = None):
@@ -68,7 +275,8 @@ class DatabaseManager:
         finally:
             db.close()
     
-    def add_turn(self, session_id: str, turn_number: int, role: str, content: str):
+    def add_turn(self, session_id: str, turn_number: int, role: str, content: str,
+                 input_tokens: int = None, output_tokens: int = None):
         """Record a conversation turn"""
         db = self.SessionLocal()
         try:
@@ -76,23 +284,32 @@ class DatabaseManager:
                 session_id=session_id,
                 turn_number=turn_number,
                 role=role,
-                content=content
+                content=content,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens
             )
             db.add(turn)
             db.commit()
         finally:
             db.close()
     
-    def add_sentiment(self, session_id: str, turn_number: int, sentiment_data: dict):
+    def add_sentiment(self, session_id: str, turn_number: int, sentiment_data: dict, role: str = "assistant"):
         """Store sentiment analysis results"""
+        self.add_sentiments(session_id, turn_number, {role: sentiment_data})
+    
+    def add_sentiments(self, session_id: str, turn_number: int, sentiment_by_role: dict):
+        """Store sentiment results for several roles of the same turn in one transaction"""
         db = self.SessionLocal()
         try:
-            record = SentimentRecord(
-                session_id=session_id,
-                turn_number=turn_number,
-                **sentiment_data
-            )
-            db.add(record)
+            db.add_all([
+                SentimentRecord(
+                    session_id=session_id,
+                    turn_number=turn_number,
+                    role=role,
+                    **sentiment_data
+                )
+                for role, sentiment_data in sentiment_by_role.items()
+            ])
             db.commit()
         finally:
             db.close()
@@ -108,13 +325,467 @@ class DatabaseManager:
         finally:
             db.close()
     
+    def get_user_token_usage(self, user_id: str, exclude_session_id: str = None) -> int:
+        """Total model tokens across a user's sessions"""
+        db = self.SessionLocal()
+        try:
+            query = db.query(
+                func.coalesce(func.sum(DebateSession.input_tokens + DebateSession.output_tokens), 0)
+            ).filter(DebateSession.user_id == user_id)
+            if exclude_session_id:
+                query = query.filter(DebateSession.id != exclude_session_id)
+            return int(query.scalar())
+        finally:
+            db.close()
+    
+    def get_turns_after(self, last_id: int, limit: int, role: str = None) -> list:
+        """Fetch the next chunk of turns by primary key, as (id, session_id, turn_number, role, content) tuples"""
+        db = self.SessionLocal()
+        try:
+            query = db.query(
+                DebateTurn.id,
+                DebateTurn.session_id,
+                DebateTurn.turn_number,
+                DebateTurn.role,
+                DebateTurn.content
+            ).filter(DebateTurn.id > last_id)
+            if role:
+                query = query.filter(DebateTurn.role == role)
+            return [tuple(row) for row in query.order_by(DebateTurn.id).limit(limit).all()]
+        finally:
+            db.close()
+    
+    def get_sentiments_after(self, last_id: int, limit: int, role: str = None) -> list:
+        """
+        Fetch the next chunk of live sentiment records by primary key, as
+        (id, session_id, turn_number, predicted_discomfort, arousal, toxicity) tuples
+        """
+        db = self.SessionLocal()
+        try:
+            query = db.query(
+                SentimentRecord.id,
+                SentimentRecord.session_id,
+                SentimentRecord.turn_number,
+                SentimentRecord.predicted_discomfort,
+                SentimentRecord.arousal,
+                SentimentRecord.toxicity
+            ).filter(SentimentRecord.id > last_id, SentimentRecord.model_version.is_(None))
+            if role:
+                query = query.filter(SentimentRecord.role == role)
+            return [tuple(row) for row in query.order_by(SentimentRecord.id).limit(limit).all()]
+        finally:
+            db.close()
+    
+    def upsert_sentiments(self, records: list):
+        """Bulk insert sentiment rows, replacing scores already stored for the same model version"""
+        if not records:
+            return
+        
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise NotImplementedError(f"Upsert not supported for {self.engine.dialect.name}")
+        
+        key_columns = ["session_id", "turn_number", "role", "model_version"]
+        stmt = insert(SentimentRecord.__table__).values(records)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                column: stmt.excluded[column]
+                for column in records[0]
+                if column not in key_columns
+            }
+        )
+        
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+    
+    def add_checkpoint(self, session_id: str, version: int, turn_number: int, delta: dict) -> bool:
+        """Append a state delta to the session's checkpoint log; False if that version already exists"""
+        db = self.SessionLocal()
+        try:
+            checkpoint = SessionCheckpoint(
+                session_id=session_id,
+                version=version,
+                turn_number=turn_number,
+                delta=delta
+            )
+            db.add(checkpoint)
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def claim_checkpoint(self, session_id: str, version: int, claimed_by: str, stale_before: datetime) -> bool:
+        """
+        Reserve a checkpoint version for a turn about to run, as a placeholder
+        row that readers skip. False if the version is saved or claimed by
+        someone else; a claim made before `stale_before` is taken over, as its
+        owner is presumed dead.
+        """
+        db = self.SessionLocal()
+        try:
+            db.add(SessionCheckpoint(session_id=session_id, version=version, turn_number=0, delta={}, claimed_by=claimed_by))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+        
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(SessionCheckpoint)
+                .where(
+                    SessionCheckpoint.session_id == session_id,
+                    SessionCheckpoint.version == version,
+                    SessionCheckpoint.claimed_by.is_not(None),
+                    SessionCheckpoint.created_at < stale_before
+                )
+                .values(claimed_by=claimed_by, created_at=datetime.utcnow())
+            )
+            return result.rowcount == 1
+    
+    def complete_checkpoint(self, session_id: str, version: int, claimed_by: str, turn_number: int, delta: dict) -> bool:
+        """Store the delta in a claimed checkpoint; False if the claim was taken over"""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(SessionCheckpoint)
+                .where(
+                    SessionCheckpoint.session_id == session_id,
+                    SessionCheckpoint.version == version,
+                    SessionCheckpoint.claimed_by == claimed_by
+                )
+                .values(turn_number=turn_number, delta=delta, claimed_by=None, created_at=datetime.utcnow())
+            )
+            return result.rowcount == 1
+    
+    def release_checkpoint(self, session_id: str, version: int, claimed_by: str):
+        """Drop a claim whose turn failed, so the version can be claimed again"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                delete(SessionCheckpoint).where(
+                    SessionCheckpoint.session_id == session_id,
+                    SessionCheckpoint.version == version,
+                    SessionCheckpoint.claimed_by == claimed_by
+                )
+            )
+    
+    def get_checkpoints(self, session_id: str) -> list:
+        """Fetch every checkpoint delta for a session, oldest first, in a single query"""
+        db = self.SessionLocal()
+        try:
+            rows = (
+                db.query(SessionCheckpoint.delta)
+                .filter_by(session_id=session_id, claimed_by=None)
+                .order_by(SessionCheckpoint.version)
+                .all()
+            )
+            return [row.delta for row in rows]
+        finally:
+            db.close()
+    
+    def get_checkpoint(self, session_id: str, version: int):
+        """Fetch one checkpoint delta, or None"""
+        db = self.SessionLocal()
+        try:
+            row = (
+                db.query(SessionCheckpoint.delta)
+                .filter_by(session_id=session_id, version=version, claimed_by=None)
+                .first()
+            )
+            return row.delta if row else None
+        finally:
+            db.close()
+    
+    def get_checkpoint_version(self, session_id: str) -> int:
+        """Latest checkpoint version of a session (0 if none)"""
+        db = self.SessionLocal()
+        try:
+            version = (
+                db.query(func.max(SessionCheckpoint.version))
+                .filter_by(session_id=session_id, claimed_by=None)
+                .scalar()
+            )
+            return version or 0
+        finally:
+            db.close()
+    
+    def claim_idempotency_key(self, session_id: str, key: str, fingerprint: str, stale_before: datetime) -> dict:
+        """
+        Claim a key for a new turn, or return the existing claim.
+        
+        Returns {"claimed": True, "takeover": bool} if the caller now owns the
+        key, otherwise the existing row's status, fingerprint and result
+        (status None if it disappeared in between). A pending claim made before
+        `stale_before` with the same fingerprint is taken over, as its owner is
+        presumed dead.
+        """
+        db = self.SessionLocal()
+        try:
+            db.add(IdempotencyKey(session_id=session_id, key=key, fingerprint=fingerprint, status="pending"))
+            db.commit()
+            return {"claimed": True, "takeover": False}
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+        
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(IdempotencyKey.status, IdempotencyKey.fingerprint, IdempotencyKey.result, IdempotencyKey.claimed_at)
+                .where(IdempotencyKey.session_id == session_id, IdempotencyKey.key == key)
+            ).first()
+            if row is None:
+                return {"claimed": False, "status": None}
+            
+            if row.status == "pending" and row.fingerprint == fingerprint and row.claimed_at < stale_before:
+                # Compare-and-set on the old claim time, so only one process takes over
+                taken = conn.execute(
+                    update(IdempotencyKey)
+                    .where(
+                        IdempotencyKey.session_id == session_id,
+                        IdempotencyKey.key == key,
+                        IdempotencyKey.status == "pending",
+                        IdempotencyKey.claimed_at == row.claimed_at
+                    )
+                    .values(claimed_at=datetime.utcnow())
+                ).rowcount
+                if taken:
+                    return {"claimed": True, "takeover": True}
+            
+            return {"claimed": False, "status": row.status, "fingerprint": row.fingerprint, "result": row.result}
+    
+    def complete_idempotency_key(self, session_id: str, key: str, result: dict):
+        """Store the result of a claimed key for duplicates to reuse"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.session_id == session_id, IdempotencyKey.key == key)
+                .values(status="completed", result=result, completed_at=datetime.utcnow())
+            )
+    
+    def release_idempotency_key(self, session_id: str, key: str):
+        """Drop a pending claim whose turn failed, so the message can be resent with the same key"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                delete(IdempotencyKey)
+                .where(
+                    IdempotencyKey.session_id == session_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status == "pending"
+                )
+            )
+    
+    def add_simulation_runs(self, simulation: str, runs: list) -> int:
+        """Register planned runs in one bulk insert, skipping ones already registered; returns the number added"""
+        try:
+            return self._insert_simulation_runs(simulation, runs)
+        except IntegrityError:
+            # Another process registered the spec at the same time; its rows are visible now
+            return self._insert_simulation_runs(simulation, runs)
+    
+    def _insert_simulation_runs(self, simulation: str, runs: list) -> int:
+        with self.engine.begin() as conn:
+            existing = set(conn.execute(
+                select(SimulationRun.run_key).where(SimulationRun.simulation == simulation)
+            ).scalars())
+            new = [
+                {**run, "simulation": simulation, "status": "pending"}
+                for run in runs if run["run_key"] not in existing
+            ]
+            if new:
+                conn.execute(insert(SimulationRun), new)
+        return len(new)
+    
+    def get_simulation_runs(self, simulation: str, statuses: list = None) -> list:
+        """Runs of a simulation as dicts, optionally only those in the given statuses"""
+        query = select(SimulationRun.__table__).where(SimulationRun.simulation == simulation)
+        if statuses:
+            query = query.where(SimulationRun.status.in_(statuses))
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query.order_by(SimulationRun.run_key))]
+    
+    def claim_simulation_run(self, simulation: str, run_key: str, statuses: list, claimed_by: str, stale_before: datetime):
+        """
+        Mark a run as running by `claimed_by` if it is in one of `statuses`, or
+        running but not updated since `stale_before` (its process is presumed
+        dead). One conditional UPDATE, so only one process gets each run.
+        Returns the claimed run as a dict, or None if it wasn't available.
+        """
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(SimulationRun)
+                .where(
+                    SimulationRun.simulation == simulation,
+                    SimulationRun.run_key == run_key,
+                    or_(
+                        SimulationRun.status.in_(statuses),
+                        and_(SimulationRun.status == "running", SimulationRun.updated_at < stale_before)
+                    )
+                )
+                .values(status="running", claimed_by=claimed_by, updated_at=datetime.utcnow())
+            )
+            if result.rowcount != 1:
+                return None
+            row = conn.execute(
+                select(SimulationRun.__table__)
+                .where(SimulationRun.simulation == simulation, SimulationRun.run_key == run_key)
+            ).one()
+            return dict(row._mapping)
+    
+    def update_simulation_run(self, simulation: str, run_key: str, owner: str = None, **values) -> bool:
+        """Update a run (only while `owner` holds its claim, if given); False if nothing matched"""
+        query = update(SimulationRun).where(SimulationRun.simulation == simulation, SimulationRun.run_key == run_key)
+        if owner is not None:
+            query = query.where(SimulationRun.claimed_by == owner)
+        with self.engine.begin() as conn:
+            result = conn.execute(query.values(updated_at=datetime.utcnow(), **values))
+            return result.rowcount == 1
+    
+    def get_simulation_progress(self, simulation: str) -> dict:
+        """Run counts by status"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(SimulationRun.status, func.count())
+                .where(SimulationRun.simulation == simulation)
+                .group_by(SimulationRun.status)
+            )
+            return {status: count for status, count in rows}
+    
+    def get_records_since(self, session_id: str, last_turn_id: int = 0, last_sentiment_id: int = 0) -> dict:
+        """
+        Turns and live sentiment records of a session with IDs greater than the last
+        seen ones, oldest first. Both queries are range scans on (session_id, id).
+        """
+        db = self.SessionLocal()
+        try:
+            turns = (
+                db.query(DebateTurn)
+                .filter(DebateTurn.session_id == session_id, DebateTurn.id > last_turn_id)
+                .order_by(DebateTurn.id)
+                .all()
+            )
+            sentiments = (
+                db.query(SentimentRecord)
+                .filter(
+                    SentimentRecord.session_id == session_id,
+                    SentimentRecord.id > last_sentiment_id,
+                    SentimentRecord.model_version.is_(None)
+                )
+                .order_by(SentimentRecord.id)
+                .all()
+            )
+            
+            return {
+                "turns": turns,
+                "sentiments": sentiments
+            }
+        finally:
+            db.close()
+    
+    def get_sessions_to_archive(self, ended_before: datetime, limit: int) -> list:
+        """IDs of sessions that ended before the cutoff and are still in the hot tables"""
+        db = self.SessionLocal()
+        try:
+            rows = (
+                db.query(DebateSession.id)
+                .filter(DebateSession.ended_at < ended_before, DebateSession.archived_at.is_(None))
+                .order_by(DebateSession.ended_at)
+                .limit(limit)
+                .all()
+            )
+            return [row.id for row in rows]
+        finally:
+            db.close()
+    
+    def archive_session(self, session_id: str) -> dict:
+        """
+        Move a session's turns, sentiment records and checkpoints into one
+        compressed archive row, in a single transaction. Returns row and byte counts.
+        """
+        db = self.SessionLocal()
+        try:
+            session = db.query(DebateSession).filter_by(id=session_id).with_for_update().first()
+            if session is None or session.archived_at is not None:
+                return {"rows": 0, "raw_bytes": 0, "compressed_bytes": 0}
+            
+            sections, row_count = {}, 0
+            for section, model in ARCHIVED_TABLES.items():
+                rows = db.query(model).filter_by(session_id=session_id).order_by(model.id).all()
+                sections[section] = [_row_to_dict(row) for row in rows]
+                row_count += len(rows)
+            
+            raw = json.dumps(sections, separators=(",", ":")).encode("utf-8")
+            payload = zlib.compress(raw, 9)
+            
+            db.add(ArchivedSession(
+                session_id=session_id,
+                ended_at=session.ended_at,
+                row_count=row_count,
+                payload=payload
+            ))
+            for model in ARCHIVED_TABLES.values():
+                db.query(model).filter_by(session_id=session_id).delete(synchronize_session=False)
+            # Nobody retries a message to an archived session
+            db.query(IdempotencyKey).filter_by(session_id=session_id).delete(synchronize_session=False)
+            session.archived_at = datetime.utcnow()
+            db.commit()
+            
+            return {"rows": row_count, "raw_bytes": len(raw), "compressed_bytes": len(payload)}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def get_archived_session(self, session_id: str) -> dict:
+        """Archived rows of a session as detached model instances, by payload section"""
+        sections = self._archived_sections(session_id)
+        return {
+            section: [_row_from_dict(model, values) for values in sections.get(section, [])]
+            for section, model in ARCHIVED_TABLES.items()
+        }
+    
+    def _archived_sections(self, session_id: str) -> dict:
+        """Archived rows of a session as plain dicts (datetimes as ISO strings), by payload section"""
+        with self.engine.connect() as conn:
+            payload = conn.execute(
+                select(ArchivedSession.payload).where(ArchivedSession.session_id == session_id)
+            ).scalar()
+        
+        if payload is None:
+            return {section: [] for section in ARCHIVED_TABLES}
+        
+        sections = json.loads(zlib.decompress(payload))
+        return {section: sections.get(section, []) for section in ARCHIVED_TABLES}
+    
     def get_session_analytics(self, session_id: str) -> dict:
-        """Retrieve all analytics for a session"""
+        """Retrieve all analytics for a session (from the archive if it was archived)"""
         db = self.SessionLocal()
         try:
             session = db.query(DebateSession).filter_by(id=session_id).first()
+            
+            if session is not None and session.archived_at is not None:
+                archived = self.get_archived_session(session_id)
+                return {
+                    "session": session,
+                    "turns": archived["turns"],
+                    "sentiments": [s for s in archived["sentiments"] if s.model_version is None]
+                }
+            
             turns = db.query(DebateTurn).filter_by(session_id=session_id).all()
-            sentiments = db.query(SentimentRecord).filter_by(session_id=session_id).all()
+            # Live scores only; re-scored rows are read by model version
+            sentiments = (
+                db.query(SentimentRecord)
+                .filter(SentimentRecord.session_id == session_id, SentimentRecord.model_version.is_(None))
+                .all()
+            )
             
             return {
                 "session": session,
@@ -122,4 +793,163 @@ class DatabaseManager:
                 "sentiments": sentiments
             }
         finally:
-            db.close()
\ No newline at end of file
+            db.close()
+    
+    # Analytics projections: plain tuples and column arrays, aggregated in SQL where
+    # possible, for summaries and charts. Scores are the live ones unless a
+    # re-scoring model_version is given.
+    
+    def _score_filter(self, session_id: str, role: str = None, model_version: str = None) -> list:
+        conditions = [
+            SentimentRecord.session_id == session_id,
+            SentimentRecord.model_version == model_version if model_version else SentimentRecord.model_version.is_(None)
+        ]
+        if role:
+            conditions.append(SentimentRecord.role == role)
+        return conditions
+    
+    def _archived_scores(self, session_id: str, role: str = None, model_version: str = None) -> dict:
+        rows = [
+            row for row in self._archived_sections(session_id)["sentiments"]
+            if row.get("model_version") == model_version and (role is None or row["role"] == role)
+        ]
+        names = ["turn_number", "role"] + SCORE_COLUMNS
+        return _columns(
+            [tuple(np.nan if row[name] is None else row[name] for name in names) for row in rows],
+            names
+        )
+    
+    def get_session_summary(self, session_id: str, model_version: str = None) -> dict:
+        """
+        Session fields as a dict plus per-role score aggregates ("records",
+        "avg_discomfort", "peak_discomfort", "avg_arousal", "avg_valence",
+        "peak_toxicity"), or None if the session doesn't exist
+        """
+        with self.engine.connect() as conn:
+            session = conn.execute(
+                select(*[getattr(DebateSession, name) for name in SUMMARY_SESSION_COLUMNS])
+                .where(DebateSession.id == session_id)
+            ).mappings().first()
+            
+            if session is None:
+                return None
+            session = dict(session)
+            
+            if session["archived_at"] is not None:
+                scores = self._archived_scores(session_id, model_version=model_version)
+                return {
+                    "session": session,
+                    "scores": _summarize_scores(
+                        scores["role"], scores["predicted_discomfort"], scores["arousal"],
+                        scores["valence"], scores["toxicity"]
+                    )
+                }
+            
+            rows = conn.execute(
+                select(
+                    SentimentRecord.role,
+                    func.count(),
+                    func.avg(SentimentRecord.predicted_discomfort),
+                    func.max(SentimentRecord.predicted_discomfort),
+                    func.avg(SentimentRecord.arousal),
+                    func.avg(SentimentRecord.valence),
+                    func.max(SentimentRecord.toxicity)
+                )
+                .where(*self._score_filter(session_id, model_version=model_version))
+                .group_by(SentimentRecord.role)
+            ).all()
+        
+        return {
+            "session": session,
+            "scores": {
+                role: {
+                    "records": records,
+                    "avg_discomfort": avg_discomfort,
+                    "peak_discomfort": peak_discomfort,
+                    "avg_arousal": avg_arousal,
+                    "avg_valence": avg_valence,
+                    "peak_toxicity": peak_toxicity
+                }
+                for role, records, avg_discomfort, peak_discomfort, avg_arousal, avg_valence, peak_toxicity in rows
+            }
+        }
+    
+    def get_score_series(self, session_id: str, role: str = None, model_version: str = None) -> dict:
+        """
+        Per-turn score series: "turn_number", "role" and SCORE_COLUMNS as arrays,
+        one entry per (turn, role) ordered by turn (scores averaged if a turn was
+        scored more than once)
+        """
+        names = ["turn_number", "role"] + SCORE_COLUMNS
+        
+        if self._is_archived(session_id):
+            scores = self._archived_scores(session_id, role, model_version)
+            keys = sorted(set(zip(scores["turn_number"], scores["role"])))
+            rows = []
+            for turn_number, turn_role in keys:
+                mask = (scores["turn_number"] == turn_number) & (scores["role"] == turn_role)
+                rows.append((turn_number, turn_role, *[float(np.nanmean(scores[name][mask])) for name in SCORE_COLUMNS]))
+            return _columns(rows, names)
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    SentimentRecord.turn_number,
+                    SentimentRecord.role,
+                    *[func.avg(getattr(SentimentRecord, name)) for name in SCORE_COLUMNS]
+                )
+                .where(*self._score_filter(session_id, role, model_version))
+                .group_by(SentimentRecord.turn_number, SentimentRecord.role)
+                .order_by(SentimentRecord.turn_number, SentimentRecord.role)
+            ).all()
+        return _columns(rows, names)
+    
+    def get_emotion_means(self, session_id: str, role: str = None, model_version: str = None) -> dict:
+        """Mean score per emotion label (EMOTION_LABELS) over a session's records"""
+        labels = config.EMOTION_LABELS
+        
+        if self._is_archived(session_id):
+            emotions = [
+                row["emotions"] for row in self._archived_sections(session_id)["sentiments"]
+                if row.get("model_version") == model_version and (role is None or row["role"] == role)
+                and row["emotions"]
+            ]
+            if not emotions:
+                return {}
+            means = np.array([[e.get(label, 0.0) for label in labels] for e in emotions]).mean(axis=0)
+            return dict(zip(labels, means.tolist()))
+        
+        with self.engine.connect() as conn:
+            means = conn.execute(
+                select(*[func.avg(SentimentRecord.emotions[label].as_float()) for label in labels])
+                .where(*self._score_filter(session_id, role, model_version))
+            ).first()
+        if means[0] is None:
+            return {}
+        return {label: mean or 0.0 for label, mean in zip(labels, means)}
+    
+    def get_turn_columns(self, session_id: str) -> dict:
+        """Turns of a session in order, as one array per TURN_COLUMNS entry"""
+        if self._is_archived(session_id):
+            rows = [
+                tuple(
+                    datetime.fromisoformat(row[name]) if name == "timestamp" and row[name] else row[name]
+                    for name in TURN_COLUMNS
+                )
+                for row in self._archived_sections(session_id)["turns"]
+            ]
+            return _columns(rows, TURN_COLUMNS)
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(*[getattr(DebateTurn, name) for name in TURN_COLUMNS])
+                .where(DebateTurn.session_id == session_id)
+                .order_by(DebateTurn.id)
+            ).all()
+        return _columns(rows, TURN_COLUMNS)
+    
+    def _is_archived(self, session_id: str) -> bool:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(DebateSession.archived_at).where(DebateSession.id == session_id)
+            ).scalar() is not None
@@ -0,0 +1,148 @@
+# models/score_history.py
+from config import config
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Role codes stored in the "role" column
+ROLES = ["assistant", "user"]
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+# One float64 column per field; emotions get one column per configured label
+SCALAR_COLUMNS = [
+    "timestamp",  # Unix epoch seconds
+    "role",
+    "message_index",  # Index into state["messages"] of the scored message
+    "polarity", "subjectivity", "arousal", "valence",
+    "toxicity", "predicted_discomfort"
+]
+EMOTION_COLUMNS = [f"emotion_{label}" for label in config.EMOTION_LABELS]
+COLUMNS = SCALAR_COLUMNS + EMOTION_COLUMNS
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+# Rows allocated when a history first gets scores (a user and a bot score per turn)
+MIN_CAPACITY = 16
+
+class ScoreBuffer:
+    """
+    Rows shared by the histories derived from one another; `used` is the
+    furthest any of them reaches, and rows are only ever written past it
+    """
+
+    __slots__ = ("data", "used")
+
+    def __init__(self, data: np.ndarray, used: int):
+        self.data = data
+        self.used = used
+
+class ScoreHistory:
+    """
+    Per-session sentiment score history backed by a NumPy array.
+
+    Each score is one row of floats: numeric timestamp, role code, a reference
+    to the scored message (its index in state["messages"]) instead of a copy of
+    its text, the scalar scores and one column per emotion label. Columns are
+    exposed as read-only views, so readers like should_deescalate don't copy
+    anything.
+
+    A history never changes once built: extended() returns a new one. The new
+    history writes its rows into the same buffer when nothing past its end is
+    in use, so appending a turn is amortized O(1), and copies into a fresh
+    buffer (twice the size) when the buffer is full or another history already
+    continued past it, e.g. a retried turn after a failed one. Earlier states
+    therefore keep seeing exactly their own scores.
+
+    Indexing returns a SentimentScore-shaped dict, so `history[-1]["arousal"]`
+    keeps working for callers that want a single record.
+    """
+
+    __slots__ = ("buffer", "size")
+
+    def __init__(self, buffer: ScoreBuffer = None, size: int = 0):
+        self.buffer = buffer or ScoreBuffer(np.zeros((0, len(COLUMNS)), dtype=np.float64), 0)
+        self.size = size
+
+    def extended(self, records: Iterable[Dict]) -> "ScoreHistory":
+        """
+        A new history with SentimentScore-shaped dicts appended
+        """
+        records = list(records)
+        if not records:
+            return self
+
+        size = self.size + len(records)
+        buffer = self.buffer
+        if buffer.used != self.size or size > len(buffer.data):
+            data = np.zeros((max(2 * size, MIN_CAPACITY), len(COLUMNS)), dtype=np.float64)
+            data[:self.size] = buffer.data[:self.size]
+            buffer = ScoreBuffer(data, self.size)
+
+        for row, record in zip(buffer.data[self.size:size], records):
+            for name in SCALAR_COLUMNS:
+                value = record.get(name, 0.0)
+                row[COLUMN_INDEX[name]] = ROLE_CODES[value] if name == "role" else value
+
+            emotions = record.get("emotions") or {}
+            for label, name in zip(config.EMOTION_LABELS, EMOTION_COLUMNS):
+                row[COLUMN_INDEX[name]] = emotions.get(label, 0.0)
+
+        buffer.used = size
+        return ScoreHistory(buffer, size)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Read-only view of one column over all stored scores
+        """
+        values = self.buffer.data[:self.size, COLUMN_INDEX[name]]
+        values.flags.writeable = False
+        return values
+
+    def recent(self, name: str, count: int, role: Optional[str] = None) -> np.ndarray:
+        """
+        The last `count` values of a column, optionally only for one role
+        """
+        values = self.column(name)
+        if role is not None:
+            values = values[self.column("role") == ROLE_CODES[role]]
+        return values[-count:]
+
+    def rows(self, start: int = 0) -> List[List[float]]:
+        """
+        Plain-list rows from `start` on, for serialization
+        """
+        return self.buffer.data[start:self.size].tolist()
+
+    @classmethod
+    def from_rows(cls, rows: List[List[float]]) -> "ScoreHistory":
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS))
+        return cls(ScoreBuffer(data, len(rows)), len(rows))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("score index out of range")
+
+        row = self.buffer.data[index]
+        record = {name: float(row[COLUMN_INDEX[name]]) for name in SCALAR_COLUMNS}
+        record["role"] = ROLES[int(record["role"])]
+        record["message_index"] = int(record["message_index"])
+        record["emotions"] = {
+            label: float(row[COLUMN_INDEX[name]])
+            for label, name in zip(config.EMOTION_LABELS, EMOTION_COLUMNS)
+        }
+        return record
+
+    def __repr__(self) -> str:
+        return f"ScoreHistory(size={self.size}, capacity={len(self.buffer.data)})"
+
+def append_scores(history: Optional[ScoreHistory], update) -> ScoreHistory:
+    """
+    State reducer for sentiment_scores: a ScoreHistory replaces the value (the
+    initial state), a list of score dicts gives a new, extended history
+    """
+    if isinstance(update, ScoreHistory):
+        return update
+    return (history or ScoreHistory()).extended(update)
@@ -3,10 +3,13 @@ from typing import TypedDict, List, Annotated, Optional, Dict
 from datetime import datetime
 import operator
 from langchain_core.messages import BaseMessage
+from models.score_history import ScoreHistory, append_scores
 
 class SentimentScore(TypedDict):
-    timestamp: str
-    text: str
+    # Shape of one score as appended by nodes and read back from ScoreHistory
+    timestamp: float  # Unix epoch seconds
+    role: str  # 'user' or 'assistant'
+    message_index: int  # Position of the scored message in `messages`
     polarity: float
     subjectivity: float
     emotions: Dict[str, float]  # Multi-dimensional emotions
@@ -21,6 +24,7 @@ class ConversationMetrics(TypedDict):
     engagement_score: float
     contradiction_count: int
     concession_count: int
+    stance_alignment: float  # Latest user message: > 0 leans to their stance, < 0 to the bot's
 
 class DebateState(TypedDict):
     # Core conversation
@@ -28,6 +32,7 @@ class DebateState(TypedDict):
     topic: str
     user_stance: str
     bot_stance: str
+    stance_embeddings: List[List[float]]  # [user_stance, bot_stance], embedded once per session
     
     # Phase management
     escalation_level: int
@@ -35,12 +40,25 @@ class DebateState(TypedDict):
     phase: str  # calibration, gentle_push, escalation
     
     # Analytics
-    sentiment_scores: Annotated[List[SentimentScore], operator.add]
+    sentiment_scores: Annotated[ScoreHistory, append_scores]
     conversation_metrics: ConversationMetrics
+    user_statements: Annotated[List[Dict], operator.add]  # Per user message: message_index, alignment
     
     # Safety
     safety_violations: Annotated[List[str], operator.add]
     should_stop: bool
+    deescalation_requested: bool  # Set by safety_check for the reply just checked
+    distress: Dict[str, Dict[str, float]]  # Online EWMA/slope/CUSUM stats per score stream
+    prescored: Optional[Dict]  # Scores of the last reply if computed while picking among candidates
+    screening: Optional[Dict]  # Input screening of the latest user message: action, reasons, sentiment, confirmed
+    
+    # Token accounting
+    token_usage: Dict[str, int]  # Session totals: input_tokens, output_tokens
+    turn_usage: Dict[str, int]  # Tokens spent on the latest reply (all candidates)
+    context_window: Optional[int]  # Messages of history sent to the model (None = all)
+    
+    # Idempotency
+    idempotency_key: Optional[str]  # Key of the message that produced the latest turn
     
     # Metadata
     session_id: str
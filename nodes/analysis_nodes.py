@@ -1,23 +1,114 @@
 # nodes/analysis_nodes.py
-from models.state import DebateState, SentimentScore
+from models.state import DebateState
 from utils.sentiment import sentiment_analyzer
 from utils.safety import safety_checker
+from utils.inference_pool import inference_pool
+from utils.distress import distress_detector
+from utils.embeddings import embedder, statement_vectors
 from models.database import DatabaseManager
+from config import config
+from langchain_core.messages import HumanMessage, AIMessage
 from typing import Dict
-from datetime import datetime
+import numpy as np
+import time
 
 db = DatabaseManager()
 
+def input_screening_node(state: DebateState) -> Dict:
+    """
+    Screen the user's message before any reply is generated, so turns that
+    will be refused or de-escalated don't pay for a generation first.
+    
+    The lexical matcher runs on every message; the models only run when it
+    finds crisis language, a harmful pattern or a sensitive topic, and their
+    scores are kept for sentiment_analysis rather than recomputed. Distress
+    already detected in earlier turns also goes straight to de-escalation if
+    it persists with the message's own scores.
+    
+    Crisis language always gets the safe response, but only ends the session
+    when confirmed by the models (low valence) or by detected distress, so a
+    quoted or hypothetical phrase doesn't end the debate.
+    """
+    
+    last_index = len(state["messages"]) - 1
+    if last_index < 0 or not isinstance(state["messages"][-1], HumanMessage):
+        return {"screening": None}
+    
+    text = state["messages"][-1].content
+    verdict, reasons = safety_checker.screen_input(text)
+    screening = {"message_index": last_index, "action": "continue", "reasons": reasons, "sentiment": None, "confirmed": False}
+    
+    if verdict == "crisis":
+        sentiment = inference_pool.analyze(text)
+        screening.update(action="safe_response", sentiment=sentiment)
+        if sentiment["valence"] < config.SCREENING_CRISIS_VALENCE:
+            screening["confirmed"] = True
+            reasons.append(f"User message valence: {sentiment['valence']:.2f}")
+        elif distress_detector.alarms(state.get("distress")):
+            screening["confirmed"] = True
+            reasons.append("User distress detected in earlier turns")
+        return {"screening": screening}
+    
+    if verdict == "review":
+        sentiment = inference_pool.analyze(text)
+        screening["sentiment"] = sentiment
+        flags = []
+        if sentiment["toxicity"] > config.SCREENING_MAX_TOXICITY:
+            flags.append(f"User message toxicity: {sentiment['toxicity']:.2f}")
+        if sentiment["predicted_discomfort"] > config.SCREENING_MAX_DISCOMFORT:
+            flags.append(f"User message discomfort: {sentiment['predicted_discomfort']:.2f}")
+        if flags:
+            screening["action"] = "deescalate"
+            reasons.extend(flags)
+    
+    if screening["action"] == "continue" and safety_checker.should_deescalate(state):
+        # Distress statistics are from earlier turns; only act on them if they
+        # still alarm with this message's own scores folded in
+        if screening["sentiment"] is None:
+            screening["sentiment"] = inference_pool.analyze(text)
+        distress = distress_detector.update(state.get("distress"), [{"role": "user", **screening["sentiment"]}])
+        if safety_checker.should_deescalate({**state, "distress": distress}):
+            screening["action"] = "deescalate"
+    
+    return {"screening": screening}
+
 def sentiment_analysis_node(state: DebateState) -> Dict:
     """
-    Comprehensive sentiment analysis of bot's response BEFORE sending
+    Comprehensive sentiment analysis of bot's response BEFORE sending,
+    together with the user message it replies to
     """
     
-    # Get the last AI message
-    last_message = state["messages"][-1].content
+    # Get the last AI message, and the latest user message if it has no score
+    # yet (a turn can chain several generation nodes, so it needn't be right
+    # before the reply, and regenerated replies don't re-score it)
+    last_index = len(state["messages"]) - 1
+    message_indexes = {"assistant": last_index}
+    user_index = next(
+        (i for i in range(last_index - 1, -1, -1) if isinstance(state["messages"][i], HumanMessage)), None
+    )
+    if user_index is not None:
+        scored = state.get("sentiment_scores")
+        last_scored = scored.recent("message_index", 1, role="user") if scored is not None else []
+        if len(last_scored) == 0 or int(last_scored[-1]) != user_index:
+            message_indexes = {"user": user_index, **message_indexes}
+    texts = {role: state["messages"][i].content for role, i in message_indexes.items()}
     
-    # Perform multi-dimensional analysis
-    sentiment_data = sentiment_analyzer.analyze(last_message)
+    # The reply may already have been scored when it was picked among candidates,
+    # and the user message when input screening checked it with the models
+    sentiment_by_role = {}
+    prescored = state.get("prescored")
+    if prescored and prescored.get("sentiment") and prescored["content"] == texts["assistant"]:
+        sentiment_by_role["assistant"] = prescored["sentiment"]
+        del texts["assistant"]
+    screening = state.get("screening")
+    if "user" in texts and screening and screening.get("sentiment") and screening["message_index"] == message_indexes["user"]:
+        sentiment_by_role["user"] = screening["sentiment"]
+        del texts["user"]
+    
+    # Perform multi-dimensional analysis in one batched pass
+    results = inference_pool.analyze_batch(list(texts.values())) if texts else []
+    sentiment_by_role.update(zip(texts.keys(), results))
+    sentiment_by_role = {role: sentiment_by_role[role] for role in message_indexes}
     
     # Calculate engagement if we have user's previous message
     user_messages = [m for m in state["messages"] if isinstance(m, HumanMessage)]
@@ -29,24 +120,13 @@ def sentiment_analysis_node(state: DebateState) -> Dict:
     else:
         engagement = 0.5  # Neutral baseline
     
-    # Create sentiment record
-    sentiment_record: SentimentScore = {
-        "timestamp": datetime.now().isoformat(),
-        "text": last_message,
-        "polarity": sentiment_data["polarity"],
-        "subjectivity": sentiment_data["subjectivity"],
-        "emotions": sentiment_data["emotions"],
-        "arousal": sentiment_data["arousal"],
-        "valence": sentiment_data["valence"],
-        "toxicity": sentiment_data["toxicity"],
-        "predicted_discomfort": sentiment_data["predicted_discomfort"]
-    }
-    
-    # Store in database
-    db.add_sentiment(
-        session_id=state["session_id"],
-        turn_number=state["turn_count"],
-        sentiment_data={
+    # Create sentiment records (user first, so the bot's is always last)
+    timestamp = time.time()
+    sentiment_records = [
+        {
+            "timestamp": timestamp,
+            "role": role,
+            "message_index": message_indexes[role],
             "polarity": sentiment_data["polarity"],
             "subjectivity": sentiment_data["subjectivity"],
             "emotions": sentiment_data["emotions"],
@@ -55,13 +135,29 @@ def sentiment_analysis_node(state: DebateState) -> Dict:
             "toxicity": sentiment_data["toxicity"],
             "predicted_discomfort": sentiment_data["predicted_discomfort"]
         }
+        for role, sentiment_data in sentiment_by_role.items()
+    ]
+    
+    # Store in database
+    db.add_sentiments(
+        session_id=state["session_id"],
+        turn_number=state["turn_count"],
+        sentiment_by_role={
+            record["role"]: {
+                key: value for key, value in record.items()
+                if key not in ("timestamp", "role", "message_index")
+            }
+            for record in sentiment_records
+        }
     )
     
     return {
-        "sentiment_scores": [sentiment_record],
+        "sentiment_scores": sentiment_records,
+        "distress": distress_detector.update(state.get("distress"), sentiment_records),
         "conversation_metrics": {
+            **state["conversation_metrics"],
             "engagement_score": engagement,
-            "linguistic_complexity": sentiment_data["linguistic_complexity"]
+            "linguistic_complexity": sentiment_by_role["assistant"]["linguistic_complexity"]
         }
     }
 
@@ -72,10 +168,14 @@ def safety_check_node(state: DebateState) -> Dict:
     
     last_message = state["messages"][-1].content
     
-    is_safe, violations = safety_checker.check_safety(
-        last_message,
-        context={"phase": state["phase"], "escalation": state["escalation_level"]}
-    )
+    prescored = state.get("prescored")
+    if prescored and prescored["content"] == last_message:
+        is_safe, violations = prescored["safety"]
+    else:
+        is_safe, violations = inference_pool.check_safety(
+            last_message,
+            context={"phase": state["phase"], "escalation": state["escalation_level"]}
+        )
     
     result = {}
     
@@ -90,49 +190,87 @@ def safety_check_node(state: DebateState) -> Dict:
         state["messages"][-1].content = sanitized
         
         # If still unsafe after sanitization, flag for de-escalation
-        is_safe_after, _ = safety_checker.check_safety(sanitized)
+        is_safe_after, _ = inference_pool.check_safety(sanitized)
         if not is_safe_after:
             result["should_stop"] = True
     
-    # Check if de-escalation needed
-    if safety_checker.should_deescalate(state):
+    # Check if de-escalation needed (a reply that is already a de-escalation
+    # goes through, otherwise the graph would keep regenerating it)
+    result["deescalation_requested"] = (
+        state["phase"] != "deescalation" and safety_checker.should_deescalate(state)
+    )
+    if result["deescalation_requested"]:
         result["phase"] = "deescalation"
     
+    # This turn has acted on any change point (or is already a de-escalation), so
+    # the next message's screening doesn't de-escalate again on the same one
+    distress = state.get("distress")
+    if distress and any(values.get("change_point") for values in distress.values()):
+        result["distress"] = distress_detector.acknowledge(distress)
+    
     return result
 
 def metrics_calculation_node(state: DebateState) -> Dict:
     """
-    Calculate conversation-level metrics
+    Calculate conversation-level metrics.
+    
+    Contradictions and concessions come from sentence embeddings: only the
+    newest user message is embedded, and its vector is cached in process (not
+    in checkpointed state), so each turn costs one embedding plus one
+    vectorized comparison against the user's earlier statements. A session
+    resumed in another process re-embeds its earlier statements once, in the
+    same batch.
     """
     
-    user_messages = [m for m in state["messages"] if isinstance(m, HumanMessage)]
+    user_indexes = [i for i, m in enumerate(state["messages"]) if isinstance(m, HumanMessage)]
     
-    if not user_messages:
+    if not user_indexes:
         return {}
     
     # Average response length trend
-    lengths = [len(m.content.split()) for m in user_messages]
+    lengths = [len(state["messages"][i].content.split()) for i in user_indexes]
     avg_length = sum(lengths) / len(lengths)
     
-    # Detect contradictions (simplified - could use NLP)
-    # Count when user changes position keywords
-    contradictions = 0
-    position_keywords = ["I think", "I believe", "actually", "but"]
+    metrics = {**state["conversation_metrics"], "avg_response_length": avg_length}
+    result = {"conversation_metrics": metrics}
+    
+    # Regenerated replies answer a user message that was already scored
+    statements = state.get("user_statements") or []
+    latest = user_indexes[-1]
+    if statements and statements[-1]["message_index"] == latest:
+        return result
+    
+    previous_indexes = [s["message_index"] for s in statements]
+    cached = statement_vectors.get(state["session_id"])
+    missing = [i for i in previous_indexes if i not in cached]
     
-    # Concessions
-    concession_keywords = ["you're right", "fair point", "i see", "that makes sense"]
-    concessions = sum(
-        1 for m in user_messages 
-        if any(kw in m.content.lower() for kw in concession_keywords)
+    # Stances are embedded once at session start; older sessions embed them here
+    texts = [state["messages"][latest].content] + [state["messages"][i].content for i in missing]
+    stance_vectors = state.get("stance_embeddings")
+    if not stance_vectors:
+        texts += [state["user_stance"], state["bot_stance"]]
+    vectors = inference_pool.embed(texts)
+    if not stance_vectors:
+        stance_vectors = vectors[-2:]
+    cached.update(zip(missing, vectors[1:1 + len(missing)]))
+    
+    previous_vectors = np.array([cached[i] for i in previous_indexes], dtype=np.float32).reshape(len(previous_indexes), vectors.shape[1])
+    score = embedder.score_statement(
+        vectors[0],
+        np.asarray(stance_vectors, dtype=np.float32),
+        previous_vectors,
+        [s["alignment"] for s in statements],
+        concession_vector=inference_pool.concession_vector()
     )
+    cached[latest] = vectors[0]
+    statement_vectors.put(state["session_id"], cached)
     
-    return {
-        "conversation_metrics": {
-            "avg_response_length": avg_length,
-            "contradiction_count": contradictions,
-            "concession_count": concessions
-        }
-    }
+    metrics["contradiction_count"] = metrics.get("contradiction_count", 0) + int(score["is_contradiction"])
+    metrics["concession_count"] = metrics.get("concession_count", 0) + int(score["is_concession"])
+    metrics["stance_alignment"] = score["alignment"]
+    result["user_statements"] = [{"message_index": latest, "alignment": score["alignment"]}]
+    
+    return result
 
 def persistence_node(state: DebateState) -> Dict:
     """
@@ -154,17 +292,23 @@ def persistence_node(state: DebateState) -> Dict:
         # Assistant message
         ai_msg = state["messages"][-1]
         if isinstance(ai_msg, AIMessage):
+            turn_usage = state.get("turn_usage") or {}
             db.add_turn(
                 session_id=state["session_id"],
                 turn_number=state["turn_count"],
                 role="assistant",
-                content=ai_msg.content
+                content=ai_msg.content,
+                input_tokens=turn_usage.get("input_tokens"),
+                output_tokens=turn_usage.get("output_tokens")
             )
     
     # Update session metadata
+    token_usage = state.get("token_usage") or {}
     db.update_session(
         session_id=state["session_id"],
         turn_count=state["turn_count"],
+        input_tokens=token_usage.get("input_tokens", 0),
+        output_tokens=token_usage.get("output_tokens", 0),
         max_escalation_level=max(
             state.get("escalation_level", 0),
             state.get("max_escalation_level", 0)
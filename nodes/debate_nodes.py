@@ -2,11 +2,127 @@
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from models.state import DebateState
+from utils.model_router import ModelRouter
+from utils.llm_cassette import CassetteChatModel
+from utils.stub_llm import StubChatModel
+from utils.inference_pool import inference_pool
+from utils.token_budget import add_usage, trim_history
+from concurrent.futures import ThreadPoolExecutor
 from config import config
-from typing import Dict
+from typing import Dict, List
+import contextvars
+import os
 import random
 
-llm = ChatAnthropic(model=config.LLM_MODEL, temperature=0.8)
+def cassette_path(tier_name: str) -> str:
+    """
+    Per-tier cassette next to LLM_CASSETTE_PATH, e.g. cassettes/llm.fast.jsonl.gz
+    """
+    directory, filename = os.path.split(config.LLM_CASSETTE_PATH)
+    stem, dot, extension = filename.partition(".")
+    return os.path.join(directory, f"{stem}.{tier_name}{dot}{extension}")
+
+def build_chat_model(tier_name: str, tier: Dict):
+    """
+    Chat model client for a tier, wrapped for record/replay when a cassette mode is set
+    """
+    
+    # Replay never touches the network, so no client is built at all
+    if config.LLM_CASSETTE_MODE == "replay":
+        return CassetteChatModel(mode="replay", path=cassette_path(tier_name), model=tier["model"])
+    
+    if config.LLM_BACKEND == "stub":
+        client = StubChatModel(
+            latency=tier.get("stub_latency"),
+            model=tier["model"],
+            max_tokens=tier["max_tokens"]
+        )
+    else:
+        # Retries are handled by the gateway, so the client itself doesn't retry
+        client = ChatAnthropic(
+            model=tier["model"],
+            temperature=tier["temperature"],
+            max_tokens=tier["max_tokens"],
+            timeout=config.LLM_TIMEOUT,
+            max_retries=0
+        )
+    
+    if config.LLM_CASSETTE_MODE == "record":
+        return CassetteChatModel(client, mode="record", path=cassette_path(tier_name), model=tier["model"])
+    
+    return client
+
+router = ModelRouter(build_chat_model)
+
+# Threads for concurrent candidate calls. Mostly waiting on the gateway, so the pool
+# is sized not to be a second, smaller limit in front of the gateway's own
+candidate_executor = ThreadPoolExecutor(max_workers=config.CANDIDATE_THREADS)
+
+def select_candidate(candidates: List[str], sentiments: List[Dict], safety: List, escalation_level: int) -> int:
+    """
+    Index of the safe candidate whose discomfort is closest to the target for
+    the escalation level, or of the least toxic one if none is safe
+    """
+    targets = config.SPECULATIVE_TARGET_DISCOMFORT
+    target = targets[min(max(escalation_level, 0), len(targets) - 1)]
+    
+    safe = [i for i, (is_safe, _) in enumerate(safety) if is_safe]
+    if not safe:
+        return min(range(len(candidates)), key=lambda i: sentiments[i]["toxicity"])
+    
+    return min(safe, key=lambda i: abs(sentiments[i]["predicted_discomfort"] - target))
+
+def generate_reply(messages: List, state: DebateState, phase: str, escalation_level: int) -> Dict:
+    """
+    The node's reply as a state update ("messages", "prescored" and token
+    usage), from the model tier the router picks for the phase.
+    
+    With SPECULATIVE_CANDIDATES > 1, that many candidates are generated
+    concurrently, scored and safety-checked in one batch, and the best one is
+    kept; its scores are passed on so the analysis nodes don't recompute them.
+    """
+    # Anonymous debates are limited per session rather than sharing one tenant
+    tenant = state.get("user_id") or state["session_id"]
+    user_messages = [m for m in state["messages"] if isinstance(m, HumanMessage)]
+    user_text = user_messages[-1].content if user_messages else None
+    
+    if config.SPECULATIVE_CANDIDATES <= 1:
+        response = router.invoke(phase, messages, tenant=tenant, user_text=user_text)
+        return {
+            "messages": [AIMessage(content=response.content)],
+            "prescored": None,
+            "turn_usage": add_usage(state.get("turn_usage"), [response]),
+            "token_usage": add_usage(state.get("token_usage"), [response])
+        }
+    
+    # Each call runs in a copy of this context, so its spans join the turn's trace
+    futures = [
+        candidate_executor.submit(contextvars.copy_context().run, router.invoke, phase, messages, tenant=tenant, user_text=user_text)
+        for _ in range(config.SPECULATIVE_CANDIDATES)
+    ]
+    # One failed call shouldn't lose the turn if another candidate came back
+    responses = [future.exception() or future.result() for future in futures]
+    succeeded = [r for r in responses if not isinstance(r, Exception)]
+    if not succeeded:
+        raise responses[0]
+    candidates = [r.content for r in succeeded]
+    
+    safety_future = candidate_executor.submit(contextvars.copy_context().run, inference_pool.check_safety_batch, candidates)
+    sentiments = inference_pool.analyze_batch(candidates)
+    safety = safety_future.result()
+    
+    chosen = select_candidate(candidates, sentiments, safety, escalation_level)
+    return {
+        "messages": [AIMessage(content=candidates[chosen])],
+        "prescored": {
+            "content": candidates[chosen],
+            "sentiment": sentiments[chosen],
+            "safety": list(safety[chosen])
+        },
+        # Every candidate was paid for, not just the one kept
+        "turn_usage": add_usage(state.get("turn_usage"), succeeded),
+        "token_usage": add_usage(state.get("token_usage"), succeeded)
+    }
 
 def calibration_node(state: DebateState) -> Dict:
     """
@@ -36,11 +152,11 @@ Length: 2-3 sentences max
 
 Remember: You haven't revealed your counter-stance yet. Stay neutral."""
 
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    response = llm.invoke(messages)
+    messages = [SystemMessage(content=system_prompt)] + trim_history(state["messages"], state.get("context_window"))
+    reply = generate_reply(messages, state, "calibration", escalation_level=0)
     
     return {
-        "messages": [AIMessage(content=response.content)],
+        **reply,
         "turn_count": state["turn_count"] + 1,
         "phase": "calibration"
     }
@@ -58,7 +174,10 @@ def gentle_push_node(state: DebateState) -> Dict:
         "Acknowledge their point, then introduce a 'but what about...' scenario"
     ]
     
-    selected_technique = random.choice(techniques)
+    # Seeded by the debate and turn rather than drawn fresh, so a replayed script
+    # builds the same prompt (and cassette key) as the recorded one
+    seed = f"{state['topic']}|{state['user_stance']}|{state['turn_count']}"
+    selected_technique = random.Random(seed).choice(techniques)
     
     system_prompt = f"""You are debating {state['topic']}.
 
@@ -83,11 +202,11 @@ Length: 3-4 sentences
 
 Important: No personal attacks. Attack the argument, not the person."""
 
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    response = llm.invoke(messages)
+    messages = [SystemMessage(content=system_prompt)] + trim_history(state["messages"], state.get("context_window"))
+    reply = generate_reply(messages, state, "gentle_push", escalation_level=1)
     
     return {
-        "messages": [AIMessage(content=response.content)],
+        **reply,
         "turn_count": state["turn_count"] + 1,
         "escalation_level": 1,
         "phase": "gentle_push"
@@ -151,11 +270,11 @@ CRITICAL SAFETY LIMITS:
 Tone: Assertive, challenging, provocative (but not abusive)
 Length: 3-5 sentences"""
 
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    response = llm.invoke(messages)
+    messages = [SystemMessage(content=system_prompt)] + trim_history(state["messages"], state.get("context_window"))
+    reply = generate_reply(messages, state, "escalation", escalation_level=intensity)
     
     return {
-        "messages": [AIMessage(content=response.content)],
+        **reply,
         "turn_count": state["turn_count"] + 1,
         "escalation_level": min(intensity + 1, config.MAX_ESCALATION_LEVEL),
         "phase": "escalation"
@@ -185,12 +304,30 @@ Use phrases like:
 Tone: Calm, measured, constructive
 Length: 2-3 sentences"""
 
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    response = llm.invoke(messages)
+    messages = [SystemMessage(content=system_prompt)] + trim_history(state["messages"], state.get("context_window"))
+    reply = generate_reply(messages, state, "deescalation", escalation_level=max(0, state["escalation_level"] - 2))
     
     return {
-        "messages": [AIMessage(content=response.content)],
+        **reply,
         "turn_count": state["turn_count"] + 1,
         "escalation_level": max(0, state["escalation_level"] - 2),
         "phase": "deescalation"
-    }
\ No newline at end of file
+    }
+
+
+def safe_response_node(state: DebateState) -> Dict:
+    """
+    Canned reply to crisis language in a user message - no model call. The
+    session only ends if screening confirmed the crisis signal.
+    """
+    
+    confirmed = (state.get("screening") or {}).get("confirmed", False)
+    return {
+        "messages": [AIMessage(content=config.SCREENING_SAFE_RESPONSE)],
+        # Known to be safe, so safety_check doesn't run the toxicity model on it
+        "prescored": {"content": config.SCREENING_SAFE_RESPONSE, "sentiment": None, "safety": [True, []]},
+        "turn_count": state["turn_count"] + 1,
+        "escalation_level": 0,
+        "phase": "deescalation",
+        "should_stop": config.SCREENING_STOP_ON_BLOCK and confirmed
+    }
@@ -0,0 +1,93 @@
+# tools/distress_replay.py
+"""
+Replay stored sentiment_records through the online distress detector.
+
+Streams live records in primary-key order (keyset pages, constant memory per
+session), feeds each session's records to DistressDetector and, for comparison,
+to the previous rule (mean of the last two discomfort scores > 0.8). Reports
+throughput, how many sessions each flags and how many turns earlier the
+detector raised its first alarm on sessions both flag.
+
+Usage:
+    python -m tools.distress_replay
+    python -m tools.distress_replay --database-url sqlite:///load.db --role user
+"""
+from models.database import DatabaseManager
+from utils.distress import DistressDetector
+from config import config
+from typing import Dict
+import argparse
+import time
+
+LEGACY_WINDOW = 2
+LEGACY_LIMIT = 0.8
+
+def replay(db: DatabaseManager, role: str = None, page_size: int = 5000) -> Dict:
+    detector = DistressDetector()
+    stats, recent = {}, {}
+    first_alarm, first_legacy = {}, {}
+
+    records, last_id = 0, 0
+    detect_seconds = 0.0
+    started = time.perf_counter()
+
+    while True:
+        page = db.get_sentiments_after(last_id, page_size, role=role)
+        if not page:
+            break
+        last_id = page[-1][0]
+
+        for _, session_id, turn_number, discomfort, arousal, toxicity in page:
+            records += 1
+            record = {
+                "role": detector.role,
+                "predicted_discomfort": discomfort or 0.0,
+                "arousal": arousal or 0.0,
+                "toxicity": toxicity or 0.0
+            }
+
+            tick = time.perf_counter()
+            stats[session_id] = detector.update(stats.get(session_id), [record])
+            if session_id not in first_alarm and detector.alarms(stats[session_id]):
+                first_alarm[session_id] = turn_number
+            detect_seconds += time.perf_counter() - tick
+
+            window = recent.setdefault(session_id, [])
+            window.append(record["predicted_discomfort"])
+            del window[:-LEGACY_WINDOW]
+            if session_id not in first_legacy and sum(window) / len(window) > LEGACY_LIMIT:
+                first_legacy[session_id] = turn_number
+
+    both = first_alarm.keys() & first_legacy.keys()
+    return {
+        "records": records,
+        "sessions": len(stats),
+        "seconds": time.perf_counter() - started,
+        "detector_seconds": detect_seconds,
+        "flagged": len(first_alarm),
+        "flagged_legacy": len(first_legacy),
+        "flagged_only_by_detector": len(first_alarm.keys() - first_legacy.keys()),
+        "mean_turns_earlier": (
+            sum(first_legacy[s] - first_alarm[s] for s in both) / len(both) if both else 0.0
+        )
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored scores through the distress detector")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--role", default=config.DISTRESS_ROLE, help="Score role to replay ('' for all)")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    result = replay(DatabaseManager(args.database_url), role=args.role or None, page_size=args.page_size)
+
+    records, seconds = result["records"], result["detector_seconds"]
+    print(f"Replayed {records} records from {result['sessions']} sessions in {result['seconds']:.2f}s")
+    print(f"Detector: {records / seconds if seconds else 0:,.0f} records/s "
+          f"({seconds / records * 1e6 if records else 0:.1f} us/record)")
+    print(f"Sessions flagged: {result['flagged']} detector, {result['flagged_legacy']} previous rule, "
+          f"{result['flagged_only_by_detector']} only by detector")
+    print(f"First alarm on sessions both flag: {result['mean_turns_earlier']:.2f} turns earlier on average")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# tools/fake_anthropic_server.py
+"""
+Local stand-in for the Anthropic Messages API, for exercising the LLM gateway.
+
+Injects 429 rate-limit errors and 529 overloads at configurable rates and adds
+latency to every response. Point the app at it with:
+
+    python -m tools.fake_anthropic_server --port 8787 --error-rate 0.3 --latency-ms 400
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8787 ANTHROPIC_API_KEY=fake python main.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    # Set by serve()
+    error_rate = 0.0
+    overload_rate = 0.0
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    stats = None
+    stats_lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        self._count("requests")
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        roll = random.random()
+        if roll < self.error_rate:
+            self._count("rate_limited")
+            return self._send(429, {
+                "type": "error",
+                "error": {"type": "rate_limit_error", "message": "Injected rate limit"}
+            }, {"retry-after": "1"})
+        if roll < self.error_rate + self.overload_rate:
+            self._count("overloaded")
+            return self._send(529, {
+                "type": "error",
+                "error": {"type": "overloaded_error", "message": "Injected overload"}
+            })
+
+        prompt_words = sum(
+            len(str(m.get("content", "")).split()) for m in request.get("messages", [])
+        ) + len(str(request.get("system", "")).split())
+        text = "That's an interesting point, but have you considered the other side?"
+
+        self._count("ok")
+        self._send(200, {
+            "id": f"msg_fake_{random.getrandbits(48):012x}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": prompt_words, "output_tokens": len(text.split())}
+        })
+
+    def do_GET(self):
+        # Injection counters, for checking what the client saw
+        with self.stats_lock:
+            self._send(200, dict(self.stats))
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+def serve(
+    port: int = 8787,
+    error_rate: float = 0.0,
+    overload_rate: float = 0.0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0
+) -> ThreadingHTTPServer:
+    """
+    Start the fake server on a background thread and return it
+    """
+    handler = type("ConfiguredHandler", (FakeAnthropicHandler,), {
+        "error_rate": error_rate,
+        "overload_rate": overload_rate,
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "stats": {}
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--overload-rate", type=float, default=0.0, help="Fraction of 529 responses")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.error_rate, args.overload_rate, args.latency_ms, args.jitter_ms)
+    print(f"Fake Anthropic API listening on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# tools/generate_dataset.py
+"""
+Bulk synthetic dataset for benchmarking queries, exports and the dashboard.
+
+Writes realistic debate_sessions, debate_turns and sentiment_records rows:
+turn counts, per-session emotion profiles and escalation caps are drawn from
+configurable distributions, each turn has a user and an assistant message, and
+each message gets a sentiment row whose derived metrics follow the same
+formulas as SentimentAnalyzer. Rows are generated with NumPy in batches and
+written with COPY on PostgreSQL (executemany elsewhere), so a 10M-row dataset
+takes minutes. Checkpoints are not generated, so these sessions can't be resumed.
+
+Usage:
+    python -m tools.generate_dataset --sessions 300000 --database-url postgresql://...
+    python -m tools.generate_dataset --sessions 1000 --turns geometric:0.1 \\
+        --profiles calm=0.5,heated=0.5 --escalation-caps 1=0.5,3=0.5
+"""
+from models.database import DatabaseManager, DebateSession, DebateTurn, SentimentRecord
+from config import config
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import argparse
+import csv
+import io
+import json
+import time
+import uuid
+import numpy as np
+
+# Dirichlet concentration over config.EMOTION_LABELS
+# (anger, disgust, fear, joy, neutral, sadness, surprise) and Beta(a, b) toxicity
+PROFILES = {
+    "calm": {"emotions": [1, 1, 1, 4, 8, 1, 2], "toxicity": (1, 30)},
+    "engaged": {"emotions": [2, 1, 1, 3, 5, 2, 3], "toxicity": (1, 15)},
+    "heated": {"emotions": [6, 3, 2, 1, 3, 2, 2], "toxicity": (2, 10)},
+    "distressed": {"emotions": [4, 3, 6, 1, 2, 5, 1], "toxicity": (2, 8)},
+}
+
+# Profile the bot's replies are drawn from at each escalation level
+BOT_PROFILES = ["calm", "engaged", "heated", "heated"]
+
+# Same weights as SentimentAnalyzer._score, in EMOTION_LABELS order
+AROUSAL_WEIGHTS = {"anger": 0.9, "fear": 0.8, "surprise": 0.7, "joy": 0.6, "disgust": 0.5, "sadness": 0.3, "neutral": 0.1}
+VALENCE_WEIGHTS = {"joy": 1.0, "surprise": 0.3, "neutral": 0.0, "sadness": -0.5, "fear": -0.7, "disgust": -0.8, "anger": -0.9}
+
+USER_SENTENCES = [
+    "I still think the evidence is on my side.",
+    "That's not convincing at all.",
+    "Fair point, but it doesn't change my mind.",
+    "Why do you keep ignoring the practical consequences?",
+    "Most people I know would agree with me.",
+    "I've read a lot about this and the data is clear.",
+    "Honestly this is getting frustrating.",
+    "Okay, I see where you're coming from.",
+]
+BOT_SENTENCES = [
+    "That's a thoughtful position.",
+    "What first led you to see it that way?",
+    "I see your point, and yet there's evidence pointing the other way.",
+    "Many people who share your values reach the opposite conclusion.",
+    "This position overlooks some fundamental trade-offs.",
+    "Why should anyone accept that assumption?",
+    "Let's take a breath here.",
+    "What if we started from what we agree on?",
+]
+
+SESSION_COLUMNS = ["id", "user_id", "topic", "user_stance", "bot_stance", "started_at",
+                   "ended_at", "turn_count", "max_escalation_level"]
+TURN_COLUMNS = ["session_id", "turn_number", "role", "content", "timestamp"]
+SENTIMENT_COLUMNS = ["session_id", "turn_number", "role", "polarity", "subjectivity", "emotions",
+                     "arousal", "valence", "toxicity", "predicted_discomfort", "model_version", "timestamp"]
+
+TOPICS = ["gun control", "climate policy", "remote work", "universal basic income", "nuclear power"]
+
+def parse_weights(spec: str) -> Tuple[List[str], np.ndarray]:
+    """'a=0.4,b=0.6' -> (names, normalized probabilities)"""
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    weights = np.asarray(weights)
+    return names, weights / weights.sum()
+
+def sample_turn_counts(rng: np.random.Generator, spec: str, size: int) -> np.ndarray:
+    """'uniform', 'fixed:N' or 'geometric:P', clipped to 1..MAX_TURNS"""
+    kind, _, param = spec.partition(":")
+    if kind == "uniform":
+        counts = rng.integers(1, config.MAX_TURNS + 1, size)
+    elif kind == "fixed":
+        counts = np.full(size, int(param))
+    elif kind == "geometric":
+        counts = rng.geometric(float(param), size)
+    else:
+        raise ValueError(f"Unknown turn distribution: {spec}")
+    return np.clip(counts, 1, config.MAX_TURNS)
+
+def escalation_levels(turn_numbers: np.ndarray) -> np.ndarray:
+    """Escalation level the graph reaches at each turn number, uncapped"""
+    levels = np.where(turn_numbers <= config.CALIBRATION_TURNS, 0, 1)
+    escalating = turn_numbers > config.GENTLE_PUSH_TURNS
+    levels[escalating] = np.minimum(2 + turn_numbers[escalating] - config.GENTLE_PUSH_TURNS - 1,
+                                    config.MAX_ESCALATION_LEVEL)
+    return levels
+
+def score_rows(rng: np.random.Generator, profile_names: List[str], profiles: np.ndarray) -> Dict[str, np.ndarray]:
+    """Emotions, toxicity and derived metrics for one message per profile index"""
+    labels = config.EMOTION_LABELS
+    emotions = np.empty((len(profiles), len(labels)))
+    toxicity = np.empty(len(profiles))
+    for index, name in enumerate(profile_names):
+        rows = profiles == index
+        count = int(rows.sum())
+        if count:
+            emotions[rows] = rng.dirichlet(PROFILES[name]["emotions"], count)
+            toxicity[rows] = rng.beta(*PROFILES[name]["toxicity"], count)
+
+    arousal = emotions @ np.array([AROUSAL_WEIGHTS[label] for label in labels])
+    valence = emotions @ np.array([VALENCE_WEIGHTS[label] for label in labels])
+    weights = config.DISCOMFORT_WEIGHTS
+    column = {label: i for i, label in enumerate(labels)}
+    discomfort = (
+        emotions[:, column["anger"]] * weights["anger"]
+        + emotions[:, column["disgust"]] * weights["disgust"]
+        + emotions[:, column["fear"]] * weights["fear"]
+        + toxicity * weights["toxicity"]
+        + np.maximum(0, -valence) * weights["negative_valence"]
+    )
+
+    return {
+        "emotions": emotions.round(4),
+        "toxicity": toxicity.round(4),
+        "arousal": arousal.round(4),
+        "valence": valence.round(4),
+        "predicted_discomfort": discomfort.round(4),
+        "polarity": np.clip(valence + rng.normal(0, 0.1, len(profiles)), -1, 1).round(3),
+        "subjectivity": rng.beta(4, 3, len(profiles)).round(3)
+    }
+
+def generate_batch(rng: np.random.Generator, size: int, args) -> Tuple[list, list, list]:
+    """Rows for `size` sessions, as tuples in *_COLUMNS order"""
+    profile_names, profile_probs = parse_weights(args.profiles)
+    caps, cap_probs = parse_weights(args.escalation_caps)
+    all_names = list(PROFILES)
+
+    turn_counts = sample_turn_counts(rng, args.turns, size)
+    session_profiles = rng.choice([all_names.index(n) for n in profile_names], size, p=profile_probs)
+    session_caps = rng.choice([int(c) for c in caps], size, p=cap_probs)
+    started = datetime.now() - timedelta(days=args.days)
+    start_offsets = rng.uniform(0, args.days * 86400, size)
+    ended = rng.random(size) >= args.active_fraction
+
+    # One entry per (session, turn), then one message per role
+    owner = np.repeat(np.arange(size), turn_counts)
+    turn_numbers = np.arange(len(owner)) - np.repeat(np.cumsum(turn_counts) - turn_counts, turn_counts) + 1
+    levels = np.minimum(escalation_levels(turn_numbers), session_caps[owner])
+    turn_offsets = start_offsets[owner] + turn_numbers * rng.uniform(20, 90, len(owner))
+
+    user_scores = score_rows(rng, all_names, session_profiles[owner])
+    bot_scores = score_rows(rng, all_names, np.array([all_names.index(BOT_PROFILES[l]) for l in range(4)])[levels])
+    user_text = rng.integers(0, len(USER_SENTENCES), (len(owner), 2))
+    bot_text = rng.integers(0, len(BOT_SENTENCES), (len(owner), 2))
+
+    sessions = []
+    session_ids = [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(size)]
+    last_turn_end = np.zeros(size)
+    np.maximum.at(last_turn_end, owner, turn_offsets)
+    max_levels = np.zeros(size, dtype=int)
+    np.maximum.at(max_levels, owner, levels)
+    for i, session_id in enumerate(session_ids):
+        topic = TOPICS[i % len(TOPICS)]
+        sessions.append((
+            session_id, f"synthetic-user-{rng.integers(args.users)}", topic,
+            f"I support {topic}", f"Opposition to I support {topic}",
+            started + timedelta(seconds=float(start_offsets[i])),
+            started + timedelta(seconds=float(last_turn_end[i])) if ended[i] else None,
+            int(turn_counts[i]), int(max_levels[i])
+        ))
+
+    labels = config.EMOTION_LABELS
+    turns, sentiments = [], []
+    for row in range(len(owner)):
+        session_id = session_ids[owner[row]]
+        turn_number = int(turn_numbers[row])
+        timestamp = started + timedelta(seconds=float(turn_offsets[row]))
+        for role, scores, text in (
+            ("user", user_scores, " ".join(USER_SENTENCES[j] for j in user_text[row])),
+            ("assistant", bot_scores, " ".join(BOT_SENTENCES[j] for j in bot_text[row]))
+        ):
+            turns.append((session_id, turn_number, role, text, timestamp))
+            sentiments.append((
+                session_id, turn_number, role,
+                float(scores["polarity"][row]), float(scores["subjectivity"][row]),
+                dict(zip(labels, scores["emotions"][row].tolist())),
+                float(scores["arousal"][row]), float(scores["valence"][row]),
+                float(scores["toxicity"][row]), float(scores["predicted_discomfort"][row]),
+                None, timestamp
+            ))
+
+    return sessions, turns, sentiments
+
+def write_rows(db: DatabaseManager, model, columns: List[str], rows: List[tuple]):
+    """COPY on PostgreSQL, executemany everywhere else"""
+    if not rows:
+        return
+
+    if db.engine.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([json.dumps(v) if isinstance(v, dict) else v for v in row])
+        buffer.seek(0)
+
+        raw = db.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            raw.commit()
+        finally:
+            raw.close()
+        return
+
+    with db.engine.begin() as conn:
+        conn.execute(model.__table__.insert(), [dict(zip(columns, row)) for row in rows])
+
+def generate(db: DatabaseManager, args) -> Dict:
+    rng = np.random.default_rng(args.seed)
+    totals = {"sessions": 0, "turns": 0, "sentiments": 0}
+
+    remaining = args.sessions
+    while remaining > 0:
+        size = min(args.batch_size, remaining)
+        sessions, turns, sentiments = generate_batch(rng, size, args)
+        write_rows(db, DebateSession, SESSION_COLUMNS, sessions)
+        write_rows(db, DebateTurn, TURN_COLUMNS, turns)
+        write_rows(db, SentimentRecord, SENTIMENT_COLUMNS, sentiments)
+
+        totals["sessions"] += len(sessions)
+        totals["turns"] += len(turns)
+        totals["sentiments"] += len(sentiments)
+        remaining -= size
+
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic debate dataset")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=2000, help="Sessions generated and written per batch")
+    parser.add_argument("--turns", default="geometric:0.12", help="uniform, fixed:N or geometric:P")
+    parser.add_argument("--profiles", default="calm=0.4,engaged=0.3,heated=0.2,distressed=0.1",
+                        help=f"User emotion profile mix over {', '.join(PROFILES)}")
+    parser.add_argument("--escalation-caps", default="0=0.05,1=0.15,2=0.3,3=0.5",
+                        help="Mix of the highest escalation level a session may reach")
+    parser.add_argument("--days", type=float, default=90, help="Spread session start times over this many days")
+    parser.add_argument("--active-fraction", type=float, default=0.02, help="Share of sessions left without ended_at")
+    parser.add_argument("--users", type=int, default=5000, help="Distinct user IDs")
+    args = parser.parse_args()
+
+    for name in parse_weights(args.profiles)[0]:
+        if name not in PROFILES:
+            parser.error(f"Unknown profile: {name}")
+
+    db = DatabaseManager(args.database_url)
+
+    started = time.perf_counter()
+    totals = generate(db, args)
+    elapsed = time.perf_counter() - started
+
+    rows = sum(totals.values())
+    print(f"Wrote {totals['sessions']} sessions, {totals['turns']} turns, {totals['sentiments']} sentiment rows "
+          f"({rows} rows) in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# tools/lexicon_parity.py
+"""
+Check LexiconScorer against TextBlob and benchmark both.
+
+Scores a corpus with TextBlob's PatternAnalyzer (as SentimentAnalyzer used to:
+one TextBlob per text) and with the batched LexiconScorer. Reports the largest
+polarity/subjectivity difference, how many texts differ by more than the
+tolerance, and throughput of each. Exits non-zero if the share of texts outside
+the tolerance is above --max-mismatch-rate.
+
+The corpus is stored debate turns, a file with one text per line, or, when the
+database is empty, texts assembled from the synthetic dataset sentences.
+
+Usage:
+    python -m tools.lexicon_parity
+    python -m tools.lexicon_parity --file corpus.txt --tolerance 0.001
+    python -m tools.lexicon_parity --database-url sqlite:///load.db --limit 50000
+"""
+from models.database import DatabaseManager
+from tools.generate_dataset import USER_SENTENCES, BOT_SENTENCES
+from utils.lexicon import lexicon_scorer
+from textblob import TextBlob
+from typing import List
+import argparse
+import random
+import sys
+import time
+
+def load_corpus(database_url: str = None, path: str = None, limit: int = 20000, page_size: int = 5000) -> List[str]:
+    if path:
+        with open(path) as f:
+            return [line.rstrip("\n") for line in f][:limit]
+
+    texts, last_id = [], 0
+    db = DatabaseManager(database_url)
+    while len(texts) < limit:
+        page = db.get_turns_after(last_id, min(page_size, limit - len(texts)))
+        if not page:
+            break
+        last_id = page[-1][0]
+        texts.extend(row[4] for row in page)
+    if texts:
+        return texts
+
+    # Synthetic turns of one to four sentences
+    rng = random.Random(0)
+    sentences = USER_SENTENCES + BOT_SENTENCES
+    return [" ".join(rng.choices(sentences, k=rng.randint(1, 4))) for _ in range(limit)]
+
+def textblob_scores(texts: List[str]) -> List[tuple]:
+    scores = []
+    for text in texts:
+        blob = TextBlob(text)
+        scores.append((blob.sentiment.polarity, blob.sentiment.subjectivity))
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the lexicon scorer with TextBlob")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--file", default=None, help="One text per line instead of stored turns")
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per score_batch call")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    parser.add_argument("--max-mismatch-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.database_url, args.file, args.limit)
+    if not texts:
+        print("Empty corpus")
+        return
+
+    started = time.perf_counter()
+    reference = textblob_scores(texts)
+    textblob_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores = []
+    for i in range(0, len(texts), args.batch_size):
+        scores.extend(lexicon_scorer.score_batch(texts[i:i + args.batch_size]))
+    lexicon_seconds = time.perf_counter() - started
+
+    differences = [
+        max(abs(p - ref_p), abs(s - ref_s))
+        for (p, s), (ref_p, ref_s) in zip(scores, reference)
+    ]
+    mismatches = [i for i, d in enumerate(differences) if d > args.tolerance]
+    rate = len(mismatches) / len(texts)
+
+    print(f"Corpus: {len(texts)} texts")
+    print(f"Max difference: {max(differences):.2e}; {len(mismatches)} texts ({rate:.3%}) beyond {args.tolerance}")
+    for i in sorted(mismatches, key=lambda i: -differences[i])[:5]:
+        print(f"  {differences[i]:.3f}  {texts[i][:100]!r}")
+    print(f"TextBlob: {len(texts) / textblob_seconds:,.0f} texts/s")
+    print(f"Lexicon:  {len(texts) / lexicon_seconds:,.0f} texts/s ({textblob_seconds / lexicon_seconds:.1f}x)")
+
+    if rate > args.max_mismatch_rate:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
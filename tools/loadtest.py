@@ -0,0 +1,235 @@
+# tools/loadtest.py
+"""
+Concurrent simulated-participant load test.
+
+Ramps through increasing concurrency levels; at each level N simulated users
+each run a full debate (start_debate + scripted send_message turns) through the
+real graph, against the stub LLM and a local database. Reports throughput,
+p50/p99 turn latency, RSS growth, DB write rate and the share of debates that
+ran to completion (not stopped by the safety check) per level, then latency,
+tokens and cost per model tier.
+
+With --pool-sizes it instead sweeps inference pool sizes: each size scores
+the same messages from enough threads to keep every worker busy, and reports
+calls/s, speedup over the first size, and memory (PSS where available, so
+weights shared copy-on-write are counted once) of this process and the workers.
+
+Usage:
+    python -m tools.loadtest --ramp 1,4,16,32 --turns 8
+    python -m tools.loadtest --unsafe-fraction 0.2 --candidates 3
+    python -m tools.loadtest --script replies.txt --database-url sqlite:///load.db
+    python -m tools.loadtest --pool-sizes 1,2,4,8 --pool-requests 400
+"""
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from typing import Dict, List, Tuple
+import argparse
+import os
+import resource
+import time
+
+DEFAULT_TEMPLATES = [
+    "I still think {stance}, and here's why: it protects people who need it most.",
+    "That's not convincing. Turn {turn} and you haven't addressed my main point about {topic}.",
+    "Fair point, but the evidence on {topic} is mixed at best.",
+    "I disagree. Most people I know would agree that {stance}.",
+    "Why do you keep ignoring the practical consequences?",
+]
+
+def current_rss_mb() -> float:
+    """Resident set size of this process, in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        # Peak RSS where /proc isn't available (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def process_memory_mb(pid: int) -> float:
+    """Proportional set size of a process in MB (shared pages split between sharers), else RSS"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return 0.0
+
+def count_rows(db) -> int:
+    """Total rows across all tables, for the DB write rate"""
+    from sqlalchemy import func, select
+    from models.database import Base
+
+    with db.engine.connect() as conn:
+        return sum(
+            conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in Base.metadata.sorted_tables
+        )
+
+def percentile(values: List[float], q: float) -> float:
+    import numpy as np
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_participant(graph, db, participant: int, turns: int, templates: List[str]) -> Tuple[List[float], bool]:
+    """Run one debate to completion, returning per-turn latencies in seconds and whether it was stopped"""
+    from main import DebateBot
+
+    bot = DebateBot(graph=graph, db=db)
+    topic = f"load test topic {participant % 10}"
+    stance = "we should do more, not less"
+    bot.start_debate(topic, stance, user_id=f"loadtest-{participant}")
+
+    latencies = []
+    for turn in range(turns):
+        message = templates[(participant + turn) % len(templates)].format(
+            topic=topic, stance=stance, turn=turn + 1
+        )
+        started = time.perf_counter()
+        bot.send_message(message)
+        latencies.append(time.perf_counter() - started)
+
+        if bot.current_state.get("should_stop") or bot.current_state["turn_count"] >= config.MAX_TURNS:
+            break
+
+    bot.end_debate()
+    return latencies, bool(bot.current_state.get("should_stop"))
+
+def run_level(graph, db, concurrency: int, turns: int, templates: List[str]) -> Dict:
+    rows_before = count_rows(db)
+    rss_before = current_rss_mb()
+    errors = 0
+    stopped = 0
+    latencies = []
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(run_participant, graph, db, i, turns, templates)
+            for i in range(concurrency)
+        ]
+        for future in futures:
+            try:
+                participant_latencies, was_stopped = future.result()
+                latencies.extend(participant_latencies)
+                stopped += was_stopped
+            except Exception as e:
+                errors += 1
+                print(f"  participant failed: {type(e).__name__}: {e}")
+    elapsed = time.perf_counter() - started
+
+    rows_written = count_rows(db) - rows_before
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "rss_mb": current_rss_mb(),
+        "rss_growth_mb": current_rss_mb() - rss_before,
+        "db_writes_per_s": rows_written / elapsed if elapsed else 0.0,
+        "completed": (concurrency - errors - stopped) / concurrency
+    }
+
+def run_pool_size(workers: int, requests: int, texts: List[str]) -> Dict:
+    """Score `requests` messages through an inference pool of `workers` processes"""
+    from utils.inference_pool import InferencePool
+
+    pool = InferencePool(workers=workers)
+    threads = max(workers, 1) * 2
+    try:
+        # Start the workers (and load the models) before timing
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda text: pool.analyze_batch([text]), texts[:threads]))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda i: pool.analyze_batch([texts[i % len(texts)]]), range(requests)))
+        elapsed = time.perf_counter() - started
+
+        return {
+            "workers": workers,
+            "throughput": requests / elapsed if elapsed else 0.0,
+            "parent_mb": process_memory_mb(os.getpid()),
+            "workers_mb": sum(process_memory_mb(worker.process.pid) for worker in pool._workers)
+        }
+    finally:
+        pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent debate load test")
+    parser.add_argument("--ramp", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=8, help="User messages per participant")
+    parser.add_argument("--script", default=None, help="File with one scripted reply per line")
+    parser.add_argument("--database-url", default="sqlite:///loadtest.db")
+    parser.add_argument("--llm-latency", default=None, help="Stub LLM latency spec, e.g. fixed:0.3")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="Override the gateway's global limit")
+    parser.add_argument("--unsafe-fraction", type=float, default=None, help="Share of stub replies that are unsafe")
+    parser.add_argument("--candidates", type=int, default=None, help="Speculative candidates per reply")
+    parser.add_argument("--pool-sizes", default=None, help="Comma-separated inference worker counts to sweep instead")
+    parser.add_argument("--pool-requests", type=int, default=200, help="Messages scored per pool size")
+    args = parser.parse_args()
+
+    # Configure before the graph modules build their model clients and DB handles
+    config.LLM_BACKEND = "stub"
+    config.LLM_RATE_LIMIT = 0
+    config.DATABASE_URL = args.database_url
+    if args.llm_latency:
+        config.STUB_LLM_LATENCY = args.llm_latency
+    if args.llm_concurrency:
+        config.LLM_MAX_CONCURRENCY = args.llm_concurrency
+    if args.unsafe_fraction is not None:
+        config.STUB_LLM_UNSAFE_FRACTION = args.unsafe_fraction
+    if args.candidates:
+        config.SPECULATIVE_CANDIDATES = args.candidates
+        config.LLM_TENANT_CONCURRENCY = max(config.LLM_TENANT_CONCURRENCY, args.candidates)
+
+    templates = DEFAULT_TEMPLATES
+    if args.script:
+        with open(args.script) as f:
+            templates = [line.strip() for line in f if line.strip()]
+
+    if args.pool_sizes:
+        texts = [
+            template.format(topic=f"load test topic {i}", stance="we should do more, not less", turn=i + 1)
+            for i, template in enumerate(templates)
+        ]
+        print(f"{'workers':>7} {'calls/s':>8} {'speedup':>8} {'self MB':>8} {'workers MB':>11}")
+        baseline = None
+        for workers in [int(size) for size in args.pool_sizes.split(",")]:
+            r = run_pool_size(workers, args.pool_requests, texts)
+            baseline = baseline or r["throughput"]
+            print(f"{r['workers']:>7} {r['throughput']:>8.1f} {r['throughput'] / baseline:>7.2f}x "
+                  f"{r['parent_mb']:>8.0f} {r['workers_mb']:>11.0f}")
+        return
+
+    from graph import create_debate_graph
+    from models.database import DatabaseManager
+
+    graph = create_debate_graph()
+    db = DatabaseManager(args.database_url)
+
+    print(f"{'conc':>5} {'turns':>6} {'err':>4} {'turns/s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'rss MB':>8} {'+rss MB':>8} {'rows/s':>8} {'done %':>7}")
+    for concurrency in [int(level) for level in args.ramp.split(",")]:
+        r = run_level(graph, db, concurrency, args.turns, templates)
+        print(f"{r['concurrency']:>5} {r['turns']:>6} {r['errors']:>4} {r['throughput']:>8.2f} "
+              f"{r['p50'] * 1000:>8.0f} {r['p99'] * 1000:>8.0f} {r['rss_mb']:>8.0f} "
+              f"{r['rss_growth_mb']:>8.1f} {r['db_writes_per_s']:>8.1f} {r['completed'] * 100:>7.0f}")
+
+    from nodes.debate_nodes import router
+
+    print(f"\n{'tier':<10} {'model':<28} {'calls':>6} {'err':>4} {'mean ms':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'tokens':>8} {'cost $':>8}")
+    for tier, m in router.metrics().items():
+        print(f"{tier:<10} {m['model']:<28} {m['calls']:>6} {m['errors']:>4} {m['mean_ms']:>8.0f} "
+              f"{m['p50_ms']:>8.0f} {m['p99_ms']:>8.0f} {m['input_tokens'] + m['output_tokens']:>8} "
+              f"{m['cost']:>8.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# utils/chunking.py
+from config import config
+from typing import List, Tuple
+import numpy as np
+import re
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+POOLING_METHODS = ("max", "mean", "length_weighted")
+
+# Tokenizers without a configured limit report a huge sentinel instead;
+# the encoder models used here take 512 positions
+UNSET_MODEL_LENGTH = 1_000_000
+DEFAULT_MODEL_LENGTH = 512
+
+class TextChunker:
+    """
+    Splits texts into token-bounded windows at sentence boundaries.
+
+    Texts are tokenized in one batched call; those that fit in `max_tokens`
+    pass through as a single chunk. Longer ones are split into sentences, and
+    consecutive sentences are packed into windows of at most `max_tokens`; a
+    sentence that is longer on its own is cut at token boundaries. The window
+    defaults to the model's limit less its special tokens, so nothing is
+    truncated and no text is split that the model could take whole.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = None):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens or config.CHUNK_MAX_TOKENS or self.model_window(tokenizer)
+
+    @staticmethod
+    def model_window(tokenizer) -> int:
+        """
+        Tokens of text that fit in one forward pass, besides the special tokens
+        """
+        limit = tokenizer.model_max_length
+        if limit >= UNSET_MODEL_LENGTH:
+            limit = DEFAULT_MODEL_LENGTH
+        return limit - tokenizer.num_special_tokens_to_add()
+
+    def split(self, texts: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Returns (chunks, owner index of each chunk, token length of each chunk)
+        """
+        chunks, owners, weights = [], [], []
+        lengths = [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]] if texts else []
+
+        for owner, (text, length) in enumerate(zip(texts, lengths)):
+            if length <= self.max_tokens:
+                chunks.append(text)
+                owners.append(owner)
+                weights.append(max(length, 1))
+                continue
+
+            for chunk, length in self._windows(text):
+                chunks.append(chunk)
+                owners.append(owner)
+                weights.append(length)
+
+        return chunks, np.asarray(owners, dtype=np.int64), np.asarray(weights, dtype=np.float64)
+
+    def _windows(self, text: str):
+        sentences = [s for s in SENTENCE_BOUNDARY.split(text.strip()) if s]
+        if not sentences:
+            yield text, 1
+            return
+
+        lengths = [len(ids) for ids in self.tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+
+        window, window_length = [], 0
+        for sentence, length in zip(sentences, lengths):
+            if length > self.max_tokens:
+                if window:
+                    yield " ".join(window), window_length
+                    window, window_length = [], 0
+                yield from self._cut(sentence)
+                continue
+
+            if window_length + length > self.max_tokens:
+                yield " ".join(window), window_length
+                window, window_length = [], 0
+
+            window.append(sentence)
+            window_length += length
+
+        if window:
+            yield " ".join(window), window_length
+
+    def _cut(self, sentence: str):
+        ids = self.tokenizer(sentence, add_special_tokens=False)["input_ids"]
+        for start in range(0, len(ids), self.max_tokens):
+            piece = ids[start:start + self.max_tokens]
+            yield self.tokenizer.decode(piece), len(piece)
+
+def pool_scores(values, owners: np.ndarray, weights: np.ndarray, count: int, method: str = None) -> np.ndarray:
+    """
+    Aggregate per-chunk scores (chunks x labels, or a flat vector) into one row
+    per text with max, mean or length-weighted mean pooling
+    """
+    method = method or config.CHUNK_POOLING
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method: {method}")
+
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.ndim == 1
+    if flat:
+        values = values[:, None]
+
+    pooled = np.zeros((count, values.shape[1]))
+
+    if method == "max":
+        # Model scores are probabilities, so 0 is a safe starting point
+        np.maximum.at(pooled, owners, values)
+    elif method == "mean":
+        np.add.at(pooled, owners, values)
+        pooled /= np.bincount(owners, minlength=count)[:, None]
+    else:
+        np.add.at(pooled, owners, values * weights[:, None])
+        pooled /= np.bincount(owners, weights=weights, minlength=count)[:, None]
+
+    return pooled[:, 0] if flat else pooled
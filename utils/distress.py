@@ -0,0 +1,104 @@
+# utils/distress.py
+from typing import Dict, List, Optional
+from config import config
+
+class DistressDetector:
+    """
+    Online distress detection over a session's score streams.
+
+    For each stream (discomfort, arousal, toxicity) it keeps an EWMA, an EWMA of
+    the turn-to-turn change (slope) and a one-sided CUSUM of drift above the
+    stream's target. Each score updates a few floats, so the cost per turn is
+    constant and nothing is rescanned. The statistics are a plain dict, carried in
+    DebateState["distress"] and checkpointed with it.
+
+    An alarm is raised when smoothed discomfort is high, when it is rising fast
+    while above target, or when any stream's CUSUM crosses its limit - the last
+    catches sustained moderate distress that never spikes. A crossing is kept as
+    the stream's change point until the turn's safety check has acted on it
+    (acknowledge) and the CUSUM restarts from 0, so one episode raises one
+    alarm rather than one on every later turn.
+
+    Scores come from DISTRESS_ROLE; sessions without any (e.g. scored before
+    user messages were) fall back to the other role's, until the first score
+    of DISTRESS_ROLE replaces them.
+    """
+
+    def __init__(self):
+        self.role = config.DISTRESS_ROLE
+        self.alpha = config.DISTRESS_EWMA_ALPHA
+        self.targets = config.DISTRESS_TARGETS
+        self.slack = config.DISTRESS_CUSUM_SLACK
+        self.cusum_limit = config.DISTRESS_CUSUM_LIMIT
+        self.level_limit = config.DISTRESS_LEVEL_LIMIT
+        self.slope_limit = config.DISTRESS_SLOPE_LIMIT
+
+    def update(self, stats: Optional[Dict], records: List[Dict]) -> Dict:
+        """
+        Fold new score records into the statistics
+        """
+        stats = {stream: dict(values) for stream, values in (stats or {}).items()}
+
+        for record in records:
+            role = record["role"]
+            stats_role = self._stats_role(stats)
+            if role != self.role and stats_role == self.role:
+                continue
+            if role == self.role and stats_role not in (None, self.role):
+                stats = {}
+
+            for stream, target in self.targets.items():
+                value = record[stream]
+                current = stats.get(stream)
+
+                if current is None:
+                    current = stats[stream] = {"ewma": value, "slope": 0.0, "cusum": 0.0, "role": role}
+                else:
+                    ewma = current["ewma"] + self.alpha * (value - current["ewma"])
+                    current["slope"] += self.alpha * ((ewma - current["ewma"]) - current["slope"])
+                    current["ewma"] = ewma
+
+                cusum = max(0.0, current["cusum"] + value - target - self.slack)
+                current["change_point"] = cusum if cusum > self.cusum_limit else None
+                current["cusum"] = 0.0 if current["change_point"] else cusum
+
+        return stats
+
+    def alarms(self, stats: Optional[Dict]) -> List[str]:
+        """
+        Reasons to de-escalate given the current statistics (empty if none)
+        """
+        reasons = []
+        if not stats:
+            return reasons
+
+        discomfort = stats.get("predicted_discomfort")
+        if discomfort:
+            if discomfort["ewma"] > self.level_limit:
+                reasons.append(f"Sustained discomfort: {discomfort['ewma']:.2f}")
+            elif (discomfort["ewma"] > self.targets["predicted_discomfort"]
+                  and discomfort["slope"] > self.slope_limit):
+                reasons.append(f"Rising discomfort: +{discomfort['slope']:.2f}/turn")
+
+        for stream, values in stats.items():
+            if values.get("change_point"):
+                reasons.append(f"Change point in {stream}: cusum {values['change_point']:.2f}")
+
+        return reasons
+
+    def acknowledge(self, stats: Optional[Dict]) -> Optional[Dict]:
+        """
+        The statistics with change points cleared, once an alarm has been acted on
+        """
+        if not stats:
+            return stats
+        return {stream: {**values, "change_point": None} for stream, values in stats.items()}
+
+    def _stats_role(self, stats: Dict) -> Optional[str]:
+        """Role the statistics were computed from (None before any score)"""
+        for values in stats.values():
+            # Statistics checkpointed before the fallback existed are all DISTRESS_ROLE
+            return values.get("role", self.role)
+        return None
+
+distress_detector = DistressDetector()
@@ -0,0 +1,149 @@
+# utils/embeddings.py
+from transformers import AutoTokenizer, AutoModel
+import torch
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from config import config
+import threading
+
+class Embedder:
+    """
+    Local sentence embeddings (mean-pooled, L2-normalised), so similarity is a
+    dot product
+    """
+
+    def __init__(self):
+        # Loaded on first use (or by load()), so importing this module loads no weights
+        self.tokenizer = None
+        self.model = None
+        self.concession_vector = None
+        self.load_lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the model and embed the concession phrases (idempotent)
+        """
+        if self.concession_vector is not None:
+            return
+        with self.load_lock:
+            if self.concession_vector is not None:
+                return
+            self.tokenizer = AutoTokenizer.from_pretrained(config.EMBEDDING_MODEL)
+            self.model = AutoModel.from_pretrained(config.EMBEDDING_MODEL)
+            self.model.eval()
+
+            # Centroid of stock concession phrases, embedded once (set last: it
+            # marks the model as loaded)
+            concession = self._embed(config.CONCESSION_PHRASES).mean(axis=0)
+            self.concession_vector = concession / np.linalg.norm(concession)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        One row per text
+        """
+        self.load()
+        return self._embed(texts)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        batch = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=config.EMBEDDING_MAX_TOKENS,
+            return_tensors="pt"
+        )
+        with torch.no_grad():
+            hidden = self.model(**batch).last_hidden_state
+
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        vectors = pooled.numpy().astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-9)
+
+    def score_statement(
+        self,
+        vector: np.ndarray,
+        stance_vectors: np.ndarray,
+        previous_vectors: Optional[np.ndarray] = None,
+        previous_alignments: Optional[Sequence[float]] = None,
+        concession_vector: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        Score a user statement against the two stances and the user's earlier
+        statements (their vectors, one row each, and their alignments).
+        `concession_vector` defaults to this embedder's, which loads the model;
+        callers using the inference pool pass the pool's instead.
+
+        alignment: similarity to the user's stance minus similarity to the bot's
+        (> 0 leans to the user's own side).
+        contradiction: highest similarity to an earlier statement (or the
+        stance itself) that leaned clearly the other way - same subject,
+        opposite side.
+        concession: similarity to the concession phrases, counted as one also
+        when alignment drops towards the bot's side by CONCESSION_SHIFT from the
+        mean of the earlier statements. The stance is left out of that mean: it
+        is maximally aligned by construction, so any real message would look
+        like a drop from it.
+        """
+        user_stance, bot_stance = stance_vectors
+        alignment = float(vector @ user_stance - vector @ bot_stance)
+
+        previous_alignments = np.asarray(previous_alignments or [], dtype=np.float64)
+        if previous_vectors is None:
+            previous_vectors = np.empty((0, len(vector)), dtype=np.float32)
+
+        # For contradictions the stance is the user's first statement; it leans their way by definition
+        earlier_vectors = np.vstack([user_stance, previous_vectors])
+        earlier_alignments = np.concatenate([
+            [float(user_stance @ user_stance - user_stance @ bot_stance)],
+            previous_alignments
+        ])
+
+        margin = config.CONTRADICTION_MARGIN
+        opposed = (earlier_alignments * alignment < 0) & (np.abs(earlier_alignments) > margin)
+        contradiction = float((earlier_vectors @ vector)[opposed].max()) if abs(alignment) > margin and opposed.any() else 0.0
+
+        if concession_vector is None:
+            self.load()
+            concession_vector = self.concession_vector
+        concession = float(vector @ concession_vector)
+        shift = alignment - float(previous_alignments.mean()) if len(previous_alignments) else 0.0
+
+        return {
+            "alignment": alignment,
+            "contradiction": contradiction,
+            "concession": concession,
+            "is_contradiction": contradiction >= config.CONTRADICTION_SIMILARITY,
+            "is_concession": (
+                concession >= config.CONCESSION_SIMILARITY or shift <= -config.CONCESSION_SHIFT
+            )
+        }
+
+class StatementVectors:
+    """
+    Embeddings of each session's user statements by message index, kept in
+    process memory instead of in checkpointed state. Least recently used
+    sessions are dropped past `max_sessions`; a session that isn't here has
+    its statements re-embedded by the caller.
+    """
+
+    def __init__(self, max_sessions: int = None):
+        self.max_sessions = max_sessions or config.STATEMENT_VECTOR_SESSIONS
+        self.sessions: "OrderedDict[str, Dict[int, np.ndarray]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id: str) -> Dict[int, np.ndarray]:
+        with self.lock:
+            return dict(self.sessions.get(session_id, {}))
+
+    def put(self, session_id: str, vectors: Dict[int, np.ndarray]):
+        with self.lock:
+            self.sessions[session_id] = vectors
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+# Global instances
+embedder = Embedder()
+statement_vectors = StatementVectors()
@@ -0,0 +1,109 @@
+# utils/idempotency.py
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from config import config
+from typing import Callable, Dict, Optional, Tuple
+import hashlib
+import threading
+import time
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different message"""
+
+class IdempotencyPending(Exception):
+    """A turn with this key is still running elsewhere"""
+
+def fingerprint(message: str) -> str:
+    return hashlib.sha256(message.encode("utf-8")).hexdigest()
+
+class IdempotentTurns:
+    """
+    Runs each (session, idempotency key) turn at most once.
+
+    The first caller claims the key in the database and runs the turn;
+    duplicates get its result instead of a turn of their own. Duplicates in
+    the same process wait on the first caller's future; duplicates in other
+    processes poll the key row until it completes. A completed key returns its
+    stored result for as long as the session exists.
+
+    A failed turn releases its claim, so the client can resend with the same
+    key. A claim still pending after IDEMPOTENCY_PENDING_TIMEOUT is taken over,
+    with `recover` consulted first in case the turn landed before its process died.
+    """
+
+    def __init__(self):
+        self.wait_timeout = config.IDEMPOTENCY_WAIT_TIMEOUT
+        self.pending_timeout = config.IDEMPOTENCY_PENDING_TIMEOUT
+        self.poll_interval = config.IDEMPOTENCY_POLL_INTERVAL
+        self._in_flight: Dict[Tuple[str, str], Tuple[str, Future]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, db, session_id: str, key: str, message: str,
+            send: Callable[[], Dict], recover: Callable[[], Optional[Dict]] = None) -> Tuple[Dict, bool]:
+        """
+        The turn's result (as returned by `send`) and whether it was replayed
+        rather than run by this call
+        """
+        digest = fingerprint(message)
+
+        with self._lock:
+            leader = self._in_flight.get((session_id, key))
+            if leader is None:
+                future = Future()
+                self._in_flight[(session_id, key)] = (digest, future)
+
+        if leader is not None:
+            leader_digest, leader_future = leader
+            if leader_digest != digest:
+                raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different message")
+            try:
+                return leader_future.result(timeout=self.wait_timeout), True
+            except FutureTimeout:
+                raise IdempotencyPending(f"Turn for idempotency key {key!r} is still running")
+
+        try:
+            outcome = self._claim_and_run(db, session_id, key, digest, send, recover)
+            future.set_result(outcome[0])
+            return outcome
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[(session_id, key)]
+
+    def _claim_and_run(self, db, session_id: str, key: str, digest: str,
+                       send: Callable[[], Dict], recover: Callable[[], Optional[Dict]]) -> Tuple[Dict, bool]:
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            stale_before = datetime.utcnow() - timedelta(seconds=self.pending_timeout)
+            claim = db.claim_idempotency_key(session_id, key, digest, stale_before)
+            if claim["claimed"]:
+                break
+            if claim["status"] is None:
+                # Released by a failed attempt just now; claim it afresh
+                continue
+            if claim["fingerprint"] != digest:
+                raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different message")
+            if claim["status"] == "completed":
+                return claim["result"], True
+            if time.monotonic() >= deadline:
+                raise IdempotencyPending(f"Turn for idempotency key {key!r} is still running")
+            time.sleep(self.poll_interval)
+
+        try:
+            # An abandoned claim's turn may have been saved before its process died
+            result = recover() if claim["takeover"] and recover else None
+            replayed = result is not None
+            if not replayed:
+                result = send()
+        except BaseException:
+            db.release_idempotency_key(session_id, key)
+            raise
+
+        db.complete_idempotency_key(session_id, key, result)
+        return result, replayed
+
+# Global instance
+idempotent_turns = IdempotentTurns()
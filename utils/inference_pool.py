@@ -0,0 +1,273 @@
+# utils/inference_pool.py
+from utils.sentiment import sentiment_analyzer
+from utils.safety import safety_checker
+from utils.embeddings import embedder
+from utils.tracing import tracer
+from config import config
+from typing import Dict, List, Tuple
+import multiprocessing
+import queue
+import threading
+
+# Operations a worker can run. The models behind them load lazily: the fork
+# server loads them once (utils.inference_preload) so workers forked from it
+# share the weights copy-on-write, and the parent never loads them unless
+# calls run in-process (workers=0).
+HANDLERS = {
+    "analyze": lambda text: sentiment_analyzer.analyze(text),
+    "analyze_batch": lambda texts: sentiment_analyzer.analyze_batch(texts),
+    "check_safety": lambda text, context=None: safety_checker.check_safety(text, context),
+    "check_safety_batch": lambda texts: safety_checker.check_safety_batch(texts),
+    "embed": lambda texts: embedder.embed(texts),
+    "concession_vector": lambda: _concession_vector(),
+    "ping": lambda: True,
+}
+
+def _concession_vector():
+    embedder.load()
+    return embedder.concession_vector
+
+def load_models():
+    """
+    Load every model the workers serve (idempotent)
+    """
+    sentiment_analyzer.load()
+    safety_checker.load()
+    embedder.load()
+
+def _worker_main(conn):
+    """
+    Serve requests from the parent until the pipe closes
+    """
+    # Already loaded when forked from the fork server; spawned workers load their own
+    load_models()
+
+    import torch
+    # One intra-op thread per worker so N workers use N cores without oversubscription
+    torch.set_num_threads(1)
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        try:
+            conn.send((True, HANDLERS[op](*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+# Placed on the idle queue by shutdown() to wake callers waiting for a worker
+_STOPPED = object()
+
+def _context():
+    """
+    Forkserver where available: workers fork from a clean single-threaded
+    server that has preloaded the models, never from this (threaded) process.
+    Spawned workers (the fallback) can't share memory, so each loads its own.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["utils.inference_preload"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+class _Worker:
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def stop(self):
+        if self.conn:
+            self.conn.close()
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+class InferencePool:
+    """
+    Pool of inference worker processes for the sentiment, safety and embedding models.
+
+    Workers are forked from a fork server that loads the models once, so
+    weights are shared copy-on-write rather than duplicated per process, and
+    no worker inherits this process's threads or locks. This process doesn't
+    load them at all. Requests go over a
+    dedicated pipe per worker; a caller checks out an idle worker, so any
+    number of threads can call in concurrently. Dead or hung workers are
+    restarted, both on demand and by a periodic health check.
+
+    With `workers=0` calls run in-process, which is the default.
+    """
+
+    def __init__(self, workers: int = None, timeout: float = None, health_interval: float = None):
+        self.num_workers = config.INFERENCE_WORKERS if workers is None else workers
+        self.timeout = timeout or config.INFERENCE_TIMEOUT
+        self.health_interval = health_interval or config.INFERENCE_HEALTH_INTERVAL
+        self.ping_timeout = config.INFERENCE_PING_TIMEOUT
+        self._workers: List[_Worker] = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._monitor = None
+        self._concession_vector = None
+
+    def start(self):
+        """
+        Fork the workers and start the health monitor (idempotent)
+        """
+        with self._lock:
+            if self._workers or self.num_workers <= 0:
+                return
+
+            # Clear a shutdown sentinel left from a previous run
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+
+            ctx = _context()
+            for _ in range(self.num_workers):
+                worker = _Worker(ctx)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+            self._stopped.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+            self._monitor.start()
+
+    def shutdown(self):
+        """
+        Stop all workers; callers waiting for one get an error
+        """
+        with self._lock:
+            self._stopped.set()
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle.put(_STOPPED)
+
+    def analyze(self, text: str) -> Dict:
+        return self._call("analyze", text)
+
+    def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        return self._call("analyze_batch", texts)
+
+    def check_safety(self, text: str, context: Dict = None) -> Tuple[bool, List[str]]:
+        return tuple(self._call("check_safety", text, context))
+
+    def check_safety_batch(self, texts: List[str]) -> List[Tuple[bool, List[str]]]:
+        return [tuple(result) for result in self._call("check_safety_batch", texts)]
+
+    def embed(self, texts: List[str]):
+        return self._call("embed", texts)
+
+    def concession_vector(self):
+        """
+        The embedder's concession centroid, fetched once from where the model lives
+        """
+        if self._concession_vector is None:
+            self._concession_vector = self._call("concession_vector")
+        return self._concession_vector
+
+    def health_check(self) -> Dict[int, bool]:
+        """
+        Ping idle workers, restarting any that are dead or unresponsive.
+        Returns worker index -> healthy before the check.
+
+        Workers are checked out one at a time and returned before the next is
+        taken, so callers are never left without the rest of the pool.
+        """
+        status = {}
+
+        for _ in range(len(self._workers)):
+            # Only inspect workers that are not serving a request right now
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is _STOPPED or worker not in self._workers or self._workers.index(worker) in status:
+                # Shut down, or back round to a worker already checked
+                self._idle.put(worker)
+                break
+
+            healthy = False
+            try:
+                if worker.is_alive():
+                    worker.conn.send(("ping", ()))
+                    healthy = worker.conn.poll(self.ping_timeout) and worker.conn.recv()[0]
+            except (EOFError, OSError):
+                healthy = False
+
+            if not healthy:
+                worker.restart()
+
+            status[self._workers.index(worker)] = bool(healthy)
+            self._idle.put(worker)
+
+        return status
+
+    def _monitor_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            self.health_check()
+
+    def _call(self, op: str, *args):
+        items = len(args[0]) if args and isinstance(args[0], list) else 1
+        with tracer.span("inference." + op, **{"inference.items": items, "inference.workers": self.num_workers}):
+            return self._dispatch(op, *args)
+
+    def _dispatch(self, op: str, *args):
+        if self.num_workers <= 0:
+            return HANDLERS[op](*args)
+
+        self.start()
+
+        # Retry once on a fresh worker if the first one crashed mid-request
+        for attempt in range(2):
+            worker = self._idle.get()
+            if worker is _STOPPED:
+                # Pass it on to the next waiter
+                self._idle.put(worker)
+                raise RuntimeError("Inference pool was shut down")
+            try:
+                if not worker.is_alive():
+                    worker.restart()
+
+                worker.conn.send((op, args))
+
+                if not worker.conn.poll(self.timeout):
+                    worker.restart()
+                    raise TimeoutError(f"Inference '{op}' timed out after {self.timeout}s")
+
+                ok, result = worker.conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                worker.restart()
+                if attempt == 0:
+                    continue
+                raise RuntimeError(f"Inference worker crashed during '{op}'")
+            finally:
+                self._idle.put(worker)
+
+            if not ok:
+                raise RuntimeError(f"Inference '{op}' failed: {result}")
+
+            return result
+
+# Initialize global pool (workers are forked lazily on first use)
+inference_pool = InferencePool()
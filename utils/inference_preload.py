@@ -0,0 +1,9 @@
+# utils/inference_preload.py
+"""
+Imported by the inference pool's fork server before it forks any worker:
+loads the models there once, so every worker shares the weights
+copy-on-write and the parent process never loads them.
+"""
+from utils.inference_pool import load_models
+
+load_models()
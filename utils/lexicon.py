@@ -0,0 +1,162 @@
+# utils/lexicon.py
+from textblob.en import sentiment as pattern_lexicon
+import numpy as np
+import re
+from typing import List, Tuple
+
+# Apostrophes and quotes split words, as in TextBlob's tokenizer
+QUOTES = "'\"‘’“”"
+
+# Copied from textblob._text (0.20), a private module that may change between releases.
+# Emoticons by (expression, polarity), as TextBlob scores them
+EMOTICONS = {
+    ('love', 1.0): {'<3', '♥'},
+    ('grin', 1.0): {'8-D', ':-D', ':D', '=-D', '=D', '>:D', 'X-D', 'XD', 'x-D', 'xD'},
+    ('taunt', 0.75): {':-P', ':-b', ':-p', ':P', ':^)', ':b', ':c)', ':o)', ':p', '>:P'},
+    ('smile', 0.5): {'8)', '8-)', ':)', ':-)', ':3', ':>', ':]', ':}', '=)', '=]', '>:)'},
+    ('wink', 0.25): {'*)', '*-)', ';)', ';-)', ';-]', ';D', ';]', ';^)', '>;]'},
+    ('gasp', 0.05): {':-O', ':-o', ':O', ':o', '>:o', 'o.O', 'o_O', '°O°', '°o°'},
+    ('worry', -0.25): {':-.', ':-/', ':-S', ':-s', ':/', ':S', ':\\', ':s', '>.>', '>:/', '>:\\'},
+    ('frown', -0.75): {':(', ':-(', ':-<', ':-[', ':-c', ':[', ':c', ':{', '=(', '=/', '>:['},
+    ('cry', -1.0): {":'''(", ":'(", ";'("}
+}
+PUNCTUATION = '.,;:!?()[]{}`\'\'"@#$^&*+-|=~_'
+# Contractions split off before tokenizing
+CONTRACTIONS = {"'d": " 'd", "'m": " 'm", "'s": " 's", "'ll": " 'll", "'re": " 're", "'ve": " 've", "n't": " n't"}
+
+class LexiconScorer:
+    """
+    Polarity and subjectivity from TextBlob's pattern lexicon, without building
+    a TextBlob per text.
+
+    The lexicon is indexed once into arrays, texts are tokenized with one
+    compiled regex, and scores for a whole batch are averaged in one numpy
+    pass. The modifier/negation rules ("very good", "not good", "good!") are
+    order-dependent, so they stay a single scan over each text's tokens.
+    Matches TextBlob's PatternAnalyzer to within rounding on ordinary prose;
+    it differs only around abbreviations and other tokenizer edge cases.
+    """
+
+    def __init__(self, lexicon=pattern_lexicon):
+        # Forces the lazy load; dict methods below skip the lazydict hooks
+        "good" in lexicon
+
+        words = list(dict.keys(lexicon))
+        self.index = {word: i for i, word in enumerate(words)}
+        entries = [dict.__getitem__(lexicon, word) for word in words]
+        # Texts are scored without part-of-speech tags, i.e. on the all-senses average
+        scores = np.array([entry[None] for entry in entries], dtype=float)
+        self.polarity = scores[:, 0].tolist()
+        self.subjectivity = scores[:, 1].tolist()
+        self.intensity = scores[:, 2].tolist()
+        self.is_modifier = [any(pos in entry for pos in lexicon.modifiers) for entry in entries]
+        self.modifier_suffix = [lexicon.modifier(word) for word in words]
+        self.negations = frozenset(lexicon.negations)
+
+        # Alphabetic emoticons ("xd") are never treated as emoticons by TextBlob
+        self.emoticons = {
+            emoticon.lower(): polarity
+            for (_, polarity), emoticons in EMOTICONS.items()
+            for emoticon in emoticons
+            if not emoticon.lower().isalpha()
+        }
+
+        # Contractions are split off first ("isn't" -> "is n't")
+        self.contraction_pattern = re.compile("(?=(?:{}))".format("|".join(map(re.escape, CONTRACTIONS))))
+
+        punctuation = re.escape(PUNCTUATION)
+        separators = re.escape(QUOTES)
+        # Emoticons with a letter or digit must end the word ("8)" but not "8)x")
+        emoticon_patterns = [
+            re.escape(emoticon)
+            + (f"(?=[{separators}{punctuation}]*(?:\\s|$))" if any(c.isalnum() for c in emoticon) else "")
+            for emoticon in sorted(self.emoticons, key=len, reverse=True)
+        ]
+        # Only characters that can start an emoticon try the emoticon alternatives
+        first_characters = re.escape("".join(sorted({e[0] for e in self.emoticons})))
+        self.token_pattern = re.compile("|".join([
+            "(?=[{}])(?:{})".format(first_characters, "|".join(emoticon_patterns)),
+            r"\(\s?!\s?\)",
+            # A word, with leading and trailing punctuation split off (leading periods stay)
+            f"\\.+[^\\s{separators}]*[^\\s{separators}{punctuation}]",
+            f"[^\\s{separators}{punctuation}](?:[^\\s{separators}]*[^\\s{separators}{punctuation}])?",
+            r"\.\.\.",
+            "!"
+        ]))
+
+    def score(self, text: str) -> Tuple[float, float]:
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """
+        (polarity, subjectivity) per text
+        """
+        owners, polarities, subjectivities = [], [], []
+
+        for owner, text in enumerate(texts):
+            tokens = self.token_pattern.findall(self.contraction_pattern.sub(" ", text.lower()))
+            for polarity, subjectivity in self._assess(tokens):
+                owners.append(owner)
+                polarities.append(polarity)
+                subjectivities.append(subjectivity)
+
+        # Mean over each text's assessed words (0 when none are known)
+        counts = np.bincount(owners, minlength=len(texts)).clip(min=1)
+        polarity = np.bincount(owners, weights=polarities, minlength=len(texts)) / counts
+        subjectivity = np.bincount(owners, weights=subjectivities, minlength=len(texts)) / counts
+        return list(zip(polarity.tolist(), subjectivity.tolist()))
+
+    def _assess(self, tokens: List[str]) -> List[Tuple[float, float]]:
+        """
+        TextBlob's assessment rules over lexicon indexes: a known word, merged
+        with a preceding modifier and/or negation
+        """
+        index = self.index
+        # Each assessment: [polarity, subjectivity, intensity, negated]
+        assessed = []
+        modifier = None  # Preceding modifier; True if it ends in -ly
+        negation = False
+
+        for token in tokens:
+            i = index.get(token)
+            if i is not None:
+                if modifier is None:
+                    assessed.append([self.polarity[i], self.subjectivity[i], self.intensity[i], False])
+                else:
+                    last = assessed[-1]
+                    last[0] = max(-1.0, min(self.polarity[i] * last[2], 1.0))
+                    last[1] = max(-1.0, min(self.subjectivity[i] * last[2], 1.0))
+                    last[2] = self.intensity[i]
+                if negation:
+                    assessed[-1][2] = 1.0 / (assessed[-1][2] or 1.0)
+                    assessed[-1][3] = True
+
+                modifier = self.modifier_suffix[i] if self.is_modifier[i] else None
+                negation = token in self.negations
+                continue
+
+            if token in self.negations:
+                negation = True
+            elif negation and len(token.strip("'")) > 1:
+                negation = False
+
+            if negation and modifier:
+                # "really not good" - the negation applies to the modifier
+                assessed[-1][3] = True
+                negation = False
+            elif modifier is not None and len(token) > 2:
+                modifier = None
+
+            if token == "!" and assessed:
+                assessed[-1][0] = max(-1.0, min(assessed[-1][0] * 1.25, 1.0))
+            elif token[0] == "(" and token[-1] == ")" and "!" in token:
+                # "(!)" marks sarcasm
+                assessed.append([0.0, 1.0, 1.0, False])
+            elif token in self.emoticons:
+                assessed.append([self.emoticons[token], 1.0, 1.0, False])
+
+        # "not good" = slightly bad, "not bad" = slightly good
+        return [(p * -0.5 if negated else p, s) for p, s, _, negated in assessed]
+
+# Global instance
+lexicon_scorer = LexiconScorer()
@@ -0,0 +1,193 @@
+# utils/llm_cassette.py
+from langchain_core.messages import AIMessage, BaseMessage
+from config import config
+from typing import Dict, List
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import warnings
+
+class CassetteMiss(Exception):
+    """Replay was asked for a prompt that was never recorded"""
+
+def prompt_key(messages: List[BaseMessage], model: str = "") -> str:
+    """
+    Hash of the prompt with whitespace normalized, so cosmetic differences in
+    prompt templates don't break replay
+    """
+    normalized = [
+        [message.type, re.sub(r"\s+", " ", str(message.content)).strip()]
+        for message in messages
+    ]
+    payload = json.dumps([model, normalized], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def parse_latency(spec: str):
+    """
+    Build a latency sampler from a spec string:
+    "none", "recorded", "fixed:S", "uniform:A,B" or "lognormal:MU,SIGMA" (seconds)
+    """
+    kind, _, params = (spec or "none").partition(":")
+    values = [float(v) for v in params.split(",") if v]
+
+    if kind == "none":
+        return lambda recorded: 0.0
+    if kind == "recorded":
+        return lambda recorded: recorded or 0.0
+    if kind == "fixed":
+        return lambda recorded: values[0]
+    if kind == "uniform":
+        return lambda recorded: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda recorded: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+class CassetteChatModel:
+    """
+    Record/replay wrapper around a chat model.
+
+    In "record" mode every call goes to the wrapped client and the response is
+    appended to a JSON-lines cassette (gzip if the path ends in .gz), keyed by
+    the normalized prompt hash, through one writer kept open until close().
+    In "replay" mode responses are served from the cassette with no client and
+    no network, optionally sleeping to simulate model latency. An unrecorded
+    prompt raises CassetteMiss; with `strict=False` it instead gets a
+    deterministic pick from the recorded responses, so load tests keep running
+    when prompts vary (e.g. randomized debate techniques). Such misses are
+    counted in `stats` and warned about once.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        mode: str = None,
+        path: str = None,
+        latency: str = None,
+        strict: bool = None,
+        model: str = None
+    ):
+        self.client = client
+        self.mode = mode or config.LLM_CASSETTE_MODE
+        self.path = path or config.LLM_CASSETTE_PATH
+        self.sample_latency = parse_latency(latency or config.LLM_REPLAY_LATENCY)
+        self.strict = config.LLM_CASSETTE_STRICT if strict is None else strict
+        self.model = model or config.LLM_MODEL
+
+        self.entries: Dict[str, Dict] = {}
+        self.keys: List[str] = []
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        self.writer = None
+        self.truncated = False
+
+        if self.mode == "record" and client is None:
+            raise ValueError("Record mode needs a client to record from")
+
+        self._load()
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        key = prompt_key(messages, self.model)
+
+        if self.mode == "replay":
+            return self._replay(key)
+
+        started = time.perf_counter()
+        response = self.client.invoke(messages)
+        latency = time.perf_counter() - started
+
+        self._record(key, {
+            "content": response.content,
+            "usage": getattr(response, "usage_metadata", None),
+            "latency": round(latency, 4)
+        })
+        return response
+
+    def _replay(self, key: str) -> AIMessage:
+        entry = self.entries.get(key)
+
+        with self.lock:
+            self.stats["hits" if entry else "misses"] += 1
+            first_miss = entry is None and self.stats["misses"] == 1
+
+        if entry is None:
+            if self.strict or not self.keys:
+                raise CassetteMiss(f"No recorded response for prompt {key} in {self.path}")
+            if first_miss:
+                warnings.warn(f"Prompt {key} is not in {self.path}; replaying a substitute response "
+                              f"(further misses are only counted in stats)")
+            entry = self.entries[self.keys[int(key, 16) % len(self.keys)]]
+
+        delay = self.sample_latency(entry.get("latency"))
+        if delay > 0:
+            time.sleep(delay)
+
+        return AIMessage(
+            content=entry["content"],
+            usage_metadata=entry.get("usage"),
+            response_metadata={"cassette": key}
+        )
+
+    def _record(self, key: str, entry: Dict):
+        with self.lock:
+            if key not in self.entries:
+                self.keys.append(key)
+            self.entries[key] = entry
+            self.stats["recorded"] += 1
+            if self.writer is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Appending after a truncated gzip member would be unreadable, so rewrite instead
+                self.writer = self._open("wt" if self.truncated else "at")
+                atexit.register(self.close)
+                if self.truncated:
+                    self.writer.writelines(self._line(k, e) for k, e in self.entries.items() if k != key)
+                    self.truncated = False
+            self.writer.write(self._line(key, entry))
+            # A gzip flush ends a deflate block, so the file reads back up to here after a crash
+            self.writer.flush()
+
+    def close(self):
+        """
+        Finish the cassette file (writes the gzip trailer)
+        """
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+        self.truncated = False
+
+    def _line(self, key: str, entry: Dict) -> str:
+        return json.dumps({"key": key, **entry}, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            if self.mode == "replay":
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            return
+
+        with self._open("rt") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    key = entry.pop("key")
+                    if key not in self.entries:
+                        self.keys.append(key)
+                    # Later recordings of the same prompt win
+                    self.entries[key] = entry
+            except EOFError:
+                # A recording process that died before close(): every flushed line is there
+                self.truncated = True
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
@@ -0,0 +1,215 @@
+# utils/llm_gateway.py
+from config import config
+from typing import Dict, List, Optional
+import random
+import threading
+import time
+
+class LLMGatewayError(Exception):
+    """Model call failed after exhausting retries"""
+
+class DeadlineExceeded(LLMGatewayError):
+    """Model call could not complete before its deadline"""
+
+# HTTP statuses worth retrying: rate limited, overloaded, transient server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Take one token, waiting up to `timeout` seconds. Returns False on timeout.
+        """
+        if self.rate <= 0:
+            return True
+
+        give_up_at = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if now + wait > give_up_at:
+                return False
+            time.sleep(wait)
+
+class LLMGateway:
+    """
+    Sits between the debate nodes and the chat model clients.
+
+    Every call waits for a token from the rate limiter, then a slot in the
+    global and per-tenant concurrency limits, and is retried with full-jitter
+    exponential backoff on rate-limit, overload and transient errors. The
+    whole call, including queueing and retries, is bounded by a deadline.
+
+    A tenant's semaphore and queue counter only exist while it has calls
+    queued or in flight, so tenants that come and go don't accumulate.
+
+    One gateway can front several clients (e.g. one per model tier): the
+    client is passed per call, and all calls share the same limits.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        max_concurrency: int = None,
+        tenant_concurrency: int = None,
+        rate_limit: float = None,
+        rate_burst: int = None,
+        max_retries: int = None,
+        retry_base_delay: float = None,
+        retry_max_delay: float = None,
+        deadline: float = None
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.tenant_concurrency = tenant_concurrency or config.LLM_TENANT_CONCURRENCY
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_delay = retry_base_delay or config.LLM_RETRY_BASE_DELAY
+        self.retry_max_delay = retry_max_delay or config.LLM_RETRY_MAX_DELAY
+        self.deadline = deadline or config.LLM_DEADLINE
+
+        self.bucket = TokenBucket(
+            config.LLM_RATE_LIMIT if rate_limit is None else rate_limit,
+            rate_burst or config.LLM_RATE_BURST
+        )
+        self.global_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.tenant_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self.tenant_callers: Dict[str, int] = {}
+
+        self.lock = threading.Lock()
+        self.counters = {
+            "queued": 0,
+            "in_flight": 0,
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "deadline_exceeded": 0
+        }
+        self.tenant_queued: Dict[str, int] = {}
+
+    def invoke(self, messages: List, tenant: Optional[str] = None, deadline: float = None, client=None):
+        """
+        Call the model (`client`, or the gateway's own) with concurrency
+        limits, rate limiting, retries and a deadline
+        """
+        client = client or self.client
+        give_up_at = time.monotonic() + (deadline or self.deadline)
+        tenant = tenant or "default"
+        tenant_slot = self._join_tenant(tenant)
+        try:
+            self._count("queued", 1, tenant)
+            try:
+                if not self.bucket.acquire(self._remaining(give_up_at)):
+                    raise self._deadline_exceeded("waiting for rate limit")
+                if not self.global_slots.acquire(timeout=self._remaining(give_up_at)):
+                    raise self._deadline_exceeded("waiting for a global slot")
+                if not tenant_slot.acquire(timeout=self._remaining(give_up_at)):
+                    self.global_slots.release()
+                    raise self._deadline_exceeded(f"waiting for a slot for tenant {tenant}")
+            finally:
+                self._count("queued", -1, tenant)
+
+            self._count("in_flight", 1)
+            try:
+                return self._invoke_with_retries(client, messages, give_up_at)
+            finally:
+                self._count("in_flight", -1)
+                tenant_slot.release()
+                self.global_slots.release()
+        finally:
+            self._leave_tenant(tenant)
+
+    def metrics(self) -> Dict:
+        """
+        Snapshot of queue depth and call counters
+        """
+        with self.lock:
+            return {
+                **self.counters,
+                "tenant_queued": {k: v for k, v in self.tenant_queued.items() if v}
+            }
+
+    def _invoke_with_retries(self, client, messages: List, give_up_at: float):
+        for attempt in range(self.max_retries + 1):
+            # Every attempt is a request to the provider, so retries take a token
+            # too (the first attempt's was taken before queueing for a slot)
+            if attempt and not self.bucket.acquire(self._remaining(give_up_at)):
+                self._count("failures", 1)
+                raise self._deadline_exceeded("waiting for rate limit to retry")
+            self._count("calls", 1)
+            try:
+                return client.invoke(messages)
+            except Exception as e:
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures", 1)
+                    raise LLMGatewayError(f"Model call failed: {e}") from e
+
+                # Full jitter backoff, never sleeping past the deadline
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                if time.monotonic() + delay >= give_up_at:
+                    self._count("failures", 1)
+                    raise self._deadline_exceeded("retrying") from e
+
+                self._count("retries", 1)
+                time.sleep(delay)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        status = getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(getattr(error, "response", None), "status_code", None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        # No HTTP status: connection failures and client-side timeouts
+        return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+            "APIConnectionError", "APITimeoutError"
+        )
+
+    def _join_tenant(self, tenant: str) -> threading.BoundedSemaphore:
+        """
+        The tenant's semaphore, created for its first caller
+        """
+        with self.lock:
+            if tenant not in self.tenant_slots:
+                self.tenant_slots[tenant] = threading.BoundedSemaphore(self.tenant_concurrency)
+            self.tenant_callers[tenant] = self.tenant_callers.get(tenant, 0) + 1
+            return self.tenant_slots[tenant]
+
+    def _leave_tenant(self, tenant: str):
+        """
+        Drop the tenant's entries once its last caller is done
+        """
+        with self.lock:
+            self.tenant_callers[tenant] -= 1
+            if not self.tenant_callers[tenant]:
+                del self.tenant_callers[tenant]
+                del self.tenant_slots[tenant]
+                self.tenant_queued.pop(tenant, None)
+
+    def _count(self, counter: str, delta: int, tenant: Optional[str] = None):
+        with self.lock:
+            self.counters[counter] += delta
+            if counter == "queued":
+                self.tenant_queued[tenant] = self.tenant_queued.get(tenant, 0) + delta
+
+    def _remaining(self, give_up_at: float) -> float:
+        return max(0.0, give_up_at - time.monotonic())
+
+    def _deadline_exceeded(self, stage: str) -> DeadlineExceeded:
+        self._count("deadline_exceeded", 1)
+        return DeadlineExceeded(f"Model call deadline exceeded while {stage}")
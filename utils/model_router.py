@@ -0,0 +1,133 @@
+# utils/model_router.py
+from utils.llm_gateway import LLMGateway
+from utils.tracing import tracer, KIND_CLIENT
+from config import config
+from collections import deque
+from typing import Callable, Dict, List, Optional
+import threading
+import time
+
+# Latency samples kept per tier for percentiles
+LATENCY_WINDOW = 1000
+
+class ModelRouter:
+    """
+    Routes each generation to a configured model tier.
+
+    The tier comes from the debate phase (LLM_PHASE_TIERS), upgraded to
+    LLM_COMPLEX_TIER when the user's last message is long. Each tier has its own
+    model, temperature and max tokens, i.e. its own client. All tiers go through
+    one gateway, so its global, per-tenant and rate limits bound the process's
+    model calls together however they are routed. Calls, errors, latency, tokens
+    and cost are accounted per tier.
+    """
+
+    def __init__(
+        self,
+        build_client: Callable[[str, Dict], object],
+        tiers: Dict[str, Dict] = None,
+        phase_tiers: Dict[str, str] = None,
+        complex_tier: str = None,
+        complex_words: int = None,
+        gateway: LLMGateway = None
+    ):
+        self.tiers = tiers or config.LLM_TIERS
+        self.phase_tiers = phase_tiers or config.LLM_PHASE_TIERS
+        self.complex_tier = complex_tier or config.LLM_COMPLEX_TIER
+        self.complex_words = complex_words or config.LLM_COMPLEX_MESSAGE_WORDS
+        self.default_tier = config.LLM_DEFAULT_TIER
+
+        for tier in [self.complex_tier, self.default_tier, *self.phase_tiers.values()]:
+            if tier not in self.tiers:
+                raise ValueError(f"Unknown model tier: {tier}")
+
+        # Built on first use, so unused tiers need no client (or cassette)
+        self.build_client = build_client
+        self.clients: Dict[str, object] = {}
+        self.gateway = gateway or LLMGateway()
+
+        self.lock = threading.Lock()
+        self.stats = {
+            name: {
+                "calls": 0, "errors": 0, "seconds": 0.0,
+                "input_tokens": 0, "output_tokens": 0, "cost": 0.0,
+                "latencies": deque(maxlen=LATENCY_WINDOW)
+            }
+            for name in self.tiers
+        }
+
+    def tier_for(self, phase: str, user_text: Optional[str] = None) -> str:
+        """
+        Tier for a phase, upgraded for long user messages
+        """
+        if not config.LLM_ROUTING:
+            return self.default_tier
+
+        tier = self.phase_tiers.get(phase, self.default_tier)
+        if user_text and len(user_text.split()) > self.complex_words:
+            tier = self.complex_tier
+        return tier
+
+    def invoke(self, phase: str, messages: List, tenant: Optional[str] = None, user_text: Optional[str] = None):
+        tier = self.tier_for(phase, user_text)
+        stats = self.stats[tier]
+
+        with tracer.span("llm.invoke", KIND_CLIENT, phase=phase, tier=tier, model=self.tiers[tier]["model"]) as span:
+            started = time.perf_counter()
+            try:
+                response = self.gateway.invoke(messages, tenant=tenant, client=self._client(tier))
+            except Exception:
+                with self.lock:
+                    stats["errors"] += 1
+                raise
+            elapsed = time.perf_counter() - started
+
+            usage = getattr(response, "usage_metadata", None) or {}
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+            span.set(input_tokens=input_tokens, output_tokens=output_tokens)
+
+        # Prices are USD per million tokens
+        cost = (
+            input_tokens * self.tiers[tier].get("input_cost", 0.0)
+            + output_tokens * self.tiers[tier].get("output_cost", 0.0)
+        ) / 1e6
+
+        with self.lock:
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            stats["latencies"].append(elapsed)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost"] += cost
+
+        return response
+
+    def _client(self, tier: str):
+        with self.lock:
+            if tier not in self.clients:
+                self.clients[tier] = self.build_client(tier, self.tiers[tier])
+            return self.clients[tier]
+
+    def metrics(self) -> Dict[str, Dict]:
+        """
+        Per-tier snapshot: model, calls, errors, mean/p50/p99 latency (ms), tokens and cost (USD)
+        """
+        import numpy as np
+
+        with self.lock:
+            snapshot = {}
+            for name, stats in self.stats.items():
+                latencies = np.asarray(stats["latencies"]) * 1000
+                snapshot[name] = {
+                    "model": self.tiers[name]["model"],
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "mean_ms": stats["seconds"] * 1000 / stats["calls"] if stats["calls"] else 0.0,
+                    "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                    "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+                    "input_tokens": stats["input_tokens"],
+                    "output_tokens": stats["output_tokens"],
+                    "cost": stats["cost"]
+                }
+            return snapshot
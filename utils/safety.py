@@ -2,11 +2,18 @@
 from typing import Dict, List, Tuple
 from detoxify import Detoxify
 from config import config
+from utils.chunking import TextChunker, pool_scores
+from utils.distress import distress_detector
 import re
+import threading
 
 class SafetyChecker:
     def __init__(self):
-        self.toxicity_model = Detoxify('original')
+        # The toxicity model is loaded on first use (or by load()); the lexical
+        # checks below don't need it
+        self.toxicity_model = None
+        self.chunker = None
+        self.load_lock = threading.Lock()
         
         # Patterns that should trigger warnings
         self.harmful_patterns = [
@@ -16,21 +23,59 @@ class SafetyChecker:
             # Add more as needed
         ]
         
+        # First-person crisis language in user messages (harmful_patterns are
+        # written for bot output, where "yourself" means the user)
+        self.crisis_patterns = [
+            r'\b(kill(ing)? myself|end(ing)? my (own )?life|take my (own )?life)\b',
+            r'\b(harm(ing)? myself|hurt(ing)? myself|cut(ting)? myself)\b',
+            r'\b(want(ed)? to die|wish i (was|were) dead|better off dead)\b',
+            r'\b(no reason to live|(i\'m|i am) suicidal|end it all)\b',
+        ]
+        
         # Topics that should have extra guardrails
         self.sensitive_topics = [
             'suicide', 'self-harm', 'violence', 
             'terrorism', 'abuse'
         ]
     
+    def load(self):
+        """
+        Load the toxicity model (idempotent)
+        """
+        if self.chunker is not None:
+            return
+        with self.load_lock:
+            if self.chunker is None:
+                self.toxicity_model = Detoxify('original')
+                self.chunker = TextChunker(self.toxicity_model.tokenizer)
+    
     def check_safety(self, text: str, context: Dict = None) -> Tuple[bool, List[str]]:
         """
         Check if content is safe to send
         Returns (is_safe, list_of_violations)
         """
-        violations = []
+        return self.check_safety_batch([text])[0]
+    
+    def check_safety_batch(self, texts: List[str]) -> List[Tuple[bool, List[str]]]:
+        """
+        check_safety for several texts with one toxicity model pass
+        """
+        # Long texts are checked in windows - any toxic window counts
+        self.load()
+        chunks, owners, weights = self.chunker.split(texts)
+        predictions = self.toxicity_model.predict(chunks)
+        pooled = {
+            label: pool_scores(scores, owners, weights, len(texts), "max")
+            for label, scores in predictions.items()
+        }
         
-        # Check toxicity
-        toxicity_scores = self.toxicity_model.predict(text)
+        return [
+            self._check_text(text, {label: float(scores[i]) for label, scores in pooled.items()})
+            for i, text in enumerate(texts)
+        ]
+    
+    def _check_text(self, text: str, toxicity_scores: Dict[str, float]) -> Tuple[bool, List[str]]:
+        violations = []
         
         if toxicity_scores['toxicity'] > config.MAX_TOXICITY_SCORE:
             violations.append(f"High toxicity: {toxicity_scores['toxicity']:.2f}")
@@ -52,6 +97,30 @@ class SafetyChecker:
         
         return is_safe, violations
     
+    def screen_input(self, text: str) -> Tuple[str, List[str]]:
+        """
+        Lexical pass over a user message before any reply is generated.
+        Returns ("crisis", reasons) on first-person crisis language,
+        ("review", reasons) on a harmful pattern or sensitive topic (for the
+        caller to check with the models) and ("clear", []) otherwise
+        """
+        lowered = text.lower()
+        
+        patterns = [pattern for pattern in self.crisis_patterns if re.search(pattern, lowered)]
+        if patterns:
+            return "crisis", [f"Crisis language in user message: {pattern}" for pattern in patterns]
+        
+        # Aimed at the bot when a user writes them - abusive, not a crisis
+        reasons = [f"Harmful pattern in user message: {pattern}" for pattern in self.harmful_patterns if re.search(pattern, lowered)]
+        reasons += [
+            f"Sensitive topic in user message: {topic}" for topic in self.sensitive_topics
+            if re.search(rf"\b{re.escape(topic)}", lowered)
+        ]
+        if reasons:
+            return "review", reasons
+        
+        return "clear", []
+    
     def sanitize_response(self, text: str) -> str:
         """
         Attempt to sanitize a response that's borderline unsafe
@@ -73,13 +142,10 @@ class SafetyChecker:
         if len(recent_violations) >= 2:
             return True
         
-        # If user seems genuinely distressed
-        recent_sentiments = state.get('sentiment_scores', [])[-2:]
-        if recent_sentiments:
-            avg_discomfort = sum(s.get('predicted_discomfort', 0) 
-                               for s in recent_sentiments) / len(recent_sentiments)
-            if avg_discomfort > 0.8:  # Very high discomfort
-                return True
+        # If user seems genuinely distressed (online stats kept up to date
+        # by sentiment_analysis, so no history is rescanned here)
+        if distress_detector.alarms(state.get('distress')):
+            return True
         
         return False
 
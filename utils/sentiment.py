@@ -1,42 +1,100 @@
 # utils/sentiment.py
 from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from textblob import TextBlob
 import torch
 import numpy as np
-from typing import Dict
+from typing import Dict, List, Tuple
 from config import config
+from utils.chunking import TextChunker, pool_scores
+from utils.lexicon import lexicon_scorer
+import threading
 
 class SentimentAnalyzer:
     def __init__(self):
-        # Multi-dimensional emotion detection
-        self.emotion_classifier = pipeline(
-            "text-classification",
-            model=config.SENTIMENT_MODEL,
-            top_k=None  # Get all emotion scores
-        )
-        
-        # Toxicity detection
-        from detoxify import Detoxify
-        self.toxicity_model = Detoxify('original')
+        # Models are loaded on first use (or by load()), so processes that only
+        # import this module - like a parent serving an inference pool - don't hold them
+        self.emotion_classifier = None
+        self.toxicity_model = None
+        self.chunker = None
+        self.load_lock = threading.Lock()
         
         # For arousal and valence, we'll use a simple heuristic
         # You could train a custom model here
+    
+    def load(self):
+        """
+        Load the models (idempotent)
+        """
+        if self.chunker is not None:
+            return
+        with self.load_lock:
+            if self.chunker is not None:
+                return
+            
+            # Multi-dimensional emotion detection
+            self.emotion_classifier = pipeline(
+                "text-classification",
+                model=config.SENTIMENT_MODEL,
+                top_k=None  # Get all emotion scores
+            )
+            
+            # Toxicity detection
+            from detoxify import Detoxify
+            self.toxicity_model = Detoxify('original')
+            
+            # Long texts are scored as sentence-bounded windows and pooled (set
+            # last: it marks the models as loaded)
+            self.chunker = TextChunker(self.emotion_classifier.tokenizer)
         
     def analyze(self, text: str) -> Dict:
         """
         Comprehensive sentiment analysis
         Returns multiple dimensions of emotional response
         """
+        return self.analyze_batch([text])[0]
+    
+    def analyze_batch(self, texts: List[str], pooling: str = None) -> List[Dict]:
+        """
+        Analyze several texts with one batched pass per model.
+        Long texts are chunked and chunk scores pooled (max, mean or length_weighted).
+        """
         
-        # Basic polarity/subjectivity
-        blob = TextBlob(text)
+        self.load()
+        chunks, owners, weights = self.chunker.split(texts)
         
         # Multi-dimensional emotions
-        emotions = self.emotion_classifier(text)[0]
-        emotion_dict = {item['label']: item['score'] for item in emotions}
+        emotion_batch = self.emotion_classifier(
+            chunks,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            truncation=True
+        )
+        labels = [item['label'] for item in emotion_batch[0]]
+        emotion_matrix = [
+            [scores[label] for label in labels]
+            for scores in ({item['label']: item['score'] for item in e} for e in emotion_batch)
+        ]
+        emotions = pool_scores(emotion_matrix, owners, weights, len(texts), pooling)
         
         # Toxicity
-        toxicity_scores = self.toxicity_model.predict(text)
+        toxicity = pool_scores(
+            self.toxicity_model.predict(chunks)['toxicity'],
+            owners, weights, len(texts), pooling
+        )
+        
+        # Polarity/subjectivity for the whole batch from the lexicon index
+        lexicon_scores = lexicon_scorer.score_batch(texts)
+        
+        return [
+            self._score(text, dict(zip(labels, emotions[i].tolist())), toxicity[i], lexicon_scores[i])
+            for i, text in enumerate(texts)
+        ]
+    
+    def _score(self, text: str, emotion_dict: Dict[str, float], toxicity: float, lexicon_score: Tuple[float, float]) -> Dict:
+        """
+        Combine model outputs for a single text into the derived metrics
+        """
+        
+        # Basic polarity/subjectivity
+        polarity, subjectivity = lexicon_score
         
         # Calculate arousal (high for anger, fear, surprise; low for sadness, neutral)
         arousal = (
@@ -62,12 +120,13 @@ class SentimentAnalyzer:
         
         # Predicted discomfort (your key metric)
         # Combination of negative emotions + toxicity + low valence
+        weights = config.DISCOMFORT_WEIGHTS
         predicted_discomfort = (
-            emotion_dict.get('anger', 0) * 0.3 +
-            emotion_dict.get('disgust', 0) * 0.25 +
-            emotion_dict.get('fear', 0) * 0.2 +
-            toxicity_scores['toxicity'] * 0.15 +
-            max(0, -valence) * 0.1  # Only negative valence contributes
+            emotion_dict.get('anger', 0) * weights['anger'] +
+            emotion_dict.get('disgust', 0) * weights['disgust'] +
+            emotion_dict.get('fear', 0) * weights['fear'] +
+            toxicity * weights['toxicity'] +
+            max(0, -valence) * weights['negative_valence']  # Only negative valence contributes
         )
         
         # Linguistic complexity
@@ -75,12 +134,12 @@ class SentimentAnalyzer:
         avg_word_length = np.mean([len(w) for w in words]) if words else 0
         
         return {
-            "polarity": blob.sentiment.polarity,
-            "subjectivity": blob.sentiment.subjectivity,
+            "polarity": polarity,
+            "subjectivity": subjectivity,
             "emotions": emotion_dict,
             "arousal": float(arousal),
             "valence": float(valence),
-            "toxicity": float(toxicity_scores['toxicity']),
+            "toxicity": float(toxicity),
             "predicted_discomfort": float(predicted_discomfort),
             "linguistic_complexity": float(avg_word_length),
             "word_count": len(words)
@@ -0,0 +1,92 @@
+# utils/stub_llm.py
+from langchain_core.messages import AIMessage, BaseMessage
+from utils.llm_cassette import parse_latency
+from config import config
+from typing import List
+import random
+import re
+import time
+
+# Canned replies per debate phase, picked from the PHASE line of the system prompt
+STUB_REPLIES = {
+    "calibration": [
+        "That's a thoughtful position. What first led you to see it that way?",
+        "I'd like to understand you better - which part of this matters most to you?",
+    ],
+    "gentle push": [
+        "I see your point, and yet there's evidence pointing the other way. How would you account for it?",
+        "That's interesting because many people who share your values reach the opposite conclusion.",
+    ],
+    "escalation": [
+        "This position overlooks some fundamental trade-offs. Why should anyone accept that assumption?",
+        "That reasoning is fundamentally flawed - it ignores the strongest counterexamples entirely.",
+    ],
+    "persona": [
+        "I still think I'm right about this, and the evidence backs me up.",
+        "That's not convincing - you're ignoring the practical consequences.",
+    ],
+    "de-escalation": [
+        "Let's take a breath here. I think we might be talking past each other.",
+        "What if we looked at this differently and started from what we agree on?",
+    ],
+}
+
+# Replies the safety checker rejects even after sanitizing, for unsafe-output tests
+STUB_UNSAFE_REPLIES = [
+    "Only a moron would still believe that after everything I've said.",
+    "Honestly, you're an idiot if you can't see how wrong this is. What a moron.",
+]
+
+class StubChatModel:
+    """
+    Offline chat model for load tests and benchmarks.
+
+    Returns a canned reply for the phase named in the system prompt after a
+    simulated latency, and reports approximate token usage, so the full graph
+    can run without an API key or network. A fraction of replies can be made
+    unsafe to exercise the safety path.
+    """
+
+    def __init__(
+        self,
+        latency: str = None,
+        seed: int = None,
+        unsafe_fraction: float = None,
+        model: str = "stub",
+        max_tokens: int = None
+    ):
+        self.sample_latency = parse_latency(latency or config.STUB_LLM_LATENCY)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.random = random.Random(seed)
+        self.unsafe_fraction = config.STUB_LLM_UNSAFE_FRACTION if unsafe_fraction is None else unsafe_fraction
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        system = messages[0].content if messages and messages[0].type == "system" else ""
+        match = re.search(r"PHASE:\s*([A-Za-z -]+?)\s*(\(|$)", system, re.MULTILINE)
+        phase = match.group(1).strip().lower() if match else "calibration"
+
+        if self.random.random() < self.unsafe_fraction:
+            content = self.random.choice(STUB_UNSAFE_REPLIES)
+        else:
+            content = self.random.choice(STUB_REPLIES.get(phase, STUB_REPLIES["calibration"]))
+
+        if self.max_tokens:
+            # A word is roughly a token - close enough for a stand-in
+            content = " ".join(content.split()[:self.max_tokens])
+
+        delay = self.sample_latency(None)
+        if delay > 0:
+            time.sleep(delay)
+
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(content.split())
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            },
+            response_metadata={"model": self.model}
+        )
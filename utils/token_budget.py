@@ -0,0 +1,69 @@
+# utils/token_budget.py
+from langchain_core.messages import HumanMessage
+from config import config
+from typing import Dict, List, Optional
+
+def total_tokens(usage: Optional[Dict]) -> int:
+    usage = usage or {}
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+def add_usage(usage: Optional[Dict], responses: List) -> Dict[str, int]:
+    """
+    Running token totals plus the usage reported on each model response
+    """
+    totals = {"input_tokens": 0, "output_tokens": 0, **(usage or {})}
+    for response in responses:
+        reported = getattr(response, "usage_metadata", None) or {}
+        totals["input_tokens"] += reported.get("input_tokens", 0)
+        totals["output_tokens"] += reported.get("output_tokens", 0)
+    return totals
+
+def trim_history(messages: List, window: Optional[int]) -> List:
+    """
+    The last `window` messages, starting at a user message so the prompt stays
+    well-formed (None keeps the full history)
+    """
+    if not window or len(messages) <= window:
+        return messages
+
+    trimmed = messages[-window:]
+    for start, message in enumerate(trimmed):
+        if isinstance(message, HumanMessage):
+            return trimmed[start:]
+    return messages[-1:]
+
+class TokenBudget:
+    """
+    Per-session and per-user token budgets (input + output tokens, 0 = unlimited).
+
+    Past TOKEN_BUDGET_TRIM_FRACTION of either budget, prompts switch to a short
+    context window; once a budget is used up the debate ends.
+    """
+
+    def __init__(self, session_limit: int = None, user_limit: int = None, trim_fraction: float = None):
+        self.session_limit = config.TOKEN_BUDGET_SESSION if session_limit is None else session_limit
+        self.user_limit = config.TOKEN_BUDGET_USER if user_limit is None else user_limit
+        self.trim_fraction = trim_fraction or config.TOKEN_BUDGET_TRIM_FRACTION
+
+    def check(self, state: Dict, db) -> str:
+        """
+        "ok", "trim" or "exceeded" for the session about to take a turn
+        """
+        session_used = total_tokens(state.get("token_usage"))
+        used_fraction = 0.0
+
+        if self.session_limit:
+            used_fraction = session_used / self.session_limit
+
+        if self.user_limit and state.get("user_id"):
+            # Other sessions from the stored totals, this one from live state
+            user_used = session_used + db.get_user_token_usage(state["user_id"], exclude_session_id=state["session_id"])
+            used_fraction = max(used_fraction, user_used / self.user_limit)
+
+        if used_fraction >= 1:
+            return "exceeded"
+        if used_fraction >= self.trim_fraction:
+            return "trim"
+        return "ok"
+
+token_budget = TokenBudget()
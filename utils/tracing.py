@@ -0,0 +1,311 @@
+# utils/tracing.py
+from config import config
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+import warnings
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# (trace, span id) of the innermost open span in this context
+_current = contextvars.ContextVar("trace_span", default=None)
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: BaseException = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.add(self)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+class _NoopSpan:
+    """Stands in for a span when the invocation isn't sampled"""
+
+    def set(self, **attributes):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Trace:
+    """Finished spans of one sampled invocation (spans may end on worker threads)"""
+
+    def __init__(self):
+        self.trace_id = _new_id(16)
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+    def to_otlp(self) -> Dict:
+        # One OTLP/JSON ExportTraceServiceRequest per line, as the collector's file exporter writes
+        with self.lock:
+            spans = [span.to_otlp() for span in self.spans]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", config.TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+            }]
+        }
+
+class Tracer:
+    """
+    Sampled flight recorder for debate turns.
+
+    A sampled invocation records a span tree (graph nodes, inference, model
+    calls, SQL statements) in memory. The last TRACE_BUFFER_SIZE traces are
+    kept in a ring buffer. Every invocation is timed, sampled or not; when one
+    takes TRACE_SLOW_SECONDS or longer, the buffer is appended to
+    TRACE_DUMP_PATH as OTLP/JSON lines and cleared, so the slow turn is written
+    together with the turns that led up to it. An unsampled slow turn is
+    written as its root span alone.
+
+    Dumps are written by a background thread, so the slow request doesn't
+    also pay for serializing the buffer. Unsampled invocations only pay for
+    a clock read and a context variable lookup per span.
+    """
+
+    def __init__(self, sample_rate: float = None, buffer_size: int = None,
+                 slow_seconds: float = None, dump_path: str = None):
+        self.sample_rate = config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_seconds = config.TRACE_SLOW_SECONDS if slow_seconds is None else slow_seconds
+        self.dump_path = dump_path or config.TRACE_DUMP_PATH
+        self.buffer = deque(maxlen=buffer_size or config.TRACE_BUFFER_SIZE)
+        self.lock = threading.Lock()
+        # Slow-turn dumps waiting for the writer thread, as (path, traces)
+        self.pending = queue.Queue()
+        self.writer = None
+        self.write_lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """
+        Root span of an invocation, sampled at TRACE_SAMPLE_RATE (a span if a trace is already open)
+        """
+        if _current.get() is not None:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            start_ns = time.time_ns()
+            error = None
+            try:
+                yield NOOP_SPAN
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                if (time.time_ns() - start_ns) / 1e9 >= self.slow_seconds:
+                    # Not sampled, so there's no span tree; keep the slow turn's root span
+                    trace = Trace()
+                    root = Span(trace, name, None, KIND_INTERNAL, dict(attributes, sampled=False))
+                    root.start_ns = start_ns
+                    root.end(error)
+                    self._finish(trace, root)
+            return
+
+        trace = Trace()
+        root = Span(trace, name, None, KIND_INTERNAL, attributes)
+        token = _current.set((trace, root.span_id))
+        error = None
+        try:
+            yield root
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            root.end(error)
+            self._finish(trace, root)
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, **attributes):
+        current = _current.get()
+        if current is None:
+            yield NOOP_SPAN
+            return
+
+        trace, parent_id = current
+        span = Span(trace, name, parent_id, kind, attributes)
+        token = _current.set((trace, span.span_id))
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            span.end(error)
+
+    def wrap(self, name: str, kind: int = KIND_INTERNAL, attributes: Callable[..., Dict] = None):
+        """
+        Decorator running a function in a span; `attributes(*args, **kwargs)`
+        supplies span attributes from the call
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return fn(*args, **kwargs)
+                with self.span(name, kind, **(attributes(*args, **kwargs) if attributes else {})):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, **attributes) -> Optional[Span]:
+        """
+        A child of the current span that the caller ends itself (for callback
+        APIs such as SQLAlchemy events); None if nothing is being traced
+        """
+        current = _current.get()
+        if current is None:
+            return None
+        trace, parent_id = current
+        return Span(trace, name, parent_id, kind, attributes)
+
+    def instrument_engine(self, engine):
+        """
+        A span per SQL statement executed on a SQLAlchemy engine
+        """
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = self.start_span(
+                "db." + statement.lstrip().split(None, 1)[0].lower(), KIND_CLIENT,
+                **{"db.system": engine.dialect.name, "db.statement": statement[:config.TRACE_STATEMENT_CHARS]}
+            )
+            conn.info.setdefault("trace_spans", []).append(span)
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = conn.info["trace_spans"].pop()
+            if span is not None:
+                span.set(**{"db.rows": cursor.rowcount})
+                span.end()
+
+        @event.listens_for(engine, "handle_error")
+        def handle_error(context):
+            spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+            span = spans.pop() if spans else None
+            if span is not None:
+                span.end(context.original_exception)
+
+    def recent(self) -> List[Trace]:
+        with self.lock:
+            return list(self.buffer)
+
+    def dump(self, path: str = None) -> int:
+        """
+        Append buffered traces to the dump file and clear the buffer; returns the number written
+        """
+        traces = self._take()
+        self._write(path or self.dump_path, traces)
+        return len(traces)
+
+    def flush(self):
+        """
+        Wait for the writer thread to finish the dumps queued so far
+        """
+        if self.writer is not None:
+            self.pending.join()
+
+    def _take(self) -> List[Trace]:
+        with self.lock:
+            traces = list(self.buffer)
+            self.buffer.clear()
+        return traces
+
+    def _write(self, path: str, traces: List[Trace]):
+        if not traces:
+            return
+        # Serialized outside self.lock so turns finishing meanwhile aren't held up
+        lines = [json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n" for trace in traces]
+        with self.write_lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a") as f:
+                f.writelines(lines)
+
+    def _write_pending(self):
+        while True:
+            path, traces = self.pending.get()
+            try:
+                self._write(path, traces)
+            except Exception as e:
+                warnings.warn(f"Trace dump to {path} failed: {type(e).__name__}: {e}")
+            finally:
+                self.pending.task_done()
+
+    def _finish(self, trace: Trace, root: Span):
+        with self.lock:
+            self.buffer.append(trace)
+            if (root.end_ns - root.start_ns) / 1e9 < self.slow_seconds:
+                return
+            traces = list(self.buffer)
+            self.buffer.clear()
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_pending, name="trace-dump", daemon=True)
+                self.writer.start()
+                atexit.register(self.flush)
+        self.pending.put((self.dump_path, traces))
+
+# Global instance
+tracer = Tracer()